@@ -0,0 +1,340 @@
+"""
+benchmark_accuracy.py
+
+Benchmarks how the metric functions of the accuracy assessment scale with
+the number of circles. Synthetic validation and prediction sets are
+generated for every size; each function is timed and its peak memory is
+traced with `tracemalloc`. Results are written as JSON and can be compared
+against a baseline file to make regressions visible.
+
+Example:
+    PYTHONPATH=bin python benchmarks/benchmark_accuracy.py \\
+        --sizes 100 1000 10000 --output accuracy.json
+"""
+
+from argparse import ArgumentDefaultsHelpFormatter, ArgumentParser
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+import geopandas as gpd
+import numpy as np
+import shapely
+from senseagronomy.accuracy_assessment import (
+    calculate_iou, create_circles, evaluate_thresholds, iou_matrix,
+    match_circles, oversegmentation_factor, sparse_iou_matrix
+)
+
+MIN_RADIUS = 50.0
+MAX_RADIUS = 400.0
+
+
+class CircleSets(NamedTuple):
+    """Synthetic validation and predicted circles."""
+    validation: gpd.GeoDataFrame
+    predicted: gpd.GeoDataFrame
+
+
+def synthetic_circles(
+    count: int,
+    overlap: float = 0.1,
+    detection_rate: float = 0.8,
+    jitter: float = 0.1,
+    false_positive_rate: float = 0.1,
+    seed: int = 0
+) -> CircleSets:
+    """
+    Generate synthetic validation and predicted circles.
+
+    Args:
+        count (int): Number of validation circles.
+        overlap (float): Expected number of other validation circles
+            intersecting a validation circle, controls the density.
+        detection_rate (float): Fraction of validation circles detected.
+        jitter (float): Standard deviation of the center offset and the
+            relative radius change of detected circles, relative to their
+            radius.
+        false_positive_rate (float): Number of false positives relative to
+            the number of validation circles.
+        seed (int): Seed of the random number generator.
+
+    Returns:
+        CircleSets: The validation and predicted circles.
+    """
+    rng = np.random.default_rng(seed)
+    radius = rng.uniform(MIN_RADIUS, MAX_RADIUS, count)
+    # circles intersect if their centers are closer than the sum of radii
+    mean_reach = np.pi * np.mean((radius + radius[rng.permutation(count)])
+                                 ** 2)
+    extent = np.sqrt(count * mean_reach / max(overlap, 1e-9))
+    centers = rng.uniform(0, extent, (count, 2))
+
+    detected = np.flatnonzero(rng.uniform(size=count) < detection_rate)
+    detected_radius = radius[detected] * \
+        np.maximum(1 + rng.normal(0, jitter, detected.size), 0.1)
+    detected_centers = centers[detected] + \
+        rng.normal(0, 1, (detected.size, 2)) * \
+        (jitter * radius[detected])[:, np.newaxis]
+
+    false_positives = rng.binomial(count, min(false_positive_rate, 1.0))
+    predicted_centers = np.concatenate([
+        detected_centers, rng.uniform(0, extent, (false_positives, 2))
+    ])
+    predicted_radius = np.concatenate([
+        detected_radius,
+        rng.uniform(MIN_RADIUS, MAX_RADIUS, false_positives)
+    ])
+    order = rng.permutation(len(predicted_radius))
+
+    return CircleSets(
+        gpd.GeoDataFrame(geometry=create_circles(centers, radius, 8)),
+        gpd.GeoDataFrame(
+            {"score": rng.uniform(size=len(order))},
+            geometry=create_circles(predicted_centers[order],
+                                    predicted_radius[order], 8)
+        )
+    )
+
+
+Benchmark = Callable[[CircleSets], object]
+
+BENCHMARKS: Dict[str, Benchmark] = {
+    "match_circles": lambda sets: match_circles(
+        sets.predicted, sets.validation
+    ),
+    "match_circles_optimal": lambda sets: match_circles(
+        sets.predicted, sets.validation, optimal=True
+    ),
+    "match_circles_analytic": lambda sets: match_circles(
+        sets.predicted, sets.validation, analytic=True
+    ),
+    "iou_matrix": lambda sets: iou_matrix(
+        np.asarray(sets.predicted.geometry.values),
+        np.asarray(sets.validation.geometry.values)
+    ),
+    "sparse_iou_matrix": lambda sets: sparse_iou_matrix(
+        np.asarray(sets.predicted.geometry.values),
+        np.asarray(sets.validation.geometry.values)
+    ),
+    "calculate_iou": lambda sets: calculate_iou(
+        sets.predicted, sets.validation
+    ),
+    "oversegmentation_factor": lambda sets: oversegmentation_factor(
+        sets.validation.geometry, sets.predicted.geometry
+    ),
+    "evaluate_thresholds": lambda sets: evaluate_thresholds(
+        sets.predicted, sets.validation, score_column="score"
+    ),
+}
+
+# functions whose memory grows with the product of both set sizes
+DENSE = ("iou_matrix",)
+
+
+def measure(
+    benchmark: Benchmark,
+    sets: CircleSets,
+    repeat: int
+) -> Tuple[float, int]:
+    """
+    Time a benchmark and trace its peak memory.
+
+    Timing runs are not traced, since tracing slows down allocations. The
+    peak is measured in one additional run and only covers allocations
+    made through Python's allocators, e.g. NumPy arrays, but not memory
+    allocated by GEOS.
+
+    Returns:
+        Tuple[float, int]: Fastest runtime in seconds and peak memory in
+        bytes.
+    """
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        benchmark(sets)
+        seconds.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        benchmark(sets)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return min(seconds), peak
+
+
+def run(
+    sizes: List[int],
+    functions: List[str],
+    repeat: int = 3,
+    max_dense_cells: float = 1e8,
+    **synthetic
+) -> List[dict]:
+    """
+    Run the benchmarks of the given functions for all sizes.
+
+    Args:
+        sizes (List[int]): Numbers of validation circles.
+        functions (List[str]): Names of the benchmarked functions.
+        repeat (int): Number of timed runs, the fastest is reported.
+        max_dense_cells (float): Skip functions in `DENSE` if both set
+            sizes multiplied exceed this number.
+        **synthetic: Arguments of `synthetic_circles`.
+
+    Returns:
+        List[dict]: One record per function and size.
+    """
+    results = []
+    for size in sizes:
+        sets = synthetic_circles(size, **synthetic)
+        shape = (len(sets.predicted), len(sets.validation))
+        for name in functions:
+            record = {
+                "function": name,
+                "validation_circles": shape[1],
+                "predicted_circles": shape[0],
+            }
+            if name in DENSE and shape[0] * shape[1] > max_dense_cells:
+                record["skipped"] = "dense result exceeds --max-dense-cells"
+            else:
+                seconds, peak = measure(BENCHMARKS[name], sets, repeat)
+                record.update(seconds=seconds, peak_bytes=peak)
+            print(json.dumps(record), file=sys.stderr)
+            results.append(record)
+    return results
+
+
+def regressions(
+    results: List[dict],
+    baseline: List[dict],
+    tolerance: float
+) -> List[dict]:
+    """
+    Find results slower than the baseline or using more memory than it by
+    more than the tolerance factor.
+    """
+    def key(record: dict) -> Tuple[str, int, int]:
+        return (record["function"], record["validation_circles"],
+                record["predicted_circles"])
+
+    previous = {key(record): record for record in baseline}
+    found = []
+    for record in results:
+        before: Optional[dict] = previous.get(key(record))
+        if before is None or "seconds" not in before or \
+                "seconds" not in record:
+            continue
+        for metric in ("seconds", "peak_bytes"):
+            if record[metric] > tolerance * max(before[metric], 1e-9):
+                found.append({**record, "metric": metric,
+                              "baseline": before[metric]})
+    return found
+
+
+def main() -> int:
+    """
+    Parse the command line, run the benchmarks and write the results.
+
+    Returns:
+        int: 0 on success, 1 if regressions against the baseline were
+        found.
+    """
+    parser = ArgumentParser(
+        formatter_class=ArgumentDefaultsHelpFormatter,
+        description="Benchmark the accuracy assessment metrics on "
+                    "synthetic circles of increasing size."
+    )
+    parser.add_argument(
+        "--sizes", type=int, nargs="+",
+        default=[100, 1_000, 10_000, 100_000, 1_000_000],
+        help="Numbers of validation circles"
+    )
+    parser.add_argument(
+        "--functions", nargs="+", choices=list(BENCHMARKS),
+        default=list(BENCHMARKS), help="Benchmarked functions"
+    )
+    parser.add_argument(
+        "--overlap", type=float, default=0.1,
+        help="Expected number of validation circles intersecting each one"
+    )
+    parser.add_argument(
+        "--detection-rate", type=float, default=0.8,
+        help="Fraction of validation circles detected"
+    )
+    parser.add_argument(
+        "--jitter", type=float, default=0.1,
+        help="Center and radius noise of detections relative to the radius"
+    )
+    parser.add_argument(
+        "--false-positive-rate", type=float, default=0.1,
+        help="False positives relative to the number of validation circles"
+    )
+    parser.add_argument(
+        "--seed", type=int, default=0, help="Seed of the synthetic data"
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=3, help="Number of timed runs"
+    )
+    parser.add_argument(
+        "--max-dense-cells", type=float, default=1e8,
+        help="Skip dense IoU matrices with more cells"
+    )
+    parser.add_argument(
+        "--output", type=str, required=True, help="Output JSON file"
+    )
+    parser.add_argument(
+        "--baseline", type=str, default=None,
+        help="JSON file of an earlier run to compare against"
+    )
+    parser.add_argument(
+        "--tolerance", type=float, default=1.5,
+        help="Factor of runtime or memory above the baseline reported as "
+             "regression"
+    )
+    args = parser.parse_args()
+
+    parameters = {
+        "overlap": args.overlap,
+        "detection_rate": args.detection_rate,
+        "jitter": args.jitter,
+        "false_positive_rate": args.false_positive_rate,
+        "seed": args.seed,
+    }
+    results = run(args.sizes, args.functions, args.repeat,
+                  args.max_dense_cells, **parameters)
+
+    report = {
+        "metadata": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "numpy": np.__version__,
+            "shapely": shapely.__version__,
+            "geopandas": gpd.__version__,
+            "repeat": args.repeat,
+            "parameters": parameters,
+        },
+        "results": results,
+    }
+    status = 0
+    if args.baseline is not None:
+        with open(args.baseline, encoding="utf-8") as file:
+            found = regressions(results, json.load(file)["results"],
+                                args.tolerance)
+        report["regressions"] = found
+        for record in found:
+            print(f"Regression: {record['function']} with "
+                  f"{record['validation_circles']} circles, "
+                  f"{record['metric']} {record[record['metric']]:.4g} "
+                  f"(baseline {record['baseline']:.4g})", file=sys.stderr)
+        status = 1 if found else 0
+
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump(report, file, indent=2)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
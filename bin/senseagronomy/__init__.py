@@ -4,8 +4,14 @@ imports key components for scene analysis.
 """
 
 from senseagronomy.scene import Scene, Pixel, Aerosol, Cloud, Radsat
+from senseagronomy.preprocessing import Preprocessor, PreparedImage
+from senseagronomy.detectorbackend import (
+    DetectorBackend, HoughBackend, TemplateBackend, RadiusBand
+)
 from senseagronomy.circledetector import CircleDetector
 from senseagronomy.spatialtransformer import SpatialTransformer
+from senseagronomy.archive import DetectionArchive
+from senseagronomy.validation import ValidationCache
 from senseagronomy.accuracy_assessment import accuracy_assessment
 
 __all__ = [
@@ -14,7 +20,15 @@ __all__ = [
         "Aerosol",
         "Cloud",
         "Radsat",
+        "Preprocessor",
+        "PreparedImage",
+        "DetectorBackend",
+        "HoughBackend",
+        "TemplateBackend",
+        "RadiusBand",
         "CircleDetector",
-        "SpatialTransformer"
+        "SpatialTransformer",
+        "DetectionArchive",
+        "ValidationCache",
         "accuracy_assessment"
     ]
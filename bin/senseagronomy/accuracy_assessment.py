@@ -2,16 +2,24 @@ import geopandas as gpd
 from shapely.geometry import Point
 import numpy as np
 import os
+from math import fsum
 from shapely.strtree import STRtree
+import shapely
 import pandas as pd
+from scipy.optimize import linear_sum_assignment
+from scipy.sparse import coo_array, csr_array
+from scipy.sparse.csgraph import connected_components
+from senseagronomy.circles import circle_iou, circle_pairs, circle_parameters, frame_parameters
+from senseagronomy.validation import ValidationCache, ValidationLayer
 
-def load_geopackage(file_path, layer=None):
+def load_geopackage(file_path, layer=None, fid_as_index=False):
     """
     Loads GeoPackage file and returns a GeoDataFrame for later processing.
 
     Parameters:
     - file_path (str): The path to the GeoPackage file.
     - layer (str, optional): The name of the layer to load from the GeoPackage file. If not specified, all layers will be loaded.
+    - fid_as_index (bool, optional): Index the features by their feature ID instead of their position.
 
     Returns:
     - gdf (GeoDataFrame): The loaded GeoDataFrame.
@@ -21,7 +29,7 @@ def load_geopackage(file_path, layer=None):
     """
     if not os.path.exists(file_path):
         raise FileNotFoundError(f"File not found: {file_path}")
-    return gpd.read_file(file_path, layer=layer)
+    return gpd.read_file(file_path, layer=layer, fid_as_index=fid_as_index)
 
 def create_circle(center, radius):
     """
@@ -37,6 +45,20 @@ def create_circle(center, radius):
     """
     return Point(center).buffer(radius)
 
+def create_circles(centers, radii, quad_segs=16):
+    """
+    Generates many circular geometries at once, the vectorized counterpart of `create_circle` for synthetic data sets.
+
+    Parameters:
+    - centers (ndarray): The coordinates of the centers of the circles, shape (N, 2).
+    - radii (ndarray): The radii of the circles.
+    - quad_segs (int, optional): Number of segments per quarter circle. Default is 16, as used by `create_circle`.
+
+    Returns:
+    - circles (ndarray): Array of shapely Polygon objects representing the circles.
+    """
+    return shapely.buffer(shapely.points(np.asarray(centers, dtype=np.float64)), radii, quad_segs=quad_segs)
+
 def compute_iou(circle1, circle2):
     """
     This function calculates the Intersection over Union (IoU) value between two circle geometries.
@@ -55,37 +77,225 @@ def compute_iou(circle1, circle2):
     union = circle1.union(circle2).area
     return intersection / union
 
-def match_circles(predicted_circles, validation_circles, iou_threshold=0.5):
+def circle_pair_iou(predicted_params, validation_params):
+    """
+    Computes the IoU of all intersecting pairs of predicted and validation circles in closed form.
+
+    Parameters:
+    - predicted_params (ndarray): Center x, center y and radius of the predicted circles, shape (N, 3).
+    - validation_params (ndarray): Center x, center y and radius of the validation circles, shape (M, 3).
+
+    Returns:
+    - pred_idx (ndarray): Positions of the predicted circles of all pairs.
+    - val_idx (ndarray): Positions of the validation circles of all pairs.
+    - iou (ndarray): The IoU of all pairs.
+    """
+    val_idx, pred_idx = circle_pairs(validation_params, predicted_params)
+    order = np.lexsort((val_idx, pred_idx))
+    pred_idx, val_idx = pred_idx[order], val_idx[order]
+    return pred_idx, val_idx, circle_iou(predicted_params[pred_idx], validation_params[val_idx])
+
+def overlay_iou(predicted, validation):
+    """
+    Computes the IoU of pairs of geometries by polygon overlay.
+
+    Parameters:
+    - predicted (ndarray): Predicted geometries.
+    - validation (ndarray): Validation geometries, paired element by element.
+
+    Returns:
+    - iou (ndarray): The IoU of all pairs.
+    """
+    intersection = shapely.area(shapely.intersection(predicted, validation))
+    union = shapely.area(shapely.union(predicted, validation))
+    return intersection / union
+
+def pairwise_iou(predicted, validation, analytic=False):
+    """
+    Computes the IoU of all intersecting pairs of predicted and validation geometries. Candidate pairs are found with a spatial index.
+
+    Parameters:
+    - predicted (ndarray): Array of predicted geometries.
+    - validation (ndarray): Array of validation geometries.
+    - analytic (bool, optional): Compute IoU in closed form from circles fitted to the geometries instead of polygon overlay.
+
+    Returns:
+    - pred_idx (ndarray): Positions of the predicted geometries of all pairs.
+    - val_idx (ndarray): Positions of the validation geometries of all pairs.
+    - iou (ndarray): The IoU of all pairs.
+    """
+    if analytic:
+        return circle_pair_iou(circle_parameters(predicted), circle_parameters(validation))
+
+    pred_idx, val_idx = STRtree(validation).query(predicted, predicate='intersects')
+    return pred_idx, val_idx, overlay_iou(predicted[pred_idx], validation[val_idx])
+
+def layer_pairwise_iou(predicted, layer, analytic=False):
+    """
+    Computes the IoU of all intersecting pairs of predicted geometries and a cached validation layer, with the same result as
+    `pairwise_iou`. Candidate pairs are found on the cached bounding boxes and only the validation geometries of candidate
+    pairs are decoded. In analytic mode the cached circle parameters are used and no validation geometry is decoded.
+
+    Parameters:
+    - predicted (ndarray): Array of predicted geometries.
+    - layer (ValidationLayer): The cached validation layer.
+    - analytic (bool, optional): Compute IoU in closed form from circles fitted to the geometries instead of polygon overlay.
+
+    Returns:
+    - pred_idx (ndarray): Positions of the predicted geometries of all pairs.
+    - val_idx (ndarray): Positions of the validation geometries of all pairs.
+    - iou (ndarray): The IoU of all pairs.
+    """
+    if analytic:
+        return circle_pair_iou(circle_parameters(predicted), np.asarray(layer.circles))
+
+    pred_idx, val_idx = layer.tree().query(predicted, predicate='intersects')
+    candidates, inverse = np.unique(val_idx, return_inverse=True)
+    validation = layer.geometries(candidates)[inverse.reshape(-1)]
+    hit = shapely.intersects(predicted[pred_idx], validation)
+    return pred_idx[hit], val_idx[hit], overlay_iou(predicted[pred_idx[hit]], validation[hit])
+
+def sparse_iou_matrix(y_pred, y_true, analytic=False):
+    """
+    Calculates the IoU between predicted and true geometries as a sparse matrix. Only spatially intersecting pairs are
+    evaluated and stored, so memory scales with the number of overlaps instead of the product of both counts.
+
+    Parameters:
+    - y_pred (list): List of predicted geometries.
+    - y_true (list or ValidationLayer): List of true geometries or a cached validation layer, see `layer_pairwise_iou`.
+    - analytic (bool, optional): Compute IoU in closed form from circles fitted to the geometries instead of polygon overlay.
+
+    Returns:
+    - res (csr_array): Sparse matrix of shape (len(y_pred), len(y_true)) holding the IoU of all intersecting pairs.
+    """
+    if isinstance(y_true, ValidationLayer):
+        pred_idx, true_idx, iou = layer_pairwise_iou(np.asarray(y_pred), y_true, analytic)
+    else:
+        pred_idx, true_idx, iou = pairwise_iou(np.asarray(y_pred), np.asarray(y_true), analytic)
+    return csr_array((iou, (pred_idx, true_idx)), shape=(len(y_pred), len(y_true)))
+
+def matching_components(iou, iou_threshold=0.5):
+    """
+    Labels the connected components of the bipartite graph of pairs above the IoU threshold. Matching decisions of
+    `optimal_matching` and `score_matching` only depend on the pairs within a component.
+
+    Parameters:
+    - iou (csr_array): Sparse IoU matrix as returned by `sparse_iou_matrix`.
+    - iou_threshold (float, optional): The IoU threshold for matching. Default is 0.5.
+
+    Returns:
+    - pred_component (ndarray): Component of every predicted geometry.
+    - true_component (ndarray): Component of every true geometry.
+    """
+    iou = iou.tocoo()
+    above = iou.data > iou_threshold
+    n_pred, n_true = iou.shape
+    graph = coo_array(
+        (np.ones(np.count_nonzero(above), dtype=np.int8), (iou.row[above], iou.col[above] + n_pred)),
+        shape=(n_pred + n_true, n_pred + n_true)
+    )
+    _, component = connected_components(graph, directed=False)
+    return component[:n_pred], component[n_pred:]
+
+def optimal_matching(iou, iou_threshold=0.5):
+    """
+    Finds the one-to-one assignment of predicted to true geometries with the most matches above the IoU threshold and,
+    among those, the highest total IoU. The assignment is solved independently for each connected component of the graph of
+    pairs above the threshold, which are small for circle data.
+
+    Parameters:
+    - iou (csr_array): Sparse IoU matrix as returned by `sparse_iou_matrix`.
+    - iou_threshold (float, optional): The IoU threshold for matching. Default is 0.5.
+
+    Returns:
+    - pred_idx (ndarray): Positions of the matched predicted geometries, sorted.
+    - true_idx (ndarray): Positions of the matched true geometries.
+    """
+    iou = iou.tocoo()
+    above = iou.data > iou_threshold
+    rows, cols, values = iou.row[above], iou.col[above], iou.data[above]
+    edge_component = matching_components(iou, iou_threshold)[0][rows]
+    order = np.argsort(edge_component, kind='stable')
+    rows, cols, values, edge_component = rows[order], cols[order], values[order], edge_component[order]
+    starts = np.flatnonzero(np.concatenate([[True], edge_component[1:] != edge_component[:-1]])) if rows.size else []
+    ends = np.append(starts[1:], rows.size) if rows.size else []
+
+    matched_pred, matched_true = [], []
+    for start, end in zip(starts, ends):
+        if end - start == 1:
+            matched_pred.append(rows[start:end])
+            matched_true.append(cols[start:end])
+            continue
+        sub_rows, row_local = np.unique(rows[start:end], return_inverse=True)
+        sub_cols, col_local = np.unique(cols[start:end], return_inverse=True)
+        # every match outweighs any IoU gain, so the number of matches is maximized first
+        weight = np.zeros((sub_rows.size, sub_cols.size))
+        weight[row_local, col_local] = min(weight.shape) + 1 + values[start:end]
+        assigned_rows, assigned_cols = linear_sum_assignment(weight, maximize=True)
+        valid = weight[assigned_rows, assigned_cols] > 0
+        matched_pred.append(sub_rows[assigned_rows[valid]])
+        matched_true.append(sub_cols[assigned_cols[valid]])
+
+    if not matched_pred:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+    pred_idx = np.concatenate(matched_pred).astype(np.intp)
+    true_idx = np.concatenate(matched_true).astype(np.intp)
+    order = np.argsort(pred_idx)
+    return pred_idx[order], true_idx[order]
+
+def match_circles(predicted_circles, validation_circles, iou_threshold=0.5, analytic=False, optimal=False):
     """
     Compares each predicted circle to validation circles to identify true positives (correctly matched circles), false positives
     (incorrectly predicted circles), and false negatives (missed validation circles) based on the specified IoU threshold, in our case 0.5 
     (as it had good testing results). 
 
+    By default, each predicted circle is matched to the first validation circle (in the order of the GeoDataFrame) whose IoU
+    exceeds the threshold, so a validation circle can be matched several times. With `optimal`, circles are matched one-to-one
+    by `optimal_matching` instead. Candidate pairs are found with a spatial index, so IoU is only computed for intersecting circles.
+
     Parameters:
     - predicted_circles (GeoDataFrame): The predicted circles as a GeoDataFrame.
     - validation_circles (GeoDataFrame): The validation circles as a GeoDataFrame.
     - iou_threshold (float, optional): The IoU threshold for matching circles. Default is 0.5.
+    - analytic (bool, optional): Compute IoU in closed form from circles fitted to the geometries instead of polygon overlay.
+      Much faster, results agree with polygon IoU within the tolerance documented in `circles.circle_iou`. Default is False.
+    - optimal (bool, optional): Match one-to-one with the most matches and highest total IoU. Default is False.
 
     Returns:
     - tp (list): List of tuples representing true positive matches, where each tuple contains the indices of the matched circles.
     - fp (list): List of indices representing false positive matches.
     - fn (list): List of indices representing false negative matches.
     """
-    tp, fp, fn = [], [], []
-    for i, pred_circle in predicted_circles.iterrows():
-        matched = False
-        for j, val_circle in validation_circles.iterrows():
-            if compute_iou(pred_circle.geometry, val_circle.geometry) > iou_threshold:
-                tp.append((i, j))
-                matched = True
-                break
-        if not matched:
-            fp.append(i)
-
-    matched_validation = [j for _, j in tp]
-    for j, val_circle in validation_circles.iterrows():
-        if j not in matched_validation:
-            fn.append(j)
+    predicted = np.asarray(predicted_circles.geometry.values)
+    validation = np.asarray(validation_circles.geometry.values)
+
+    if optimal:
+        pred_idx, val_idx = optimal_matching(sparse_iou_matrix(predicted, validation, analytic), iou_threshold)
+        match = np.full(len(predicted), -1, dtype=np.intp)
+        match[pred_idx] = val_idx
+    elif iou_threshold < 0 and len(validation) > 0:
+        # every pair, intersecting or not, exceeds a negative threshold
+        match = np.zeros(len(predicted), dtype=np.intp)
+    else:
+        pred_idx, val_idx, iou = pairwise_iou(predicted, validation, analytic)
+        above = iou > iou_threshold
+        pred_idx, val_idx = pred_idx[above], val_idx[above]
+
+        # first validation circle per predicted circle
+        order = np.lexsort((val_idx, pred_idx))
+        first_pred, first = np.unique(pred_idx[order], return_index=True)
+        match = np.full(len(predicted), -1, dtype=np.intp)
+        match[first_pred] = val_idx[order][first]
+
+    pred_labels = predicted_circles.index
+    val_labels = validation_circles.index
+    matched = match >= 0
+    tp = list(zip(pred_labels[matched], val_labels[match[matched]]))
+    fp = list(pred_labels[~matched])
+
+    matched_validation = np.zeros(len(validation), dtype=bool)
+    matched_validation[match[matched]] = True
+    fn = list(val_labels[~matched_validation])
 
     return tp, fp, fn
 
@@ -115,8 +325,8 @@ def calculate_iou(predicted_circles, validation_circles):
     """
     Calculates the average Intersection over Union (IoU) for all matched circles.
     The IoU is a measure of the overlap between two geometries. In the context of circle geometries,
-    it represents the overlap between the area of two circles.
-    
+    it represents the overlap between the area of two circles. Only intersecting pairs, found with a single spatial index query, are evaluated.
+
     Parameters:
     - predicted_circles (GeoDataFrame): The predicted circles as a GeoDataFrame.
     - validation_circles (GeoDataFrame): The validation circles as a GeoDataFrame.
@@ -124,19 +334,16 @@ def calculate_iou(predicted_circles, validation_circles):
     Returns:
     - average_iou (float): The average IoU value for all matched circles.
     """
-    total_iou = 0
-    match_count = 0
-    for pred_circle in predicted_circles.geometry:
-        best_iou = 0
-        for val_circle in validation_circles.geometry:
-            iou = compute_iou(pred_circle, val_circle)
-            if iou > best_iou:
-                best_iou = iou
-        total_iou += best_iou
-        match_count += 1 if best_iou > 0 else 0
+    predicted = np.asarray(predicted_circles.geometry.values)
+    pred_idx, _, iou = pairwise_iou(predicted, np.asarray(validation_circles.geometry.values))
+    best_iou = np.zeros(len(predicted))
+    np.maximum.at(best_iou, pred_idx, iou)
+    # summed in order of the predictions like a running total
+    total_iou = sum(best_iou.tolist())
+    match_count = np.count_nonzero(best_iou > 0)
     return total_iou / match_count if match_count > 0 else 0
 
-def iou_matrix(y_pred, y_true):
+def iou_matrix(y_pred, y_true, analytic=False):
     """
     Calculates the Intersection over Union (IoU) matrix between predicted and true geometries.
     The IoU matrix is a square matrix where each element represents the IoU value between a predicted geometry and a true geometry.
@@ -144,23 +351,18 @@ def iou_matrix(y_pred, y_true):
     Parameters:
     - y_pred (list): List of predicted geometries.
     - y_true (list): List of true geometries.
+    - analytic (bool, optional): Compute IoU in closed form from circles fitted to the geometries, only for intersecting pairs.
 
     Returns:
     - res (ndarray): The IoU matrix, where each element represents the IoU value between a predicted geometry and a true geometry.
     """
-    res = np.zeros((len(y_pred), len(y_true)))
-    for i, p_pred in enumerate(y_pred):
-        for j, p_true in enumerate(y_true):
-            intersection = p_pred.intersection(p_true).area
-            union = p_pred.union(p_true).area + 1E-8
-            iou = intersection / union
-            res[i, j] = iou
-    return res
+    return sparse_iou_matrix(y_pred, y_true, analytic).toarray()
 
 def oversegmentation_factor(y_true, y_pred, threshold=0.5):
     """
     Calculates the oversegmentation factor, which measures the extent to which the predicted geometries exceed the necessary number of
-    segments. A higher value indicates a tendency to oversegment.
+    segments. A higher value indicates a tendency to oversegment. Candidate pairs are found with a single spatial index query
+    and their intersections are computed at once.
 
     Parameters:
     - y_true (list): List of true geometries.
@@ -170,48 +372,491 @@ def oversegmentation_factor(y_true, y_pred, threshold=0.5):
     Returns:
     - float: The oversegmentation factor.
     """
-    overlapping_polygons = 0
-    y_pred_tree = STRtree(y_pred)
-    for p_true in y_true:
-        intersecting_indices = y_pred_tree.query(p_true)
-        intersecting_polygons = [y_pred[idx] for idx in intersecting_indices]
-        for p_inter in intersecting_polygons:
-            a = p_inter.area
-            intersection = p_true.intersection(p_inter).area
-            if intersection / a > threshold:
-                overlapping_polygons += 1
+    y_true = np.asarray(y_true, dtype=object)
+    y_pred = np.asarray(y_pred, dtype=object)
+    true_idx, pred_idx = STRtree(y_pred).query(y_true)
+    intersection = shapely.area(shapely.intersection(y_true[true_idx], y_pred[pred_idx]))
+    overlapping_polygons = np.count_nonzero(intersection / shapely.area(y_pred[pred_idx]) > threshold)
     return overlapping_polygons / len(y_true) if len(y_true) > 0 else 0
 
-def accuracy_assessment(pred_file, val_file, val_layer):
+def pair_iou(iou, pred_idx, true_idx):
+    """
+    Looks up the IoU of pairs in a sparse IoU matrix.
+
+    Parameters:
+    - iou (csr_array): Sparse IoU matrix as returned by `sparse_iou_matrix`.
+    - pred_idx (ndarray): Positions of the predicted geometries.
+    - true_idx (ndarray): Positions of the true geometries.
+
+    Returns:
+    - iou (ndarray): The IoU of every pair.
+    """
+    if len(pred_idx) == 0:
+        return np.empty(0)
+    return np.asarray(iou.tocsr()[pred_idx, true_idx], dtype=np.float64)
+
+def covered_fraction(pairs, pred_area, true_area):
+    """
+    Calculates the share of the predicted area covered by the true geometry for every pair, which follows from the IoU and
+    both areas as IoU = I / (A + B - I).
+
+    Parameters:
+    - pairs (coo_array): Sparse IoU matrix of the pairs.
+    - pred_area (ndarray): Area of every predicted geometry.
+    - true_area (ndarray): Area of every true geometry.
+
+    Returns:
+    - coverage (ndarray): Covered share of the predicted area of every pair.
+    """
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return pairs.data * (pred_area[pairs.row] + true_area[pairs.col]) / ((1 + pairs.data) * pred_area[pairs.row])
+
+def threshold_metrics(iou_threshold, n_pred, n_true, matched_iou, average_iou, overlapping):
+    """
+    Derives the metrics of one IoU threshold from the matches.
+
+    Parameters:
+    - iou_threshold (float): The IoU threshold.
+    - n_pred (int): Number of predicted geometries.
+    - n_true (int): Number of true geometries.
+    - matched_iou (ndarray): IoU of every match.
+    - average_iou (float): Mean best IoU of all predictions overlapping any true geometry.
+    - overlapping (int): Number of pairs covering more than the threshold of the predicted area.
+
+    Returns:
+    - metric (dict): One row of the table returned by `evaluate_thresholds`, without average precision.
+    """
+    tp = len(matched_iou)
+    fp, fn = n_pred - tp, n_true - tp
+    precision = tp / (tp + fp) if tp else 0
+    recall = tp / (tp + fn) if tp else 0
+    return {
+        'iou_threshold': iou_threshold,
+        'tp': tp,
+        'fp': fp,
+        'fn': fn,
+        'precision': precision,
+        'recall': recall,
+        'f1_score': 2 * (precision * recall) / (precision + recall) if (precision + recall) > 0 else 0,
+        'matched_iou': fsum(matched_iou) / tp if tp else 0,
+        'average_iou': average_iou,
+        'oversegmentation_factor': overlapping / n_true if n_true > 0 else 0
+    }
+
+def count_metrics(tp, fp, fn):
+    """
+    Vectorised version of `calculate_metrics` for arrays of counts.
+
+    Parameters:
+    - tp (ndarray): Numbers of true positives.
+    - fp (ndarray): Numbers of false positives.
+    - fn (ndarray): Numbers of false negatives.
+
+    Returns:
+    - precision (ndarray): The precision values.
+    - recall (ndarray): The recall values.
+    - f1_score (ndarray): The F1-score values.
+    """
+    tp, fp, fn = (np.asarray(count, dtype=np.float64) for count in (tp, fp, fn))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        precision = np.where(tp > 0, tp / (tp + fp), 0.0)
+        recall = np.where(tp > 0, tp / (tp + fn), 0.0)
+        f1_score = np.where(precision + recall > 0, 2 * precision * recall / (precision + recall), 0.0)
+    return precision, recall, f1_score
+
+def bootstrap_counts(counts, replicates=1000, blocked=False, rng=None, chunk_size=256):
+    """
+    Resamples the outcomes of the fields, i.e. matched pairs, unmatched predictions and unmatched validation circles, with
+    replacement. Only the counts of the outcomes are drawn, from a multinomial distribution, so no matching is repeated.
+
+    Parameters:
+    - counts (ndarray): Numbers of true positives, false positives and false negatives of every block, shape (K, 3).
+    - replicates (int, optional): Number of bootstrap replicates. Default is 1000.
+    - blocked (bool, optional): Resample whole blocks, e.g. tiles, instead of individual outcomes, which accounts for spatial
+      correlation of the errors. Default is False.
+    - rng (Generator, optional): Random number generator.
+    - chunk_size (int, optional): Number of replicates drawn at once when resampling blocks, bounds the memory of the weights.
+
+    Returns:
+    - counts (ndarray): Resampled numbers of true positives, false positives and false negatives, shape (replicates, 3).
+    """
+    rng = np.random.default_rng(rng)
+    counts = np.asarray(counts, dtype=np.int64).reshape((-1, 3))
+    if not blocked:
+        total = counts.sum(axis=0)
+        if total.sum() == 0:
+            return np.zeros((replicates, 3), dtype=np.int64)
+        return rng.multinomial(total.sum(), total / total.sum(), size=replicates)
+
+    resampled = np.empty((replicates, 3), dtype=np.int64)
+    for start in range(0, replicates, chunk_size):
+        size = min(chunk_size, replicates - start)
+        weights = rng.multinomial(len(counts), np.full(len(counts), 1 / len(counts)), size=size)
+        resampled[start:start + size] = weights @ counts
+    return resampled
+
+def bootstrap_intervals(counts, replicates=1000, confidence=0.95, blocked=False, rng=None):
+    """
+    Calculates percentile bootstrap confidence intervals of precision, recall and F1-score.
+
+    Parameters:
+    - counts (ndarray): Numbers of true positives, false positives and false negatives of every block, shape (K, 3).
+    - replicates (int, optional): Number of bootstrap replicates. Default is 1000.
+    - confidence (float, optional): Confidence level of the intervals. Default is 0.95.
+    - blocked (bool, optional): Resample whole blocks instead of individual outcomes, see `bootstrap_counts`.
+    - rng (Generator, optional): Random number generator.
+
+    Returns:
+    - intervals (dict): Lower and upper bounds as `precision_low`, `precision_high`, `recall_low`, ... .
+    """
+    resampled = bootstrap_counts(counts, replicates, blocked, rng)
+    quantiles = ((1 - confidence) / 2, (1 + confidence) / 2)
+    intervals = {}
+    for name, values in zip(('precision', 'recall', 'f1_score'), count_metrics(*resampled.T)):
+        intervals[f'{name}_low'], intervals[f'{name}_high'] = np.quantile(values, quantiles)
+    return intervals
+
+def outcome_blocks(predicted, validation, pred_idx, val_idx, block_size):
+    """
+    Counts the outcomes per block of a regular grid. Matched pairs and unmatched validation circles are located by the
+    validation circle, unmatched predictions by the prediction.
+
+    Parameters:
+    - predicted (ndarray): Predicted geometries.
+    - validation (ndarray): Validation geometries.
+    - pred_idx (ndarray): Positions of the matched predicted geometries.
+    - val_idx (ndarray): Positions of the matched validation geometries.
+    - block_size (float): Edge length of the blocks in map units.
+
+    Returns:
+    - counts (ndarray): Numbers of true positives, false positives and false negatives of every non-empty block, shape (K, 3).
+    """
+    def blocks(geometries):
+        points = shapely.get_coordinates(shapely.point_on_surface(geometries)).reshape((-1, 2))
+        return np.floor(points / block_size).astype(np.int64)
+
+    pred_matched = np.zeros(len(predicted), dtype=bool)
+    pred_matched[pred_idx] = True
+    val_matched = np.zeros(len(validation), dtype=bool)
+    val_matched[val_idx] = True
+    val_blocks = blocks(validation)
+    pred_blocks = blocks(predicted[~pred_matched])
+
+    cells = np.concatenate([val_blocks, pred_blocks])
+    outcome = np.concatenate([np.where(val_matched, 0, 2), np.ones(len(pred_blocks), dtype=np.int64)])
+    _, block = np.unique(cells, axis=0, return_inverse=True)
+    block = block.reshape(-1)
+    counts = np.zeros((block.max() + 1 if block.size else 0, 3), dtype=np.int64)
+    np.add.at(counts, (block, outcome), 1)
+    return counts
+
+GROUP_COLUMNS = ('year', 'tile')
+
+def pair_errors(predicted_circles, validation_circles):
+    """
+    Calculates the errors of matched pairs of circles. Radii and centers are taken from the `x`, `y` and `radius` columns if
+    present and fitted to the geometries otherwise, see `circles.frame_parameters`.
+
+    Parameters:
+    - predicted_circles (GeoDataFrame): The matched predicted circles.
+    - validation_circles (GeoDataFrame): The validation circles matched to them, row by row.
+
+    Returns:
+    - errors (DataFrame): One row per pair with the indices of both circles, the `year` and `tile` of the prediction if present,
+      both areas, the area error (predicted minus validation) absolute and relative, both radii, the radius error and the
+      distance between the centers.
+    """
+    predicted_area = shapely.area(np.asarray(predicted_circles.geometry.values))
+    validation_area = shapely.area(np.asarray(validation_circles.geometry.values))
+    predicted = frame_parameters(predicted_circles).reshape((-1, 3))
+    validation = frame_parameters(validation_circles).reshape((-1, 3))
+
+    errors = pd.DataFrame({
+        'predicted_id': predicted_circles.index.to_numpy(),
+        'validation_id': validation_circles.index.to_numpy()
+    })
+    for column in GROUP_COLUMNS:
+        if column in predicted_circles.columns:
+            errors[column] = predicted_circles[column].to_numpy()
+    with np.errstate(invalid='ignore', divide='ignore'):
+        errors['predicted_area'] = predicted_area
+        errors['validation_area'] = validation_area
+        errors['area_error'] = predicted_area - validation_area
+        errors['relative_area_error'] = errors['area_error'] / validation_area
+        errors['predicted_radius'] = predicted[:, 2]
+        errors['validation_radius'] = validation[:, 2]
+        errors['radius_error'] = predicted[:, 2] - validation[:, 2]
+        errors['center_offset'] = np.hypot(predicted[:, 0] - validation[:, 0], predicted[:, 1] - validation[:, 1])
+    return errors
+
+def area_bias(errors, by=GROUP_COLUMNS):
+    """
+    Aggregates the errors of matched pairs into the total area bias per group.
+
+    Parameters:
+    - errors (DataFrame): Errors of matched pairs as returned by `pair_errors`.
+    - by (list, optional): Columns to group by, missing columns are ignored. Default is year and tile.
+
+    Returns:
+    - bias (DataFrame): One row per group with the number of pairs, the total predicted and validation area, the total area bias
+      absolute and relative to the validation area, the mean radius error, the mean absolute radius error and the mean center offset.
+    """
+    by = [column for column in by if column in errors.columns]
+    keys = [errors[column] for column in by] if by else np.zeros(len(errors), dtype=np.int8)
+    bias = errors.assign(absolute_radius_error=errors['radius_error'].abs()).groupby(keys, dropna=False, sort=True).agg(
+        pairs=('area_error', 'size'),
+        predicted_area=('predicted_area', 'sum'),
+        validation_area=('validation_area', 'sum'),
+        area_bias=('area_error', 'sum'),
+        mean_radius_error=('radius_error', 'mean'),
+        mean_absolute_radius_error=('absolute_radius_error', 'mean'),
+        mean_center_offset=('center_offset', 'mean')
+    )
+    with np.errstate(invalid='ignore', divide='ignore'):
+        bias.insert(4, 'relative_area_bias', bias['area_bias'] / bias['validation_area'])
+    return bias.reset_index() if by else bias.reset_index(drop=True)
+
+def area_bias_levels(errors, levels=(('year',), GROUP_COLUMNS)):
+    """
+    Aggregates the errors of matched pairs at several levels of grouping into one table, see `area_bias`.
+
+    Parameters:
+    - errors (DataFrame): Errors of matched pairs as returned by `pair_errors`.
+    - levels (list, optional): Lists of columns to group by, one block of rows each. Default is per year and per year and tile.
+      Missing columns are ignored and levels grouping by the same present columns are only reported once.
+
+    Returns:
+    - bias (DataFrame): The rows of all levels, with a `level` column naming the grouping columns separated by "/", or "total"
+      if there are none, followed by the grouping columns, empty for levels not grouping by them.
+    """
+    frames = {}
+    for level in levels:
+        by = tuple(column for column in level if column in errors.columns)
+        if by not in frames:
+            frames[by] = area_bias(errors, by).assign(level='/'.join(by) or 'total')
+    group = list(dict.fromkeys(column for by in frames for column in by))
+    bias = pd.concat(frames.values(), ignore_index=True)
+    return bias[['level'] + group + [column for column in bias.columns if column not in group and column != 'level']]
+
+DEFAULT_THRESHOLDS = tuple(np.round(np.arange(0.5, 0.96, 0.05), 2))
+
+def score_matching(iou, scores, iou_threshold=0.5):
+    """
+    Matches predictions in order of descending score to the unmatched true geometry with the highest IoU above the threshold,
+    as done for average precision in object detection benchmarks.
+
+    Parameters:
+    - iou (csr_array): Sparse IoU matrix as returned by `sparse_iou_matrix`.
+    - scores (ndarray): Detection score of every prediction.
+    - iou_threshold (float, optional): The IoU threshold for matching. Default is 0.5.
+
+    Returns:
+    - order (ndarray): Positions of the predictions by descending score.
+    - matched (ndarray): Whether each prediction in that order is a true positive.
+    """
+    order = np.argsort(-np.asarray(scores, dtype=np.float64), kind='stable')
+    rank = np.empty(order.size, dtype=np.intp)
+    rank[order] = np.arange(order.size)
+
+    iou = iou.tocoo()
+    above = iou.data > iou_threshold
+    rows, cols, values = iou.row[above], iou.col[above], iou.data[above]
+    candidates = np.lexsort((-values, rank[rows]))
+
+    matched = np.zeros(order.size, dtype=bool)
+    used = np.zeros(iou.shape[1], dtype=bool)
+    for i, j in zip(rank[rows[candidates]].tolist(), cols[candidates].tolist()):
+        if matched[i] or used[j]:
+            continue
+        matched[i] = used[j] = True
+    return order, matched
+
+def precision_recall_curve(iou, scores, iou_threshold=0.5):
+    """
+    Calculates precision and recall for every cut-off of the detection scores.
+
+    Parameters:
+    - iou (csr_array): Sparse IoU matrix as returned by `sparse_iou_matrix`.
+    - scores (ndarray): Detection score of every prediction.
+    - iou_threshold (float, optional): The IoU threshold for matching. Default is 0.5.
+
+    Returns:
+    - curve (DataFrame): Score, precision and recall when keeping all predictions scored at least as high, by descending score.
+    """
+    order, matched = score_matching(iou, scores, iou_threshold)
+    return precision_recall_from_matches(np.asarray(scores, dtype=np.float64)[order], matched, iou.shape[1])
+
+def precision_recall_from_matches(scores, matched, n_true):
+    """
+    Calculates the precision-recall curve from predictions already matched in order of descending score.
+
+    Parameters:
+    - scores (ndarray): Detection scores by descending score.
+    - matched (ndarray): Whether each prediction is a true positive.
+    - n_true (int): Number of true geometries.
+
+    Returns:
+    - curve (DataFrame): Score, precision and recall when keeping all predictions scored at least as high, by descending score.
+    """
+    tp = np.cumsum(matched)
+    fp = np.cumsum(~np.asarray(matched, dtype=bool))
+    return pd.DataFrame({
+        'score': scores,
+        'precision': tp / np.maximum(tp + fp, 1),
+        'recall': tp / n_true if n_true > 0 else np.zeros(tp.size)
+    })
+
+def stack_curves(curves):
+    """
+    Stacks the precision-recall curves of several IoU thresholds into one table.
+
+    Parameters:
+    - curves (dict): Precision-recall curves as returned by `precision_recall_curve` by IoU threshold.
+
+    Returns:
+    - table (DataFrame): IoU threshold, score, precision and recall of every point of every curve.
+    """
+    columns = ['iou_threshold', 'score', 'precision', 'recall']
+    if not curves:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(
+        [curve.assign(iou_threshold=threshold) for threshold, curve in curves.items()], ignore_index=True
+    ).loc[:, columns]
+
+def average_precision(curve):
+    """
+    Calculates the average precision, i.e. the area under the precision-recall curve with precision interpolated to be
+    monotonically decreasing.
+
+    Parameters:
+    - curve (DataFrame): Precision-recall curve as returned by `precision_recall_curve`.
+
+    Returns:
+    - float: The average precision.
+    """
+    precision = np.maximum.accumulate(curve['precision'].to_numpy()[::-1])[::-1]
+    recall = np.concatenate([[0], curve['recall'].to_numpy()])
+    return float(np.sum(np.diff(recall) * precision))
+
+def evaluate_thresholds(predicted_circles, validation_circles, thresholds=DEFAULT_THRESHOLDS, score_column=None,
+                        analytic=False, iou=None, bootstrap=0, block_size=None, confidence=0.95, seed=None):
+    """
+    Evaluates the predicted circles at several IoU thresholds. The IoU of all intersecting pairs is computed once and every
+    metric is derived from it, so additional thresholds come at almost no cost. Matches are one-to-one as in `optimal_matching`.
+    Sums are exact (`math.fsum`), so the results do not depend on the order of the circles.
+
+    Parameters:
+    - predicted_circles (GeoDataFrame): The predicted circles as a GeoDataFrame.
+    - validation_circles (GeoDataFrame or ValidationLayer): The validation circles as a GeoDataFrame or a cached validation
+      layer, whose geometries are only decoded for candidate pairs and a blocked bootstrap.
+    - thresholds (list, optional): IoU thresholds to evaluate. Default is 0.5 to 0.95 in steps of 0.05.
+    - score_column (str, optional): Column of the detection scores. If given, the average precision is calculated as well.
+    - analytic (bool, optional): Compute IoU in closed form from circles fitted to the geometries instead of polygon overlay.
+    - iou (csr_array, optional): Precomputed IoU matrix as returned by `sparse_iou_matrix`.
+    - bootstrap (int, optional): Number of bootstrap replicates of the confidence intervals, see `bootstrap_intervals`.
+      Intervals are not calculated if 0, the default.
+    - block_size (float, optional): Resample blocks of this size in map units, e.g. datacube tiles, instead of individual fields.
+    - confidence (float, optional): Confidence level of the intervals. Default is 0.95.
+    - seed (int, optional): Seed of the bootstrap.
+
+    Returns:
+    - results_df (DataFrame): One row per threshold with the counts of true positives, false positives and false negatives,
+      precision, recall, F1-score, mean IoU of the matches, average IoU, oversegmentation factor and, with scores, average precision.
+      Average IoU is the mean best IoU of all predictions overlapping any validation circle and does not depend on the threshold.
+      With bootstrap, the bounds of the confidence intervals are added as `precision_low`, `precision_high` and so on.
+    """
+    predicted = np.asarray(predicted_circles.geometry.values)
+    if isinstance(validation_circles, ValidationLayer):
+        validation, validation_area = validation_circles, np.asarray(validation_circles.areas)
+    else:
+        validation = np.asarray(validation_circles.geometry.values)
+        validation_area = shapely.area(validation)
+    if iou is None:
+        iou = sparse_iou_matrix(predicted, validation, analytic)
+    pairs = iou.tocoo()
+
+    best_iou = np.zeros(len(predicted))
+    np.maximum.at(best_iou, pairs.row, pairs.data)
+    average_iou = fsum(best_iou[best_iou > 0]) / np.count_nonzero(best_iou > 0) if np.any(best_iou > 0) else 0
+
+    coverage = covered_fraction(pairs, shapely.area(predicted), validation_area)
+    if bootstrap > 0 and block_size is not None and isinstance(validation, ValidationLayer):
+        # blocks are located by the geometries, which are only decoded here
+        validation = validation.geometries()
+
+    rng = np.random.default_rng(seed)
+    metrics = []
+    for threshold in thresholds:
+        pred_idx, val_idx = optimal_matching(iou, threshold)
+        metric = threshold_metrics(
+            threshold, len(predicted), len(validation), pair_iou(iou, pred_idx, val_idx), average_iou,
+            np.count_nonzero(coverage > threshold)
+        )
+        if score_column is not None:
+            curve = precision_recall_curve(iou, predicted_circles[score_column].to_numpy(), threshold)
+            metric['average_precision'] = average_precision(curve)
+        if bootstrap > 0:
+            if block_size is None:
+                counts = np.array([[metric['tp'], metric['fp'], metric['fn']]])
+            else:
+                counts = outcome_blocks(predicted, validation, pred_idx, val_idx, block_size)
+            metric.update(bootstrap_intervals(counts, bootstrap, confidence, block_size is not None, rng))
+        metrics.append(metric)
+
+    return pd.DataFrame(metrics)
+
+def accuracy_assessment(pred_file, val_file, val_layer, thresholds=(0.5,), score_column=None, cache_dir=None, bootstrap=0,
+                        block_size=None, confidence=0.95, seed=None):
     """
     This function evaluates the accuracy of the predicted circle geometries by comparing them with the validation geometries.
-    It calculates precision, recall, F1-score, average IoU, and oversegmentation factor.
+    It calculates precision, recall, F1-score, average IoU, and oversegmentation factor for each IoU threshold, see `evaluate_thresholds`.
 
     Parameters:
     - pred_file (str): Path to the predicted GeoPackage file.
     - val_file (str): Path to the validation GeoPackage file.
     - val_layer (str): Name of the layer in the validation GeoPackage file.
+    - thresholds (list, optional): IoU thresholds to evaluate. Default is 0.5 only.
+    - score_column (str, optional): Column of the detection scores used for average precision.
+    - cache_dir (str, optional): Directory of the validation cache, see `ValidationCache`. The validation layer is read from the
+      GeoPackage on every call if not given.
+    - bootstrap (int, optional): Number of bootstrap replicates of confidence intervals, none are calculated if 0.
+    - block_size (float, optional): Size of the blocks of a spatially blocked bootstrap, fields are resampled if not given.
+    - confidence (float, optional): Confidence level of the intervals. Default is 0.95.
+    - seed (int, optional): Seed of the bootstrap.
 
     Returns:
     - results_df (DataFrame): DataFrame containing the accuracy assessment results, including precision, recall, F1-score, average IoU, and oversegmentation factor.
+    - tp (list): True positive matches as (predicted, validation) feature ID pairs at an IoU threshold of 0.5, the same IDs as
+      used by `TiledAssessment`.
+    - predicted_circles (GeoDataFrame): The predicted circles, indexed by feature ID.
+    - errors (DataFrame): Errors of the true positives, see `pair_errors`.
+    - curves (dict): Precision-recall curves by IoU threshold, see `precision_recall_curve`. Empty without score column.
     """
     iou_threshold = 0.5
-    metrics = []
-    
-    validation_circles = load_geopackage(val_file, layer=val_layer)
-    predicted_circles = load_geopackage(pred_file)
-
-    tp, fp, fn = match_circles(validation_circles, predicted_circles, iou_threshold)
-    precision, recall, f1_score = calculate_metrics(tp, fp, fn)
-    average_iou = calculate_iou(predicted_circles, validation_circles)
-    overseg_factor = oversegmentation_factor(validation_circles.geometry, predicted_circles.geometry, iou_threshold)
-
-    metrics.append({
-        'precision': precision, 
-        'recall': recall, 
-        'f1_score': f1_score,
-        'average_iou': average_iou,
-        'oversegmentation_factor': overseg_factor
-    })
 
-    return pd.DataFrame(metrics), tp, predicted_circles
+    if cache_dir is None:
+        validation_circles = load_geopackage(val_file, layer=val_layer, fid_as_index=True)
+        validation = validation_circles.geometry.values
+    else:
+        # the cached layer is used as is, geometries are only decoded where needed
+        validation_circles = validation = ValidationCache(cache_dir).load(val_file, val_layer)
+    predicted_circles = load_geopackage(pred_file, fid_as_index=True)
+
+    iou = sparse_iou_matrix(predicted_circles.geometry.values, validation)
+    results_df = evaluate_thresholds(
+        predicted_circles, validation_circles, thresholds, score_column, iou=iou, bootstrap=bootstrap, block_size=block_size,
+        confidence=confidence, seed=seed
+    )
+    pred_idx, val_idx = optimal_matching(iou, iou_threshold)
+    if cache_dir is None:
+        matched = validation_circles.iloc[val_idx]
+    else:
+        matched = validation_circles.take(val_idx)
+    tp = list(zip(predicted_circles.index[pred_idx], matched.index))
+    errors = pair_errors(predicted_circles.iloc[pred_idx], matched)
+    curves = {}
+    if score_column is not None:
+        scores = predicted_circles[score_column].to_numpy()
+        curves = {threshold: precision_recall_curve(iou, scores, threshold) for threshold in thresholds}
+
+    return results_df, tp, predicted_circles, errors, curves
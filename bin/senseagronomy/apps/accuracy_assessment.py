@@ -1,7 +1,35 @@
 from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter, Namespace
 #from accuracy_assessment import accuracy_assessment
+import os
 import pandas as pd
+import geopandas as gpd
+import pyogrio
 from senseagronomy import accuracy_assessment
+from senseagronomy.accuracy_assessment import area_bias_levels, pair_errors, stack_curves
+from senseagronomy.tiled_assessment import Source, TiledAssessment
+from senseagronomy.writer import GeoPackageWriter
+
+def read_features(source, fids):
+    """
+    Reads the features of a source with the given feature IDs, in their order and indexed by them.
+    """
+    if len(fids) == 0:
+        return gpd.read_file(source.filename, layer=source.layer, max_features=1, fid_as_index=True).iloc[:0]
+    return gpd.read_file(source.filename, layer=source.layer, fids=fids, fid_as_index=True).loc[fids]
+
+def flag_correct(source, fids, chunk_size=100_000):
+    """
+    Reads a source chunk by chunk and adds the "correct" column, True for the given feature IDs. Only one chunk is held in
+    memory at a time.
+    """
+    fids = pd.Index(fids)
+    count = pyogrio.read_info(source.filename, layer=source.layer)["features"]
+    for start in range(0, count, chunk_size):
+        chunk = gpd.read_file(
+            source.filename, layer=source.layer, skip_features=start, max_features=chunk_size, fid_as_index=True
+        )
+        chunk["correct"] = chunk.index.isin(fids)
+        yield chunk
 
 def main() -> int:
     """
@@ -14,7 +42,20 @@ def main() -> int:
     --predicted-file: Path to the predicted GeoPackage file.
     --validation-layer: Name of the layer in the validation GeoPackage file.
     --output-file: Path to the output CSV file.
-    --tp-output-file: Path to the output GeoPackage file for true positives.
+    --tp-output-file: Path to the output GeoPackage file for true positives. The errors of the true positives are written
+      next to it as <name>_pairs.parquet and the area bias per year and per year and tile as <name>_area_bias.csv, with a
+      level column naming the grouping of every row.
+    --thresholds: IoU thresholds to evaluate, one row of the CSV file each.
+    --score-column: Column of the detection scores for average precision. The precision-recall curves of all thresholds are
+      written next to the CSV file as <name>_pr_curve.csv.
+    --cache-dir: Directory of the validation cache.
+    --tile-size: Evaluate tile by tile in parallel with tiles of this size.
+    --halo: Margin read around every tile.
+    --workers: Number of processes of the tiled evaluation.
+    --bootstrap: Number of bootstrap replicates of confidence intervals.
+    --bootstrap-block-size: Size of the blocks of a spatially blocked bootstrap.
+    --confidence: Confidence level of the intervals.
+    --seed: Seed of the bootstrap.
 
     Returns:
     - int: Returns 0 if the program runs successfully.
@@ -58,19 +99,107 @@ def main() -> int:
         required=True,
         help='Path to the output GeoPackage file for true positives.'
     )
+    parser.add_argument(
+        '--thresholds',
+        type=float,
+        nargs='+',
+        default=[0.5],
+        help='IoU thresholds to evaluate, e.g. 0.5 0.55 ... 0.95. True positives are always written for 0.5.'
+    )
+    parser.add_argument(
+        '--score-column',
+        type=str,
+        default=None,
+        help='Column of the detection scores in the predicted file. If given, average precision is reported as well and the '
+             'precision-recall curves are written to <output-file stem>_pr_curve.csv.'
+    )
+    parser.add_argument(
+        '--cache-dir',
+        type=str,
+        default=None,
+        help='Directory to cache validation layers in. Repeated assessments load cached layers instead of reading the GeoPackage.'
+    )
+    parser.add_argument(
+        '--tile-size',
+        type=float,
+        default=None,
+        help='Evaluate tile by tile in a process pool with tiles of this size in map units instead of loading both layers at once. '
+             'Results are identical.'
+    )
+    parser.add_argument(
+        '--halo',
+        type=float,
+        default=1000.0,
+        help='Margin in map units read around every tile, should exceed the largest circle diameter.'
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=None,
+        help='Number of processes of the tiled evaluation, defaults to the number of CPUs.'
+    )
+    parser.add_argument(
+        '--bootstrap',
+        type=int,
+        default=0,
+        help='Number of bootstrap replicates. If positive, confidence intervals of precision, recall and F1-score are added to the CSV.'
+    )
+    parser.add_argument(
+        '--bootstrap-block-size',
+        type=float,
+        default=None,
+        help='Resample blocks of this size in map units, e.g. datacube tiles, instead of individual fields.'
+    )
+    parser.add_argument(
+        '--confidence',
+        type=float,
+        default=0.95,
+        help='Confidence level of the bootstrap intervals.'
+    )
+    parser.add_argument(
+        '--seed',
+        type=int,
+        default=None,
+        help='Seed of the bootstrap.'
+    )
 
     args: Namespace = parser.parse_args()
+    if args.tile_size is not None and args.bootstrap > 0:
+        parser.error('--bootstrap is not supported with --tile-size.')
+    if args.tile_size is not None and args.cache_dir is not None:
+        parser.error('--cache-dir is not supported with --tile-size.')
 
     # Perform accuracy assessment
-    results_df, tp, predicted_circles = accuracy_assessment(args.predicted_file, args.validation_file, args.validation_layer)
+    if args.tile_size is None:
+        results_df, tp, predicted_circles, errors, curves = accuracy_assessment(
+            args.predicted_file, args.validation_file, args.validation_layer, args.thresholds, args.score_column, args.cache_dir,
+            args.bootstrap, args.bootstrap_block_size, args.confidence, args.seed
+        )
+    else:
+        predicted, validation = Source(args.predicted_file), Source(args.validation_file, args.validation_layer)
+        assessment = TiledAssessment(args.tile_size, args.halo, workers=args.workers)
+        results_df, tp = assessment.assess(predicted, validation, args.thresholds, args.score_column)
+        curves = assessment.curves
+        # matches refer to feature IDs, only matched circles are read
+        errors = pair_errors(read_features(predicted, [i for i, _ in tp]), read_features(validation, [j for _, j in tp]))
     results_df.to_csv(args.output_file, index=False)
+    if args.score_column is not None:
+        stack_curves(curves).to_csv(f"{os.path.splitext(args.output_file)[0]}_pr_curve.csv", index=False)
+
+    # Errors of the true positives and the area bias per year and per year and tile next to the GeoPackage
+    output_stem = os.path.splitext(args.tp_output_file)[0]
+    errors.to_parquet(f"{output_stem}_pairs.parquet", index=False)
+    area_bias_levels(errors).to_csv(f"{output_stem}_area_bias.csv", index=False)
 
     # Save true positives to a GeoPackage and add "correct" column to predicted_circles
-    predicted_circles["correct"] = False
     tp_indices = [i for i, _ in tp]
-    predicted_circles.loc[tp_indices, "correct"] = True
-
-    predicted_circles.to_file(args.tp_output_file, driver="GPKG")
+    if args.tile_size is None:
+        predicted_circles["correct"] = False
+        predicted_circles.loc[tp_indices, "correct"] = True
+        predicted_circles.to_file(args.tp_output_file, driver="GPKG")
+    else:
+        # the predicted circles are copied chunk by chunk in tiled mode
+        GeoPackageWriter(args.tp_output_file, os.path.basename(output_stem)).write(flag_correct(predicted, tp_indices))
 
     return 0
 
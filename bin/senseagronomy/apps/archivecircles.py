@@ -0,0 +1,58 @@
+"""
+This module adds detected circles to the partitioned GeoParquet archive.
+"""
+
+import sys
+from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter, Namespace
+from senseagronomy import DetectionArchive
+from senseagronomy.merging import read_layers
+
+
+def main() -> int:
+    """
+    Main function to parse arguments and archive circles.
+    """
+    parser = ArgumentParser(
+        formatter_class=ArgumentDefaultsHelpFormatter,
+        description=(
+            "This program adds circles to a GeoParquet dataset partitioned "
+            "by year and tile. Partitions present in the input replace the "
+            "archived ones. Circles need the year and tile columns written "
+            "by detectcircle."
+        )
+    )
+    parser.add_argument(
+        '--input',
+        type=str,
+        nargs='+',
+        required=True,
+        help='List of input GeoPackage or GeoParquet files'
+    )
+    parser.add_argument(
+        '--archive',
+        type=str,
+        required=True,
+        help='Directory of the archive'
+    )
+    parser.add_argument(
+        '--row-group-size',
+        type=int,
+        default=4096,
+        help=(
+            'Maximum number of circles per row group. Smaller row groups '
+            'allow finer pruning by bounding box'
+        )
+    )
+
+    args: Namespace = parser.parse_args()
+
+    archive = DetectionArchive(args.archive, args.row_group_size)
+    try:
+        count = archive.add(read_layers(args.input))
+    except ValueError as exc:
+        sys.stderr.write(f"Error: {exc}\n")
+        return 1
+
+    sys.stderr.write(f"Archived {count} circles in {args.archive}\n")
+
+    return 0
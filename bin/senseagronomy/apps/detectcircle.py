@@ -1,13 +1,122 @@
 """
 This module detects circles in images and saves their
-coordinates to a JSON file.
+coordinates to a JSON file, or georeferenced to a GeoPackage or
+GeoParquet file.
 """
 
 import os
+import sys
 import json
-from typing import List, Dict, Tuple
+from typing import List, Dict, Optional, Tuple
 from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter, Namespace
-from senseagronomy import CircleDetector
+import numpy as np
+import pandas as pd
+from senseagronomy import CircleDetector, HoughBackend, TemplateBackend
+from senseagronomy import Preprocessor, RadiusBand, SpatialTransformer
+from senseagronomy.spatialtransformer import parse_image_name
+
+VECTOR_EXTENSIONS: Tuple[str, ...] = ('.gpkg', '.parquet')
+
+
+def radius_band(value: str) -> Tuple[int, int, int]:
+    """Parse a radius band given as MIN:MAX or MIN:MAX:DECIMATION."""
+    try:
+        parts = [int(v) for v in value.split(":")]
+        if len(parts) == 2:
+            parts.append(1)
+        minimum, maximum, decimation = parts
+    except ValueError as exc:
+        raise ValueError(
+            "Radius bands must be given as MIN:MAX or MIN:MAX:DECIMATION, "
+            f"got '{value}'"
+        ) from exc
+    return minimum, maximum, decimation
+
+
+def write_report(filename: str, report: Dict[str, float]) -> None:
+    """Write the window statistics of a detection to stderr."""
+    sys.stderr.write(
+        f"{filename}: skipped {report['skipped']} of "
+        f"{report['windows']} windows, detection took "
+        f"{report['detection_seconds']:.2f}s, "
+        f"saved ~{report['estimated_seconds_saved']:.2f}s\n"
+    )
+
+
+def write_json(
+    detector: CircleDetector,
+    inputs: List[str],
+    output: str
+) -> None:
+    """Detect circles and write their image coordinates to a JSON file."""
+    coordinates: Dict[str, List[List[Tuple[float, float]]]] = {}
+
+    for filepath in inputs:
+        # Extract the file name from the full path
+        filename = os.path.basename(filepath)
+        circle_points = detector.detect_circles(filepath)
+        if circle_points is not None:
+            coordinates[filename] = circle_points
+            write_report(filename, detector.window_report)
+
+    # Write the coordinates to a JSON file
+    with open(output, 'w', encoding='utf-8') as json_file:
+        json.dump(coordinates, json_file, ensure_ascii=False, indent=4)
+
+
+def write_vector(
+    detector: CircleDetector,
+    inputs: List[str],
+    output: str,
+    layer: Optional[str] = None,
+    append: bool = False
+) -> None:
+    """
+    Detect circles, georeference them with the transform of their image
+    and write them to a GeoPackage or GeoParquet file.
+
+    Raises:
+        ValueError: If the images have different coordinate reference
+            systems.
+    """
+    circles: List[np.ndarray] = [np.empty((0, 4))]
+    names: List[str] = []
+    crs = None
+
+    for filepath in inputs:
+        filename = os.path.basename(filepath)
+        detection = detector.detect_georeferenced(filepath)
+        if detection is None:
+            continue
+        image_circles, image_crs = detection
+        if crs is not None and image_crs != crs:
+            raise ValueError(
+                f"Coordinate reference system of {filename} differs from "
+                "previous images."
+            )
+        crs = image_crs
+        circles.append(image_circles)
+        names.extend([filename] * len(image_circles))
+        write_report(filename, detector.window_report)
+
+    circles_array = np.concatenate(circles)
+    tiles, years = zip(*map(parse_image_name, names)) if names else ((), ())
+    transformer = SpatialTransformer()
+    gdf = transformer.create_geodataframe_from_circles(
+        circles_array,
+        crs,
+        {
+            "image": names,
+            "tile": list(tiles),
+            "year": pd.array(list(years), dtype="Int64"),
+            "x": circles_array[:, 0],
+            "y": circles_array[:, 1],
+            "radius": circles_array[:, 2],
+            "score": circles_array[:, 3],
+        },
+        quad_segs=max(detector.num_points // 4, 1)
+    )
+    transformer.save_geodataframe(gdf, output, layer, append)
 
 
 def main() -> int:
@@ -18,7 +127,10 @@ def main() -> int:
         formatter_class=ArgumentDefaultsHelpFormatter,
         description=(
             "This program is used to detect circles in images "
-            "and save their coordinates to a JSON file."
+            "and save their coordinates to a JSON file. If the output "
+            "file ends in .gpkg or .parquet, circles are georeferenced with "
+            "the transform and CRS of their image and written as GeoPackage "
+            "or GeoParquet."
         )
     )
     parser.add_argument(
@@ -32,24 +144,144 @@ def main() -> int:
         '--output',
         type=str,
         required=True,
-        help='Path to the output JSON file'
+        help='Path to the output JSON, GeoPackage or GeoParquet file'
+    )
+    parser.add_argument(
+        '--layer',
+        type=str,
+        required=False,
+        help=(
+            'GeoPackage layer to write to. Defaults to the output file name '
+            'without extension'
+        )
+    )
+    parser.add_argument(
+        '--append',
+        action='store_true',
+        help='Append to an existing GeoPackage layer instead of replacing it'
+    )
+    parser.add_argument(
+        '--backend',
+        type=str,
+        choices=['hough', 'template'],
+        default='hough',
+        help=(
+            'Detection engine. "hough" uses the Hough Circle Transform, '
+            '"template" uses FFT-based disk template matching'
+        )
+    )
+    parser.add_argument(
+        '--min-radius',
+        type=int,
+        default=8,
+        help='Minimum circle radius in pixels'
+    )
+    parser.add_argument(
+        '--max-radius',
+        type=int,
+        default=20,
+        help='Maximum circle radius in pixels'
+    )
+    parser.add_argument(
+        '--radius-bands',
+        type=radius_band,
+        nargs='+',
+        required=False,
+        metavar='MIN:MAX[:DECIMATION]',
+        help=(
+            'Radius bands in full resolution pixels, detected concurrently '
+            'and merged afterwards. Images are decimated by the optional '
+            'factor for a band. Overrides --min-radius and --max-radius'
+        )
+    )
+    parser.add_argument(
+        '--nodata',
+        type=float,
+        required=False,
+        help='Nodata value of the input images. Defaults to image metadata'
+    )
+    parser.add_argument(
+        '--percentiles',
+        type=float,
+        nargs=2,
+        default=[1.0, 99.9],
+        metavar=('LOWER', 'UPPER'),
+        help='Percentiles of valid pixels scaled to 0 and 255'
+    )
+    parser.add_argument(
+        '--cache-dir',
+        type=str,
+        required=False,
+        help=(
+            'Directory to cache preprocessed images in. Repeated runs on the '
+            'same images with the same preprocessing parameters reuse them'
+        )
+    )
+    parser.add_argument(
+        '--window-size',
+        type=int,
+        required=False,
+        help=(
+            'Size of the windows in pixels which are checked for possible '
+            'fields before detection. By default, images are not split'
+        )
+    )
+    parser.add_argument(
+        '--min-valid-fraction',
+        type=float,
+        default=0.0,
+        help='Minimum fraction of valid pixels for a window to be processed'
+    )
+    parser.add_argument(
+        '--min-ndvi',
+        type=float,
+        required=False,
+        help='Minimum maximal NDVI for a window to be processed'
+    )
+    parser.add_argument(
+        '--min-ndvi-std',
+        type=float,
+        required=False,
+        help='Minimum NDVI standard deviation for a window to be processed'
     )
 
     args: Namespace = parser.parse_args()
 
-    detector = CircleDetector()
-
-    coordinates: Dict[str, List[List[Tuple[float, float]]]] = {}
-
-    for filepath in args.input:
-        # Extract the file name from the full path
-        filename = os.path.basename(filepath)
-        circle_points = detector.detect_circles(filepath)
-        if circle_points is not None:
-            coordinates[filename] = circle_points
+    backend_class = TemplateBackend if args.backend == 'template' \
+        else HoughBackend
+    backend = backend_class(
+        min_radius=args.min_radius, max_radius=args.max_radius
+    )
+    bands = [
+        RadiusBand(
+            backend_class(
+                min_radius=max(minimum // decimation, 1),
+                max_radius=-(-maximum // decimation),
+                min_dist=2 * minimum / decimation
+            ),
+            decimation
+        )
+        for minimum, maximum, decimation in args.radius_bands or []
+    ]
+    preprocessor = Preprocessor(
+        nodata=args.nodata,
+        lower_percentile=args.percentiles[0],
+        upper_percentile=args.percentiles[1],
+        window_size=args.window_size,
+        min_valid_fraction=args.min_valid_fraction,
+        min_ndvi=args.min_ndvi,
+        min_ndvi_std=args.min_ndvi_std,
+        cache_dir=args.cache_dir
+    )
+    detector = CircleDetector(
+        backend=backend, preprocessor=preprocessor, bands=bands
+    )
 
-    # Write the coordinates to a JSON file
-    with open(args.output, 'w', encoding='utf-8') as json_file:
-        json.dump(coordinates, json_file, ensure_ascii=False, indent=4)
+    if args.output.endswith(VECTOR_EXTENSIONS):
+        write_vector(
+            detector, args.input, args.output, args.layer, args.append
+        )
+    else:
+        write_json(detector, args.input, args.output)
 
     return 0
@@ -0,0 +1,82 @@
+"""
+This module merges the circle layers of all tiles of a year into a single
+layer and removes duplicate detections of fields on tile borders.
+"""
+
+import sys
+from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter, Namespace
+from senseagronomy.merging import deduplicate_circles, read_layers
+from senseagronomy.writer import GeoPackageWriter
+
+
+def main() -> int:
+    """
+    Main function to parse arguments and merge circle layers.
+    """
+    parser = ArgumentParser(
+        formatter_class=ArgumentDefaultsHelpFormatter,
+        description=(
+            "This program reads all layers of the given circle files, "
+            "clusters circles detected in several tiles by IoU and center "
+            "distance, keeps the best scoring circle of each cluster and "
+            "writes the result to a single GeoPackage layer."
+        )
+    )
+    parser.add_argument(
+        '--input',
+        type=str,
+        nargs='+',
+        required=True,
+        help='List of input GeoPackage or GeoParquet files'
+    )
+    parser.add_argument(
+        '--output',
+        type=str,
+        required=True,
+        help='Path to the output GeoPackage file'
+    )
+    parser.add_argument(
+        '--layer',
+        type=str,
+        required=True,
+        help='Name of the output layer, e.g. the year'
+    )
+    parser.add_argument(
+        '--iou-threshold',
+        type=float,
+        default=0.5,
+        help='Minimum IoU of two circles to be considered duplicates'
+    )
+    parser.add_argument(
+        '--distance-fraction',
+        type=float,
+        default=0.5,
+        help=(
+            'Maximum center distance of two circles, relative to the '
+            'smaller radius, to be considered duplicates'
+        )
+    )
+    parser.add_argument(
+        '--score-column',
+        type=str,
+        default='score',
+        help='Column used to pick the best circle of a cluster'
+    )
+
+    args: Namespace = parser.parse_args()
+
+    circles = read_layers(args.input)
+    merged = deduplicate_circles(
+        circles,
+        iou_threshold=args.iou_threshold,
+        distance_fraction=args.distance_fraction,
+        score_column=args.score_column
+    )
+    GeoPackageWriter(args.output, args.layer).write([merged])
+
+    sys.stderr.write(
+        f"Merged {len(circles)} circles into {len(merged)}, removed "
+        f"{len(circles) - len(merged)} duplicates\n"
+    )
+
+    return 0
@@ -0,0 +1,90 @@
+"""
+This module burns detected circles into a label raster aligned to the grid
+of a reference image.
+"""
+
+import sys
+from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter, Namespace
+import rasterio
+from senseagronomy.circles import PARAMETER_COLUMNS, frame_parameters
+from senseagronomy.merging import read_layers
+from senseagronomy.rasterizer import CircleRasterizer
+
+
+def main() -> int:
+    """
+    Main function to parse arguments and rasterize circles.
+    """
+    parser = ArgumentParser(
+        formatter_class=ArgumentDefaultsHelpFormatter,
+        description=(
+            "This program burns circles into a tiled GeoTIFF on the grid of "
+            "a reference image, e.g. the spectral temporal metric of a tile "
+            "and year. Pixels whose center lies within a circle are set to "
+            "1 or to the value of the ID column."
+        )
+    )
+    parser.add_argument(
+        '--input',
+        type=str,
+        nargs='+',
+        required=True,
+        help='List of input GeoPackage or GeoParquet files'
+    )
+    parser.add_argument(
+        '--reference',
+        type=str,
+        required=True,
+        help='Raster defining grid and CRS of the output'
+    )
+    parser.add_argument(
+        '--output',
+        type=str,
+        required=True,
+        help='Path to the output GeoTIFF'
+    )
+    parser.add_argument(
+        '--id-column',
+        type=str,
+        required=False,
+        help=(
+            'Column with positive integer labels, e.g. field_id + 1. By '
+            'default, a binary mask is written'
+        )
+    )
+    parser.add_argument(
+        '--window-size',
+        type=int,
+        default=512,
+        help='Size of the processed windows and output tiles in pixels'
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        required=False,
+        help='Number of threads. Defaults to the number of CPUs'
+    )
+
+    args: Namespace = parser.parse_args()
+
+    with rasterio.open(args.reference) as reference:
+        transform = reference.transform
+        shape = reference.shape
+        crs = reference.crs
+
+    circles = read_layers(args.input)
+    if crs is not None and circles.crs is not None and circles.crs != crs:
+        # stored parameters are in the original CRS, fit them anew
+        circles = circles.to_crs(crs).drop(
+            columns=list(PARAMETER_COLUMNS), errors="ignore"
+        )
+    values = None
+    if args.id_column is not None:
+        values = circles[args.id_column].to_numpy()
+
+    CircleRasterizer(args.window_size, args.workers).write(
+        args.output, frame_parameters(circles), transform, shape, crs, values
+    )
+    sys.stderr.write(f"Rasterized {len(circles)} circles to {args.output}\n")
+
+    return 0
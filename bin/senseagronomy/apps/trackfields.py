@@ -0,0 +1,112 @@
+"""
+This module links the circles of several years into a field history.
+"""
+
+import re
+import sys
+from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter, Namespace
+from typing import Dict
+import geopandas as gpd
+from senseagronomy import SpatialTransformer
+from senseagronomy.merging import read_layers
+from senseagronomy.tracking import track_fields
+
+YEAR = re.compile(r"(?<!\d)(\d{4})(?!\d)")
+
+
+def read_years(filenames) -> Dict[int, gpd.GeoDataFrame]:
+    """
+    Read one file per year. The year is taken from the file name, e.g.
+    `2020_circles.gpkg`.
+
+    Raises:
+        ValueError: If a file name contains no year or a year occurs twice.
+    """
+    layers: Dict[int, gpd.GeoDataFrame] = {}
+    for filename in filenames:
+        match = YEAR.search(filename.rsplit("/", 1)[-1])
+        if match is None:
+            raise ValueError(f"No year in file name {filename}.")
+        year = int(match.group(1))
+        if year in layers:
+            raise ValueError(f"Year {year} given twice.")
+        layers[year] = read_layers([filename])
+    return layers
+
+
+def main() -> int:
+    """
+    Main function to parse arguments and track fields.
+    """
+    parser = ArgumentParser(
+        formatter_class=ArgumentDefaultsHelpFormatter,
+        description=(
+            "This program links the circles of consecutive years by IoU and "
+            "center distance, assigns persistent field IDs and records "
+            "appearing, disappearing and resized fields."
+        )
+    )
+    parser.add_argument(
+        '--input',
+        type=str,
+        nargs='+',
+        required=True,
+        help='Yearly circle files with the year in their name'
+    )
+    parser.add_argument(
+        '--output',
+        type=str,
+        required=True,
+        help='Path to the field history GeoPackage or GeoParquet file'
+    )
+    parser.add_argument(
+        '--events',
+        type=str,
+        required=True,
+        help='Path to the events CSV file'
+    )
+    parser.add_argument(
+        '--iou-threshold',
+        type=float,
+        default=0.5,
+        help='Minimum IoU of two circles to be linked'
+    )
+    parser.add_argument(
+        '--distance-fraction',
+        type=float,
+        default=0.5,
+        help=(
+            'Maximum center distance of two circles, relative to the '
+            'smaller radius, to be linked'
+        )
+    )
+    parser.add_argument(
+        '--resize-tolerance',
+        type=float,
+        default=0.1,
+        help='Relative radius change above which a field counts as resized'
+    )
+
+    args: Namespace = parser.parse_args()
+
+    try:
+        layers = read_years(args.input)
+    except ValueError as exc:
+        sys.stderr.write(f"Error: {exc}\n")
+        return 1
+
+    history, events = track_fields(
+        layers,
+        iou_threshold=args.iou_threshold,
+        distance_fraction=args.distance_fraction,
+        resize_tolerance=args.resize_tolerance
+    )
+    SpatialTransformer().save_geodataframe(history, args.output, "history")
+    events.to_csv(args.events, index=False)
+
+    sys.stderr.write(
+        f"Tracked {history['field_id'].nunique()} fields over "
+        f"{len(layers)} years, {len(events)} events\n"
+    )
+
+    return 0
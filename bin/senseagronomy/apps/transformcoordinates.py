@@ -4,11 +4,167 @@ and save them as a spatial vector dataset.
 """
 
 from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter, Namespace
+from itertools import islice
+import os
 import sys
-from typing import List, Tuple, Dict
+from typing import Iterator, List, Tuple, Dict, Optional, Sequence
+import numpy as np
 import pandas as pd
 import geopandas as gpd
+from pyproj import CRS
+from rasterio.transform import Affine
 from senseagronomy import SpatialTransformer
+from senseagronomy.spatialtransformer import (
+    MANIFEST_COLUMNS, parse_image_name, read_manifest
+)
+from senseagronomy.writer import GeoPackageWriter
+
+
+def manifest_from_arguments(
+    input_files: List[str],
+    origins: List[float],
+    pixel_sizes: List[float],
+    crs: str
+) -> pd.DataFrame:
+    """
+    Builds a manifest from origins and pixel sizes given in the order of
+    the images in the input files.
+
+    Raises:
+        ValueError: If origins or pixel sizes are not given in pairs or do
+            not match the number of images, or if an image name occurs
+            more than once, since circles are matched to their
+            georeference by image name.
+    """
+    if len(origins) % 2 != 0 or len(pixel_sizes) % 2 != 0:
+        raise ValueError(
+            "Origins and pixel sizes should be provided in pairs (x, y)."
+        )
+
+    transformer = SpatialTransformer()
+    names = [
+        name for file_path in input_files
+        for name in transformer.read_json(file_path)
+    ]
+    index = pd.Index(names)
+    duplicated = sorted(index[index.duplicated()].unique())
+    if duplicated:
+        raise ValueError(
+            f"Images occur in several input files: {', '.join(duplicated)}."
+        )
+    if len(origins) != 2 * len(names) or len(pixel_sizes) != 2 * len(names):
+        raise ValueError(
+            f"Expected origins and pixel sizes of {len(names)} images."
+        )
+
+    origins_array = np.reshape(origins, (-1, 2))
+    pixel_sizes_array = np.reshape(pixel_sizes, (-1, 2))
+    zeros = np.zeros(len(names))
+    return pd.DataFrame(
+        dict(zip(MANIFEST_COLUMNS, (
+            names,
+            pixel_sizes_array[:, 0], zeros, origins_array[:, 0],
+            zeros, pixel_sizes_array[:, 1], origins_array[:, 1],
+            [crs] * len(names)
+        )))
+    ).set_index("image")
+
+
+def layer_name(crs: str) -> str:
+    """Derives a layer name from a coordinate reference system."""
+    authority = CRS.from_user_input(crs).to_authority()
+    if authority is None:
+        return "crs_" + "".join(c if c.isalnum() else "_" for c in crs)[:32]
+    return f"{authority[0].lower()}_{authority[1]}"
+
+
+def transform_images(
+    input_files: List[str],
+    manifest: pd.DataFrame,
+    chunk_size: int,
+    known: Optional[pd.Index] = None
+) -> Iterator[gpd.GeoDataFrame]:
+    """
+    Transforms the circles of all images listed in the manifest, which must
+    share one coordinate reference system, and yields one GeoDataFrame per
+    chunk of images. Input files are read one after another, so at most
+    one input file and one chunk are held in memory. Input files are read
+    once per call, i.e. once per coordinate reference system.
+
+    Args:
+        input_files (List[str]): Paths to the input JSON files.
+        manifest (pd.DataFrame): Manifest of the images to transform.
+        chunk_size (int): Number of images per GeoDataFrame.
+        known (Optional[pd.Index]): If given, images of the input files
+            not in this index are reported as missing from the manifest.
+
+    Yields:
+        gpd.GeoDataFrame: Circles of a chunk of images.
+    """
+    transformer = SpatialTransformer()
+    crs = manifest["crs"].iloc[0] if len(manifest) else None
+
+    for file_path in input_files:
+        data = transformer.read_json(file_path)
+        for name in data:
+            if known is not None and name not in known:
+                sys.stderr.write(f"Warning: {name} not in manifest.\n")
+
+        names = iter(
+            name for name, circles in data.items()
+            if name in manifest.index and len(circles) > 0
+        )
+        while chunk := list(islice(names, chunk_size)):
+            coordinates = [
+                transformer.transform_coordinates(
+                    data[name],
+                    transform=Affine(
+                        *manifest.loc[name, ["a", "b", "c", "d", "e", "f"]]
+                    ),
+                    pixel_center=True
+                )
+                for name in chunk
+            ]
+            counts = np.array([len(c) for c in coordinates], dtype=np.int64)
+            if all(isinstance(c, np.ndarray) for c in coordinates) and \
+                    len({c.shape[1] for c in coordinates}) == 1:
+                polygons = np.concatenate(coordinates)
+            else:
+                polygons = [circle for c in coordinates for circle in c]
+
+            tiles, years = zip(*map(parse_image_name, chunk))
+            attributes: Dict[str, Sequence] = {
+                "image": np.repeat(np.array(chunk, dtype=object), counts),
+                "tile": np.repeat(np.array(tiles, dtype=object), counts),
+                "year": pd.array(
+                    np.repeat(np.array(years, dtype=object), counts),
+                    dtype="Int64"
+                ),
+            }
+            yield transformer.create_geodataframe(polygons, crs, attributes)
+
+
+def write_output(
+    frames: Iterator[gpd.GeoDataFrame],
+    output_file: str,
+    layer: Optional[str]
+) -> int:
+    """
+    Writes GeoDataFrames to a GeoPackage layer in one streamed transaction
+    or, for files ending in `.parquet`, to GeoParquet.
+    """
+    if output_file.endswith('.parquet'):
+        frames = list(frames)
+        if not frames:
+            return 0
+        gdf = gpd.GeoDataFrame(
+            pd.concat(frames, ignore_index=True), crs=frames[0].crs
+        )
+        SpatialTransformer().save_geodataframe(gdf, output_file)
+        return len(gdf)
+    if layer is None:
+        layer = os.path.splitext(os.path.basename(output_file))[0]
+    return GeoPackageWriter(output_file, layer).write(frames)
 
 
 def main() -> None:
@@ -19,14 +175,18 @@ def main() -> None:
         formatter_class=ArgumentDefaultsHelpFormatter,
         description=(
             "Transform image coordinates to spatial coordinates "
-            "and save as a spatial vector dataset."
+            "and save as a spatial vector dataset. Images are georeferenced "
+            "with a manifest holding the affine transformation and CRS of "
+            "every image. Images with different CRSs are either reprojected "
+            "to --target-crs or written to one layer per CRS."
         )
     )
     parser.add_argument(
         '--input-file',
         type=str,
+        nargs='+',
         required=True,
-        help='Path to the input JSON file.'
+        help='Path to the input JSON files.'
     )
     parser.add_argument(
         '--output-file',
@@ -34,98 +194,109 @@ def main() -> None:
         required=True,
         help='Path to the output file.'
     )
+    parser.add_argument(
+        '--manifest',
+        type=str,
+        required=False,
+        help=(
+            'CSV, JSON or Parquet file with the columns image, a, b, c, d, '
+            'e, f (affine transformation) and crs.'
+        )
+    )
     parser.add_argument(
         '--origins',
         type=float,
         nargs='+',
-        required=True,
-        help='List of raster origins (x_origin y_origin for each image).'
+        required=False,
+        help=(
+            'List of raster origins (x_origin y_origin for each image). '
+            'Alternative to --manifest for few images.'
+        )
     )
     parser.add_argument(
         '--pixel-sizes',
         type=float,
         nargs='+',
-        required=True,
+        required=False,
         help='List of pixel sizes (x_size y_size for each image).'
     )
     parser.add_argument(
         '--crs',
         type=str,
-        required=True,
-        help='Coordinate Reference System (CRS).'
+        required=False,
+        help='Coordinate Reference System (CRS) of --origins.'
+    )
+    parser.add_argument(
+        '--target-crs',
+        type=str,
+        required=False,
+        help=(
+            'Reproject all circles to this CRS. By default, circles are '
+            'written in the CRS of their image with one layer (or Parquet '
+            'file) per CRS if several occur.'
+        )
+    )
+    parser.add_argument(
+        '--chunk-size',
+        type=int,
+        default=256,
+        help='Number of images transformed and written at once.'
     )
 
     args: Namespace = parser.parse_args()
 
-    # Validate the number of origins and pixel sizes
-    if (
-        len(args.origins) % 2 != 0
-        or len(args.pixel_sizes) % 2 != 0
-    ):
-        sys.stderr.write(
-            "Error: Origins and pixel sizes should be provided in pairs "
-            "(x, y).\n"
-        )
+    try:
+        if args.manifest is not None:
+            manifest = read_manifest(args.manifest)
+        elif None not in (args.origins, args.pixel_sizes, args.crs):
+            manifest = manifest_from_arguments(
+                args.input_file, args.origins, args.pixel_sizes, args.crs
+            )
+        else:
+            raise ValueError(
+                "Either --manifest or --origins, --pixel-sizes and --crs "
+                "must be given."
+            )
+    except ValueError as exc:
+        sys.stderr.write(f"Error: {exc}\n")
         sys.exit(1)
 
-    num_images: int = len(args.origins) // 2
-    origins: List[Tuple[float, float]] = [
-        (args.origins[i * 2], args.origins[i * 2 + 1])
-        for i in range(num_images)
-    ]
-    pixel_sizes: List[Tuple[float, float]] = [
-        (args.pixel_sizes[i * 2], args.pixel_sizes[i * 2 + 1])
-        for i in range(num_images)
-    ]
-    crs: str = args.crs
-
-    transformer: SpatialTransformer = SpatialTransformer()
-
-    # Step 1: Read the JSON file
-    data: Dict[
-        str,
-        List[
-            List[Tuple[float, float]]
-        ]
-    ] = transformer.read_json(args.input_file)
-
-    coordinates: Dict[str, List[List[Tuple[float, float]]]] = {}
-    data_keys = list(data.keys())
-    for key, circle_coordinates in data.items():
-        if key not in data:
-            continue
-
-        # Determine the index of the image based on the key
-        image_index: int = data_keys.index(key)
-
-        # Step 2: Transform coordinates
-        TransformedCirclesType = List[List[Tuple[float, float]]]
-
-        transformed_circles: TransformedCirclesType = (
-            transformer.transform_coordinates(
-                circle_coordinates,
-                origins[image_index],
-                pixel_sizes[image_index]
+    groups: List[Tuple[str, pd.DataFrame]] = list(manifest.groupby("crs"))
+    # report images missing from the manifest only while reading the
+    # input files for the first time
+    known = [manifest.index] + [None] * (len(groups) - 1)
+    if args.target_crs is not None:
+        frames = (
+            gdf.to_crs(args.target_crs)
+            for (_, group), index in zip(groups, known)
+            for gdf in transform_images(
+                args.input_file, group, args.chunk_size, index
             )
         )
-
-        coordinates[key] = transformed_circles
-
-    # Step 3: Create a GeoDataFrame for each image and merge them
-    all_gdfs: List[gpd.GeoDataFrame] = []
-    for transformed_circles in coordinates.values():
-        gdf: gpd.GeoDataFrame = transformer.create_geodataframe(
-            transformed_circles, crs
+        count = write_output(frames, args.output_file, None)
+    elif len(groups) <= 1:
+        count = write_output(
+            transform_images(
+                args.input_file, manifest, args.chunk_size, manifest.index
+            ),
+            args.output_file,
+            None
         )
-        all_gdfs.append(gdf)
-
-    # Merge all GeoDataFrames into one
-    merged_gdf: gpd.GeoDataFrame = gpd.GeoDataFrame(
-        pd.concat(all_gdfs, ignore_index=True)
-    )
+    else:
+        count = 0
+        stem, extension = os.path.splitext(args.output_file)
+        for (crs, group), index in zip(groups, known):
+            output_file = args.output_file
+            if extension == '.parquet':
+                output_file = f"{stem}_{layer_name(crs)}{extension}"
+            count += write_output(
+                transform_images(
+                    args.input_file, group, args.chunk_size, index
+                ),
+                output_file,
+                layer_name(crs)
+            )
 
-    # Step 4: Save the output to SQLite using GeoPackage format
-    transformer.save_geodataframe(merged_gdf, args.output_file)
-    print(f"GeoDataFrame saved to {args.output_file}")
+    print(f"{count} circles saved to {args.output_file}")
 
     return 0
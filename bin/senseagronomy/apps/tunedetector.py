@@ -0,0 +1,163 @@
+"""
+This module evaluates a grid of Hough Circle Transform parameters against
+validation data and reports accuracy and detection runtime per
+configuration.
+"""
+
+import sys
+from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter, Namespace
+from typing import Tuple
+from senseagronomy import Preprocessor
+from senseagronomy.accuracy_assessment import load_geopackage
+from senseagronomy.tuning import parameter_grid, tune
+
+
+def radius_range(value: str) -> Tuple[int, int]:
+    """Parse a radius range given as MIN:MAX."""
+    try:
+        minimum, maximum = (int(v) for v in value.split(":"))
+    except ValueError as exc:
+        raise ValueError(
+            f"Radius range must be given as MIN:MAX, got '{value}'"
+        ) from exc
+    return minimum, maximum
+
+
+def main() -> int:
+    """
+    Main function to parse arguments and evaluate the parameter grid.
+    """
+    parser = ArgumentParser(
+        formatter_class=ArgumentDefaultsHelpFormatter,
+        description=(
+            "This program evaluates all combinations of the given Hough "
+            "Circle Transform parameters on spectral temporal metric chips "
+            "against validation data in parallel. Precision, recall, "
+            "F1-score, average IoU and detection runtime are written to a "
+            "CSV file; configurations on the speed/accuracy Pareto front are "
+            "flagged."
+        )
+    )
+    parser.add_argument(
+        '--input',
+        type=str,
+        nargs='+',
+        required=True,
+        help='List of input image files'
+    )
+    parser.add_argument(
+        '--validation-file',
+        type=str,
+        required=True,
+        help='Path to the validation GeoPackage file.'
+    )
+    parser.add_argument(
+        '--validation-layer',
+        type=str,
+        required=True,
+        help='Layer name in the validation GeoPackage file.'
+    )
+    parser.add_argument(
+        '--output-file',
+        type=str,
+        required=True,
+        help='Path to the output CSV file.'
+    )
+    parser.add_argument(
+        '--dp',
+        type=float,
+        nargs='+',
+        default=[1.0],
+        help='Inverse ratios of the accumulator resolution'
+    )
+    parser.add_argument(
+        '--min-dist',
+        type=float,
+        nargs='+',
+        default=[20.0],
+        help='Minimum distances between circle centers'
+    )
+    parser.add_argument(
+        '--param1',
+        type=float,
+        nargs='+',
+        default=[100.0],
+        help='Higher thresholds of the Canny edge detector'
+    )
+    parser.add_argument(
+        '--param2',
+        type=float,
+        nargs='+',
+        default=[20.0],
+        help='Accumulator thresholds for the circle centers'
+    )
+    parser.add_argument(
+        '--radius-ranges',
+        type=radius_range,
+        nargs='+',
+        default=[(8, 20)],
+        metavar='MIN:MAX',
+        help='Radius ranges in pixels'
+    )
+    parser.add_argument(
+        '--iou-threshold',
+        type=float,
+        default=0.5,
+        help='IoU threshold for matching circles'
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        required=False,
+        help='Number of worker processes. Defaults to the number of CPUs'
+    )
+    parser.add_argument(
+        '--cache-dir',
+        type=str,
+        required=False,
+        help='Directory to cache preprocessed images in'
+    )
+    parser.add_argument(
+        '--window-size',
+        type=int,
+        required=False,
+        help='Size of the windows checked for possible fields'
+    )
+    parser.add_argument(
+        '--min-ndvi',
+        type=float,
+        required=False,
+        help='Minimum maximal NDVI for a window to be processed'
+    )
+
+    args: Namespace = parser.parse_args()
+
+    configs = parameter_grid(
+        args.dp, args.min_dist, args.param1, args.param2, args.radius_ranges
+    )
+    preprocessor = Preprocessor(
+        window_size=args.window_size,
+        min_ndvi=args.min_ndvi,
+        cache_dir=args.cache_dir
+    )
+    validation = load_geopackage(
+        args.validation_file, layer=args.validation_layer
+    )
+
+    try:
+        results = tune(
+            args.input, validation, configs, preprocessor,
+            iou_threshold=args.iou_threshold, workers=args.workers
+        )
+    except ValueError as exc:
+        sys.stderr.write(f"Error: {exc}\n")
+        return 1
+    results.to_csv(args.output_file, index=False)
+
+    best = results.iloc[0]
+    sys.stderr.write(
+        f"Evaluated {len(results)} configurations, best F1-score "
+        f"{best['f1_score']:.3f} in {best['detection_seconds']:.2f}s\n"
+    )
+
+    return 0
@@ -0,0 +1,99 @@
+"""
+This module computes per field NDVI statistics for every year of a tile.
+"""
+
+import sys
+from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter, Namespace
+from typing import Dict
+from senseagronomy.circles import PARAMETER_COLUMNS, frame_parameters
+from senseagronomy.merging import read_layers
+from senseagronomy.spatialtransformer import parse_image_name
+from senseagronomy.zonalstats import ZonalStatistics
+
+
+def main() -> int:
+    """
+    Main function to parse arguments and compute zonal statistics.
+    """
+    parser = ArgumentParser(
+        formatter_class=ArgumentDefaultsHelpFormatter,
+        description=(
+            "This program computes the number of pixels, valid fraction, "
+            "mean and maximum of every field for the rasters of all years "
+            "of a tile. Years are taken from the raster names, e.g. "
+            "X0001_Y0001_2020_max_NDVI.tif."
+        )
+    )
+    parser.add_argument(
+        '--input',
+        type=str,
+        nargs='+',
+        required=True,
+        help='List of input GeoPackage or GeoParquet files with fields'
+    )
+    parser.add_argument(
+        '--rasters',
+        type=str,
+        nargs='+',
+        required=True,
+        help='Yearly rasters of one tile, all on the same grid'
+    )
+    parser.add_argument(
+        '--output',
+        type=str,
+        required=True,
+        help='Path to the output CSV or Parquet file'
+    )
+    parser.add_argument(
+        '--id-column',
+        type=str,
+        required=False,
+        help='Column with field IDs. Defaults to the row number'
+    )
+    parser.add_argument(
+        '--window-size',
+        type=int,
+        default=512,
+        help='Size of the processed windows in pixels'
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        required=False,
+        help='Number of threads. Defaults to the number of CPUs'
+    )
+
+    args: Namespace = parser.parse_args()
+
+    rasters: Dict[int, str] = {}
+    for filename in args.rasters:
+        _, year = parse_image_name(filename)
+        if year is None or year in rasters:
+            sys.stderr.write(f"Error: No unique year for {filename}\n")
+            return 1
+        rasters[year] = filename
+
+    statistics = ZonalStatistics(args.window_size, args.workers)
+    try:
+        _, _, crs = statistics.grid(rasters)
+    except ValueError as exc:
+        sys.stderr.write(f"Error: {exc}\n")
+        return 1
+
+    fields = read_layers(args.input)
+    if crs is not None and fields.crs is not None and fields.crs != crs:
+        # stored parameters are in the original CRS, fit them anew
+        fields = fields.to_crs(crs).drop(
+            columns=list(PARAMETER_COLUMNS), errors="ignore"
+        )
+    field_ids = None
+    if args.id_column is not None:
+        field_ids = fields[args.id_column].to_numpy()
+
+    table = statistics.compute(frame_parameters(fields), rasters, field_ids)
+    if args.output.endswith('.parquet'):
+        table.to_parquet(args.output, index=False)
+    else:
+        table.to_csv(args.output, index=False)
+
+    return 0
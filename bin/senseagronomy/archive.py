@@ -0,0 +1,275 @@
+"""
+archive.py
+
+This module maintains an archive of detected circles as a GeoParquet
+dataset partitioned by year and datacube tile. Every row carries the
+bounding box of its geometry and rows are written in spatially sorted
+row groups, so queries by time range and bounding box skip partitions and
+row groups based on their statistics before any geometry is read.
+"""
+
+import inspect
+import json
+import os
+import uuid
+from typing import Iterable, List, Optional, Tuple
+import geopandas as gpd
+import numpy as np
+import pyarrow as pa
+import pyarrow.dataset as ds
+import shapely
+
+BBOX_COLUMNS = ("xmin", "ymin", "xmax", "ymax")
+
+# row groups are only spatially sorted if rows are written in order, older
+# versions of pyarrow only keep the order when writing single threaded
+ORDER_OPTIONS = (
+    {"preserve_order": True}
+    if "preserve_order" in inspect.signature(ds.write_dataset).parameters
+    else {"use_threads": False}
+)
+
+
+def morton_order(x: np.ndarray, y: np.ndarray, bits: int = 16) -> np.ndarray:
+    """
+    Returns the indices sorting points along a Z-order curve, which keeps
+    spatially close points close in the sorted order.
+
+    Args:
+        x (np.ndarray): X coordinates.
+        y (np.ndarray): Y coordinates.
+        bits (int): Quantization of each coordinate in bits, at most 32.
+
+    Returns:
+        np.ndarray: Indices sorting the points.
+    """
+    def quantize(values: np.ndarray) -> np.ndarray:
+        span = np.ptp(values) if values.size else 0
+        scaled = (values - values.min()) / span if span > 0 else \
+            np.zeros_like(values)
+        return (scaled * ((1 << bits) - 1)).astype(np.uint64)
+
+    def spread(values: np.ndarray) -> np.ndarray:
+        result = np.zeros_like(values)
+        for bit in range(bits):
+            result |= ((values >> np.uint64(bit)) & np.uint64(1)) << \
+                np.uint64(2 * bit)
+        return result
+
+    code = spread(quantize(x)) | (spread(quantize(y)) << np.uint64(1))
+    return np.argsort(code, kind="stable")
+
+
+class DetectionArchive:
+    """
+    A class to store and query circles in a GeoParquet dataset partitioned
+    by year and tile.
+    """
+
+    PARTITIONING = pa.schema([("year", pa.int32()), ("tile", pa.string())])
+
+    def __init__(self, root: str, row_group_size: int = 4096) -> None:
+        """
+        Initializes the DetectionArchive.
+
+        Args:
+            root (str): The directory of the dataset.
+            row_group_size (int): Maximum number of rows per row group.
+                Smaller row groups allow finer pruning by bounding box.
+        """
+        self.root = root
+        self.row_group_size = row_group_size
+
+    @property
+    def partitioning(self) -> ds.Partitioning:
+        """The hive partitioning by year and tile."""
+        return ds.partitioning(self.PARTITIONING, flavor="hive")
+
+    def dataset(self) -> Optional[ds.Dataset]:
+        """
+        Opens the dataset.
+
+        Returns:
+            Optional[ds.Dataset]: The dataset, None if nothing is archived
+            yet.
+        """
+        if not os.path.isdir(self.root) or not os.listdir(self.root):
+            return None
+        return ds.dataset(
+            self.root, format="parquet", partitioning=self.partitioning
+        )
+
+    def crs(self, dataset: Optional[ds.Dataset] = None) -> Optional[str]:
+        """
+        Returns the coordinate reference system of the archive as PROJJSON,
+        None if nothing is archived yet.
+
+        Args:
+            dataset (Optional[ds.Dataset]): The opened dataset, opened anew
+                if not given.
+        """
+        if dataset is None:
+            dataset = self.dataset()
+        if dataset is None or not dataset.schema.metadata:
+            return None
+        geo = json.loads(dataset.schema.metadata[b"geo"])
+        return json.dumps(geo["columns"]["geometry"]["crs"])
+
+    def to_table(self, gdf: gpd.GeoDataFrame) -> pa.Table:
+        """
+        Converts a GeoDataFrame into a GeoParquet table with WKB geometries,
+        bounding box columns and GeoParquet metadata, sorted spatially.
+
+        Args:
+            gdf (gpd.GeoDataFrame): Circles with `year` and `tile` columns.
+
+        Returns:
+            pa.Table: The converted table.
+        """
+        geometries = gdf.geometry.values
+        bounds = shapely.bounds(np.asarray(geometries))
+        order = morton_order(
+            (bounds[:, 0] + bounds[:, 2]) / 2,
+            (bounds[:, 1] + bounds[:, 3]) / 2
+        )
+
+        attributes = gdf.drop(columns=gdf.geometry.name).iloc[order]
+        table = pa.Table.from_pandas(
+            attributes.reset_index(drop=True), preserve_index=False
+        )
+        table = table.set_column(
+            table.schema.get_field_index("year"),
+            "year",
+            table.column("year").cast(pa.int32())
+        )
+        for column, values in zip(BBOX_COLUMNS, bounds[order].T):
+            table = table.append_column(column, pa.array(values))
+        table = table.append_column(
+            "geometry",
+            pa.array(shapely.to_wkb(np.asarray(geometries)[order]),
+                     type=pa.binary())
+        )
+
+        geo = {
+            "version": "1.0.0",
+            "primary_column": "geometry",
+            "columns": {
+                "geometry": {
+                    "encoding": "WKB",
+                    "geometry_types": sorted(
+                        gdf.geom_type.dropna().unique().tolist()
+                    ),
+                    "crs": gdf.crs.to_json_dict() if gdf.crs else None,
+                    "bbox": [
+                        float(bounds[:, 0].min()), float(bounds[:, 1].min()),
+                        float(bounds[:, 2].max()), float(bounds[:, 3].max())
+                    ] if len(bounds) else []
+                }
+            }
+        }
+        # pandas metadata would describe columns moved to the partitioning
+        return table.replace_schema_metadata({"geo": json.dumps(geo)})
+
+    def add(self, gdf: gpd.GeoDataFrame) -> int:
+        """
+        Adds circles to the archive. All partitions (year and tile) present
+        in the GeoDataFrame are replaced, other partitions are kept.
+        Circles are reprojected to the coordinate reference system of the
+        archive if necessary.
+
+        Args:
+            gdf (gpd.GeoDataFrame): Circles with `year` and `tile` columns.
+
+        Returns:
+            int: The number of archived circles.
+
+        Raises:
+            ValueError: If `year` or `tile` are missing for any circle.
+        """
+        for column in ("year", "tile"):
+            if column not in gdf.columns or gdf[column].isna().any():
+                raise ValueError(f"All circles need a {column}.")
+        if gdf.empty:
+            return 0
+
+        crs = self.crs()
+        if crs is not None and gdf.crs is not None and gdf.crs != crs:
+            gdf = gdf.to_crs(crs)
+
+        ds.write_dataset(
+            self.to_table(gdf),
+            self.root,
+            format="parquet",
+            partitioning=self.partitioning,
+            basename_template=f"part-{uuid.uuid4().hex}-{{i}}.parquet",
+            max_rows_per_group=self.row_group_size,
+            min_rows_per_group=self.row_group_size,
+            existing_data_behavior="delete_matching",
+            **ORDER_OPTIONS
+        )
+        return len(gdf)
+
+    def query(
+        self,
+        bbox: Optional[Tuple[float, float, float, float]] = None,
+        years: Optional[Tuple[int, int]] = None,
+        tiles: Optional[Iterable[str]] = None,
+        columns: Optional[List[str]] = None
+    ) -> gpd.GeoDataFrame:
+        """
+        Reads the circles intersecting a bounding box within a range of
+        years. Partitions outside the years and tiles as well as row groups
+        whose bounding box statistics do not overlap the bounding box are
+        skipped without reading them.
+
+        Args:
+            bbox (Optional[Tuple[float, float, float, float]]): Bounding box
+                (xmin, ymin, xmax, ymax) in the archive CRS.
+            years (Optional[Tuple[int, int]]): First and last year,
+                inclusive.
+            tiles (Optional[Iterable[str]]): Datacube tiles.
+            columns (Optional[List[str]]): Attribute columns to read, all by
+                default.
+
+        Returns:
+            gpd.GeoDataFrame: The matching circles.
+        """
+        dataset = self.dataset()
+        if dataset is None:
+            return gpd.GeoDataFrame(geometry=[])
+
+        expression = None
+
+        def conjunction(condition: ds.Expression) -> None:
+            nonlocal expression
+            expression = condition if expression is None else \
+                expression & condition
+
+        if years is not None:
+            conjunction((ds.field("year") >= years[0]) &
+                        (ds.field("year") <= years[1]))
+        if tiles is not None:
+            conjunction(ds.field("tile").isin(list(tiles)))
+        if bbox is not None:
+            conjunction(
+                (ds.field("xmax") >= bbox[0]) &
+                (ds.field("ymax") >= bbox[1]) &
+                (ds.field("xmin") <= bbox[2]) &
+                (ds.field("ymin") <= bbox[3])
+            )
+
+        if columns is not None:
+            columns = list(dict.fromkeys([*columns, "geometry"]))
+        table = dataset.to_table(columns=columns, filter=expression)
+
+        geometry = shapely.from_wkb(
+            table.column("geometry").to_numpy(zero_copy_only=False)
+        )
+        gdf = gpd.GeoDataFrame(
+            table.drop_columns(["geometry"]).to_pandas(),
+            geometry=geometry,
+            crs=self.crs(dataset)
+        )
+        if bbox is not None:
+            gdf = gdf[shapely.intersects(geometry, shapely.box(*bbox))]
+        return gdf.reset_index(drop=True)
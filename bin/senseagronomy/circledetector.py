@@ -2,22 +2,69 @@
 Circle Detector Module
 
 This module contains a class for detecting circles
-    in images using the Hough Circle Transform.
+    in images. The detection itself is delegated to a detector backend,
+    by default the Hough Circle Transform.
 """
 
-from typing import List, Tuple, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Sequence, Tuple, Optional
 import sys
+import time
 import rasterio
-import cv2 as cv
 import numpy as np
+from senseagronomy.detectorbackend import (
+    DetectorBackend, HoughBackend, RadiusBand, non_maximum_suppression
+)
+from senseagronomy.preprocessing import Preprocessor, PreparedImage
+from senseagronomy.spatialtransformer import SpatialTransformer
 
 
 class CircleDetector:
     """Class for detecting circles in images."""
 
-    def __init__(self, num_points: int = 360) -> None:
-        """Initialize the CircleDetector with a specified number of points."""
+    def __init__(
+        self,
+        num_points: int = 360,
+        backend: Optional[DetectorBackend] = None,
+        preprocessor: Optional[Preprocessor] = None,
+        bands: Optional[Sequence[RadiusBand]] = None,
+        band_overlap: float = 1.0
+    ) -> None:
+        """
+        Initialize the CircleDetector with a specified number of points,
+        detector backend (defaults to the Hough Circle Transform) and
+        preprocessor.
+
+        Instead of a single backend, a list of radius bands can be given.
+        Bands are detected concurrently and circles of different bands are
+        merged by non-maximum suppression: a circle is dropped if its center
+        is closer than `band_overlap` times the smaller radius to a circle
+        with a higher score, or an equal score and a larger radius. Scores
+        of one backend type are comparable between calls, but scores of
+        different backend types are on different scales, e.g. edge support
+        between 0 and 1 and template responses in standard deviations. All
+        bands therefore need to use the same backend type.
+
+        Only candidate windows flagged by the preprocessor are passed to the
+        backend. Statistics of the last detection are kept in
+        `window_report`.
+
+        Raises:
+            ValueError: If the bands use different backend types.
+        """
         self.num_points = num_points
+        self.backend = backend if backend is not None else HoughBackend()
+        self.bands = list(bands) if bands else [RadiusBand(self.backend)]
+        if len({type(band.backend) for band in self.bands}) > 1:
+            raise ValueError(
+                "Radius bands need to use the same backend type, since "
+                "their scores are merged."
+            )
+        self.band_overlap = band_overlap
+        self.preprocessor = (
+            preprocessor if preprocessor is not None else Preprocessor()
+        )
+        self.window_report: Dict[str, float] = {}
 
     def generate_circle_points(
         self, center_x: float, center_y: float, radius: float
@@ -35,56 +82,134 @@ class CircleDetector:
 
         return points
 
-    def detect_circles(
+    def detect_bands(
         self,
-        filename: str
-    ) -> Optional[List[List[Tuple[float, float]]]]:
-        """Detect circles in an image file."""
-        try:
-            # Use rasterio to open the image
-            with rasterio.open(filename) as dataset:
-                # Read the image data
-                image_data = dataset.read(1)  # Read the first band
-
-            # Convert the image to 8-bit if it's not already
-            if image_data.dtype != np.uint8:
-                image_data = cv.normalize(
-                    image_data, None, 0, 255, cv.NORM_MINMAX
+        image: np.ndarray,
+        executor: ThreadPoolExecutor
+    ) -> np.ndarray:
+        """
+        Detect circles of all radius bands in an 8-bit image and merge them.
+        """
+        if len(self.bands) == 1:
+            return self.bands[0].detect(image)
+
+        circles = np.concatenate(list(executor.map(
+            lambda band: band.detect(image), self.bands
+        )))
+        # equal scores are resolved in favour of the larger circle, which
+        # has more edge support in absolute terms
+        circles = circles[np.argsort(-circles[:, 2], kind="stable")]
+        return non_maximum_suppression(
+            circles, 0, radius_fraction=self.band_overlap
+        )
+
+    def detect_windows(self, prepared: PreparedImage) -> np.ndarray:
+        """
+        Run the detector backend on all candidate windows of a prepared
+        image.
+
+        Windows are extended by a halo of the maximum radius so that circles
+        crossing window borders are found, but only circles centered inside
+        a window are kept to avoid duplicates.
+        """
+        image, candidates, window_size = prepared[:3]
+        halo = max(band.max_radius for band in self.bands) + 1
+        found = [np.empty((0, 4), dtype=np.float64)]
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=len(self.bands)) as executor:
+            for row, col in zip(*np.nonzero(candidates)):
+                row_start = max(row * window_size - halo, 0)
+                col_start = max(col * window_size - halo, 0)
+                window = image[
+                    row_start:(row + 1) * window_size + halo,
+                    col_start:(col + 1) * window_size + halo
+                ]
+                circles = self.detect_bands(window, executor)
+                circles[:, 0] += col_start
+                circles[:, 1] += row_start
+
+                inside = (
+                    (circles[:, 0] // window_size == col) &
+                    (circles[:, 1] // window_size == row)
                 )
-                image_data = image_data.astype(np.uint8)
-
-            gray = cv.medianBlur(image_data, 5)
-            rows = gray.shape[0]
-
-            circles = cv.HoughCircles(
-                gray,  # Input image
-                cv.HOUGH_GRADIENT,  # Detection method
-                1,  # dp: Inverse ratio of the accumulator resolution to
-                # the image resolution
-                20,  # minDist: Minimum distance between the
-                # centers of the detected circles
-                param1=100,  # Higher threshold for the Canny edge detector
-                param2=20,  # Accumulator threshold for the circle centers
-                minRadius=8,  # Minimum circle radius
-                maxRadius=20  # Maximum circle radius
+                found.append(circles[inside])
+        elapsed = time.perf_counter() - start
+
+        processed = int(candidates.sum())
+        skipped = candidates.size - processed
+        self.window_report = {
+            "cached": self.preprocessor.last_cache_hit,
+            "preprocessing_seconds": self.preprocessor.last_seconds,
+            "windows": candidates.size,
+            "skipped": skipped,
+            "detection_seconds": elapsed,
+            "estimated_seconds_saved": (
+                elapsed / processed * skipped if processed else 0.0
             )
+        }
 
-            circle_points = []
+        return np.concatenate(found)
 
-            if circles is not None:
-                circles = np.around(circles)  # Avoid conversion to uint16
-                for circle in circles[0, :]:
-                    center_x = float(circle[0])
-                    center_y = float(circle[1])
-                    radius = float(circle[2])
-                    points = self.generate_circle_points(
-                        center_x,
-                        center_y, radius
-                    )
-                    circle_points.append(points)
+    def detect_parameters(self, filename: str) -> Optional[np.ndarray]:
+        """
+        Detect circles in an image file and return their parameters as an
+        array of shape (N, 4) holding center x, center y, radius and score.
+        """
+        try:
+            prepared = self.preprocessor.prepare(filename)
+            return self.detect_windows(prepared)
 
-            return circle_points
+        except (
+            rasterio.errors.RasterioIOError, FileNotFoundError, ValueError
+        ):
+            sys.stderr.write(f"Error processing image: {filename}\n")
+            return None
 
-        except (rasterio.errors.RasterioIOError, ValueError):
+    def detect_georeferenced(
+        self,
+        filename: str
+    ) -> Optional[Tuple[np.ndarray, Optional[str]]]:
+        """
+        Detect circles in an image file and return their parameters in the
+        coordinate reference system of the image, together with the CRS as
+        WKT. Pixel coordinates refer to pixel centers. Radii are scaled by
+        the square root of the pixel area.
+        """
+        try:
+            prepared = self.preprocessor.prepare(filename)
+            circles = self.detect_windows(prepared)
+
+        except (
+            rasterio.errors.RasterioIOError, FileNotFoundError, ValueError
+        ):
             sys.stderr.write(f"Error processing image: {filename}\n")
             return None
+
+        # detections are located at pixel centers, the transform maps
+        # pixel corners
+        circles[:, :2] += 0.5
+        circles = SpatialTransformer().transform_circles(
+            circles, transform=prepared.transform
+        )
+        return circles, prepared.crs
+
+    def detect_circles(
+        self,
+        filename: str
+    ) -> Optional[List[List[Tuple[float, float]]]]:
+        """Detect circles in an image file."""
+        circles = self.detect_parameters(filename)
+        if circles is None:
+            return None
+
+        circle_points = []
+        for center_x, center_y, radius, _ in circles:
+            points = self.generate_circle_points(
+                float(center_x),
+                float(center_y),
+                float(radius)
+            )
+            circle_points.append(points)
+
+        return circle_points
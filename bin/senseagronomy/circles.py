@@ -0,0 +1,140 @@
+"""
+circles.py
+
+This module provides helpers to work with circles as parameters, i.e.
+center x, center y and radius, instead of polygons. Intersection over
+union of circles is computed in closed form from the area of the lens
+shaped intersection of two circles.
+"""
+
+from typing import Optional, Tuple
+import geopandas as gpd
+import numpy as np
+import shapely
+
+PARAMETER_COLUMNS = ("x", "y", "radius")
+
+
+def circle_parameters(geometries: np.ndarray) -> np.ndarray:
+    """
+    Fits circles to polygons by their centroid and the radius of the
+    circle of equal area. For buffered points and regular polygons this
+    recovers the original circle up to the discretization of the buffer.
+
+    Args:
+        geometries (np.ndarray): Polygon geometries.
+
+    Returns:
+        np.ndarray: Array of shape (N, 3) with center x, center y and
+        radius.
+    """
+    geometries = np.asarray(geometries)
+    centers = shapely.get_coordinates(shapely.centroid(geometries))
+    radius = np.sqrt(shapely.area(geometries) / np.pi)
+    return np.column_stack([centers.reshape((-1, 2)), radius])
+
+
+def frame_parameters(gdf: gpd.GeoDataFrame) -> np.ndarray:
+    """
+    Returns the circle parameters of a GeoDataFrame, taken from the `x`,
+    `y` and `radius` columns written by detectcircle if present and fitted
+    to the geometries otherwise.
+
+    Args:
+        gdf (gpd.GeoDataFrame): The circles.
+
+    Returns:
+        np.ndarray: Array of shape (N, 3) with center x, center y and
+        radius.
+    """
+    if all(column in gdf.columns for column in PARAMETER_COLUMNS):
+        return gdf.loc[:, list(PARAMETER_COLUMNS)].to_numpy(dtype=np.float64)
+    return circle_parameters(gdf.geometry.values)
+
+
+def circle_iou(first: np.ndarray, second: np.ndarray) -> np.ndarray:
+    """
+    Computes the intersection over union of pairs of circles in closed
+    form, row by row.
+
+    .. note:: Polygons are only approximations of circles. For circles
+        buffered with 8 segments per quarter circle (the shapely default)
+        the IoU differs by less than 0.0015 from the polygon IoU, with 32
+        segments by less than 1e-4. For digitized polygons the deviation
+        depends on how well the circle fitted by `circle_parameters`
+        describes them.
+
+    Args:
+        first (np.ndarray): Array of shape (N, >=3) with center x, center y
+            and radius.
+        second (np.ndarray): Array of shape (N, >=3) with center x,
+            center y and radius.
+
+    Returns:
+        np.ndarray: The IoU of every pair.
+    """
+    first = np.asarray(first, dtype=np.float64)
+    second = np.asarray(second, dtype=np.float64)
+    r1, r2 = first[:, 2], second[:, 2]
+    distance = np.hypot(first[:, 0] - second[:, 0],
+                        first[:, 1] - second[:, 1])
+
+    lens = (distance > np.abs(r1 - r2)) & (distance < r1 + r2)
+    d, a, b = distance[lens], r1[lens], r2[lens]
+    intersection = np.where(
+        distance <= np.abs(r1 - r2), np.pi * np.minimum(r1, r2) ** 2, 0.0
+    )
+    intersection[lens] = (
+        a ** 2 * np.arccos(np.clip((d ** 2 + a ** 2 - b ** 2) / (2 * d * a),
+                                   -1, 1)) +
+        b ** 2 * np.arccos(np.clip((d ** 2 + b ** 2 - a ** 2) / (2 * d * b),
+                                   -1, 1)) -
+        0.5 * np.sqrt(np.maximum(
+            (-d + a + b) * (d + a - b) * (d - a + b) * (d + a + b), 0
+        ))
+    )
+
+    union = np.pi * (r1 ** 2 + r2 ** 2) - intersection
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(union > 0, intersection / union, 0.0)
+
+
+def circle_pairs(
+    circles: np.ndarray,
+    others: Optional[np.ndarray] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Finds all pairs of intersecting circles with a spatial index over their
+    bounding boxes.
+
+    Args:
+        circles (np.ndarray): Array of shape (N, >=3) with center x,
+            center y and radius.
+        others (Optional[np.ndarray]): Circles to pair with. If not given,
+            circles are paired among `circles`, each pair once with the
+            smaller index first.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Indices into `circles` and `others`.
+    """
+    def boxes(values: np.ndarray) -> np.ndarray:
+        return shapely.box(
+            values[:, 0] - values[:, 2], values[:, 1] - values[:, 2],
+            values[:, 0] + values[:, 2], values[:, 1] + values[:, 2]
+        )
+
+    circles = np.asarray(circles, dtype=np.float64)
+    tree = shapely.STRtree(boxes(circles))
+    if others is None:
+        left, right = tree.query(boxes(circles))
+        lower = left < right
+        left, right = left[lower], right[lower]
+        others = circles
+    else:
+        others = np.asarray(others, dtype=np.float64)
+        right, left = tree.query(boxes(others))
+
+    distance = np.hypot(circles[left, 0] - others[right, 0],
+                        circles[left, 1] - others[right, 1])
+    intersecting = distance < circles[left, 2] + others[right, 2]
+    return left[intersecting], right[intersecting]
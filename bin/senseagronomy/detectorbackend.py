@@ -0,0 +1,305 @@
+"""
+Detector Backend Module
+
+This module contains the circle detection engines used by the
+CircleDetector. Every backend consumes a preprocessed 8-bit image and
+returns the detected circles as an array of shape (N, 4) holding the
+center x, center y, radius (all in pixel units) and a detection score.
+"""
+
+from abc import ABC, abstractmethod
+from typing import Iterable, NamedTuple, Optional
+import cv2 as cv
+import numpy as np
+
+
+def non_maximum_suppression(
+    circles: np.ndarray,
+    min_dist: float,
+    radius_fraction: Optional[float] = None
+) -> np.ndarray:
+    """
+    Greedily keep the highest scoring circles and drop every circle whose
+    center lies closer than `min_dist` to an already kept circle.
+
+    Args:
+        circles (np.ndarray): Array of shape (N, 4) with x, y, radius, score.
+        min_dist (float): Minimum distance between two kept centers.
+        radius_fraction (Optional[float]): If given, circles are also
+            dropped if their centers are closer than this fraction of the
+            smaller radius of both circles.
+
+    Returns:
+        np.ndarray: The kept circles, sorted by descending score.
+    """
+    if circles.shape[0] == 0:
+        return circles
+
+    circles = circles[np.argsort(-circles[:, 3], kind="stable")]
+    suppressed = np.zeros(circles.shape[0], dtype=bool)
+    keep = []
+    for i in range(circles.shape[0]):
+        if suppressed[i]:
+            continue
+        keep.append(i)
+        distance = np.hypot(
+            circles[i + 1:, 0] - circles[i, 0],
+            circles[i + 1:, 1] - circles[i, 1]
+        )
+        threshold = min_dist
+        if radius_fraction is not None:
+            threshold = np.maximum(
+                threshold,
+                radius_fraction *
+                np.minimum(circles[i + 1:, 2], circles[i, 2])
+            )
+        suppressed[i + 1:] |= distance < threshold
+
+    return circles[keep]
+
+
+class DetectorBackend(ABC):
+    """Base class for circle detection engines."""
+
+    def __init__(self, min_radius: int, max_radius: int) -> None:
+        """Initialize the backend with the searched radius range."""
+        if min_radius < 1 or max_radius < min_radius:
+            raise ValueError(
+                f"Invalid radius range: {min_radius}..{max_radius}"
+            )
+        self.min_radius = min_radius
+        self.max_radius = max_radius
+
+    @abstractmethod
+    def detect(self, image: np.ndarray) -> np.ndarray:
+        """Detect circles in an 8-bit single band image."""
+
+
+class HoughBackend(DetectorBackend):
+    """Circle detection with the OpenCV Hough Circle Transform."""
+
+    def __init__(
+        self,
+        dp: float = 1,
+        min_dist: float = 20,
+        param1: float = 100,
+        param2: float = 20,
+        min_radius: int = 8,
+        max_radius: int = 20
+    ) -> None:
+        """
+        Initialize the Hough backend.
+
+        Args:
+            dp (float): Inverse ratio of the accumulator resolution to the
+                image resolution.
+            min_dist (float): Minimum distance between the centers of the
+                detected circles.
+            param1 (float): Higher threshold for the Canny edge detector.
+            param2 (float): Accumulator threshold for the circle centers.
+            min_radius (int): Minimum circle radius.
+            max_radius (int): Maximum circle radius.
+        """
+        super().__init__(min_radius, max_radius)
+        self.dp = dp
+        self.min_dist = min_dist
+        self.param1 = param1
+        self.param2 = param2
+
+    def edge_support(
+        self,
+        image: np.ndarray,
+        circles: np.ndarray
+    ) -> np.ndarray:
+        """
+        Fraction of the circumference of every circle lying on an edge of
+        the Canny edge map the Hough transform votes from. The support is
+        the accumulator vote of a circle normalized by its circumference,
+        so unlike the order of OpenCV's output it is comparable between
+        calls, images and radii. Edges are dilated by one pixel to tolerate
+        the rounding of centers and radii.
+
+        Args:
+            image (np.ndarray): The 8-bit image the circles were detected in.
+            circles (np.ndarray): Array of shape (N, >=3) with center x,
+                center y and radius in pixels.
+
+        Returns:
+            np.ndarray: Support between 0 and 1 for every circle.
+        """
+        edges = cv.dilate(
+            cv.Canny(image, self.param1 / 2, self.param1),
+            np.ones((3, 3), dtype=np.uint8)
+        ) > 0
+        support = np.empty(circles.shape[0], dtype=np.float64)
+        for i, (x, y, radius) in enumerate(circles[:, :3]):
+            count = max(int(np.ceil(2 * np.pi * radius)), 8)
+            theta = np.linspace(0, 2 * np.pi, count, endpoint=False)
+            cols = np.rint(x + radius * np.cos(theta)).astype(np.intp)
+            rows = np.rint(y + radius * np.sin(theta)).astype(np.intp)
+            inside = (
+                (rows >= 0) & (rows < edges.shape[0]) &
+                (cols >= 0) & (cols < edges.shape[1])
+            )
+            support[i] = edges[rows[inside], cols[inside]].sum() / count
+        return support
+
+    def detect(self, image: np.ndarray) -> np.ndarray:
+        """
+        Detect circles in an 8-bit single band image. The score of every
+        circle is its edge support, see `edge_support`.
+        """
+        circles = cv.HoughCircles(
+            image,
+            cv.HOUGH_GRADIENT,
+            self.dp,
+            self.min_dist,
+            param1=self.param1,
+            param2=self.param2,
+            minRadius=self.min_radius,
+            maxRadius=self.max_radius
+        )
+
+        if circles is None:
+            return np.empty((0, 4), dtype=np.float64)
+
+        circles = np.around(circles[0]).astype(np.float64)
+        return np.column_stack([circles, self.edge_support(image, circles)])
+
+
+class TemplateBackend(DetectorBackend):
+    """
+    Circle detection by FFT-based template matching over a bank of radii.
+
+    Every template is a bright disk surrounded by a dark ring of equal area,
+    normalized to zero mean and unit norm. The standardized image is
+    correlated with all templates in the frequency domain, the best
+    response and radius are kept per pixel and local maxima above the
+    threshold are reduced by non-maximum suppression.
+    """
+
+    def __init__(
+        self,
+        min_radius: int = 8,
+        max_radius: int = 20,
+        radius_step: int = 1,
+        threshold: float = 2.0,
+        min_dist: Optional[float] = None,
+        batch_size: int = 4
+    ) -> None:
+        """
+        Initialize the template matching backend.
+
+        Args:
+            min_radius (int): Minimum circle radius.
+            max_radius (int): Maximum circle radius.
+            radius_step (int): Step between radii of the template bank.
+            threshold (float): Minimum template response of a detection,
+                measured in standard deviations of the image.
+            min_dist (Optional[float]): Minimum distance between the centers
+                of the detected circles. Defaults to `min_radius`.
+            batch_size (int): Number of templates correlated at once. Larger
+                batches are faster but need proportionally more memory.
+        """
+        super().__init__(min_radius, max_radius)
+        self.radii = np.arange(min_radius, max_radius + 1, radius_step)
+        self.threshold = threshold
+        self.min_dist = min_dist if min_dist is not None else min_radius
+        self.batch_size = batch_size
+
+    @staticmethod
+    def templates(shape: tuple, radii: np.ndarray) -> np.ndarray:
+        """
+        Build the templates for the given radii centered at the origin of an
+        array of the given shape, i.e. wrapped around for circular
+        correlation.
+        """
+        rows = np.fft.ifftshift(np.arange(shape[0]) - shape[0] // 2)
+        cols = np.fft.ifftshift(np.arange(shape[1]) - shape[1] // 2)
+        distance = np.hypot(rows[:, np.newaxis], cols[np.newaxis, :])
+
+        radii = radii[:, np.newaxis, np.newaxis].astype(np.float32)
+        disk = (distance <= radii).astype(np.float32)
+        ring = ((distance > radii) &
+                (distance <= radii * np.sqrt(2))).astype(np.float32)
+        bank = disk / disk.sum(axis=(1, 2), keepdims=True) - \
+            ring / ring.sum(axis=(1, 2), keepdims=True)
+        bank /= np.linalg.norm(bank, axis=(1, 2), keepdims=True)
+        return bank
+
+    def _batches(self, count: int) -> Iterable[slice]:
+        for start in range(0, count, self.batch_size):
+            yield slice(start, min(start + self.batch_size, count))
+
+    def detect(self, image: np.ndarray) -> np.ndarray:
+        """Detect circles in an 8-bit single band image."""
+        data = image.astype(np.float32)
+        std = data.std()
+        if std == 0:
+            return np.empty((0, 4), dtype=np.float64)
+        data = (data - data.mean()) / std
+
+        pad = int(np.ceil(self.max_radius * np.sqrt(2))) + 1
+        shape = (data.shape[0] + 2 * pad, data.shape[1] + 2 * pad)
+        spectrum = np.fft.rfft2(np.pad(data, pad), s=shape)
+
+        best = np.full(data.shape, -np.inf, dtype=np.float32)
+        best_radius = np.zeros(data.shape, dtype=np.float32)
+        for batch in self._batches(self.radii.size):
+            response = np.fft.irfft2(
+                spectrum[np.newaxis] *
+                np.fft.rfft2(self.templates(shape, self.radii[batch])),
+                s=shape
+            )[:, pad:-pad, pad:-pad]
+            # scale by the standardized energy below the disk so responses
+            # of different radii are comparable
+            response /= np.sqrt(np.pi) * self.radii[batch, np.newaxis,
+                                                     np.newaxis]
+            index = response.argmax(axis=0)
+            score = np.take_along_axis(response, index[np.newaxis], 0)[0]
+            improved = score > best
+            best[improved] = score[improved]
+            best_radius[improved] = self.radii[batch][index[improved]]
+
+        peaks = best == cv.dilate(best, np.ones((3, 3), dtype=np.uint8))
+        rows, cols = np.nonzero(peaks & (best > self.threshold))
+        circles = np.column_stack([
+            cols.astype(np.float64),
+            rows.astype(np.float64),
+            best_radius[rows, cols].astype(np.float64),
+            best[rows, cols].astype(np.float64)
+        ])
+        return non_maximum_suppression(circles, self.min_dist)
+
+
+class RadiusBand(NamedTuple):
+    """
+    Backend responsible for one range of radii. Images are decimated by the
+    given integer factor before detection, so the radii and distances of
+    the backend are given in decimated pixels.
+    """
+    backend: DetectorBackend
+    decimation: int = 1
+
+    def detect(self, image: np.ndarray) -> np.ndarray:
+        """Detect circles and return them in full resolution pixels."""
+        if self.decimation == 1:
+            return self.backend.detect(image)
+
+        decimated = cv.resize(
+            image,
+            (
+                max(image.shape[1] // self.decimation, 1),
+                max(image.shape[0] // self.decimation, 1)
+            ),
+            interpolation=cv.INTER_AREA
+        )
+        circles = self.backend.detect(decimated)
+        circles[:, :2] = (circles[:, :2] + 0.5) * self.decimation - 0.5
+        circles[:, 2] *= self.decimation
+        return circles
+
+    @property
+    def max_radius(self) -> int:
+        """Maximum radius in full resolution pixels."""
+        return self.backend.max_radius * self.decimation
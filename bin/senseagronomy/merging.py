@@ -0,0 +1,168 @@
+"""
+Merging Module
+
+This module merges circle detections of neighbouring datacube tiles.
+Fields straddling a tile border are detected in every tile they touch, so
+overlapping circles are clustered and only the best scoring detection of
+each cluster is kept, ties going to the detection agreeing best with the
+others. Candidate pairs are taken from a spatial index, so
+pairwise comparisons only happen between intersecting circles.
+"""
+
+from typing import List, Optional, Tuple
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pyogrio
+from scipy.sparse import coo_array
+from scipy.sparse.csgraph import connected_components
+from senseagronomy.circles import (
+    PARAMETER_COLUMNS, circle_iou, circle_pairs, circle_parameters
+)
+
+
+def read_layers(filenames: List[str]) -> gpd.GeoDataFrame:
+    """
+    Read all layers of all files into a single GeoDataFrame in the
+    coordinate reference system of the first layer. Files ending in
+    `.parquet` are read as GeoParquet. Circle parameters stored in the
+    `x`, `y` and `radius` columns of reprojected layers are fitted anew.
+    """
+    frames: List[gpd.GeoDataFrame] = []
+    for filename in filenames:
+        if filename.endswith(".parquet"):
+            layers = [gpd.read_parquet(filename)]
+        else:
+            layers = [
+                gpd.read_file(filename, layer=layer, engine="pyogrio")
+                for layer, _ in pyogrio.list_layers(filename)
+            ]
+        for gdf in layers:
+            if frames and gdf.crs != frames[0].crs:
+                gdf = gdf.to_crs(frames[0].crs)
+                # stored parameters are in the original CRS, fit them anew
+                if set(PARAMETER_COLUMNS).issubset(gdf.columns):
+                    gdf[list(PARAMETER_COLUMNS)] = circle_parameters(
+                        gdf.geometry.values
+                    )
+            frames.append(gdf)
+    if not frames:
+        return gpd.GeoDataFrame(geometry=[])
+    return gpd.GeoDataFrame(
+        pd.concat(frames, ignore_index=True), crs=frames[0].crs
+    )
+
+
+def overlapping_pairs(
+    geometries: np.ndarray,
+    others: Optional[np.ndarray] = None
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Find all intersecting pairs of circles with a spatial index and compute
+    their IoU and center distance relative to the smaller radius. Circles
+    are fitted to the geometries by `circle_parameters` and IoU is computed
+    in closed form by `circle_iou`.
+
+    Args:
+        geometries (np.ndarray): Circle geometries.
+        others (Optional[np.ndarray]): Circle geometries to pair with. If
+            not given, circles are paired among `geometries`, each pair
+            once with the smaller index first.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]: Indices into
+        `geometries` and `others`, IoU and relative center distance of each
+        pair.
+    """
+    circles = circle_parameters(geometries)
+    other_circles = circles if others is None else circle_parameters(others)
+    left, right = circle_pairs(
+        circles, None if others is None else other_circles
+    )
+
+    first, second = circles[left], other_circles[right]
+    iou = circle_iou(first, second)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        distance = np.hypot(first[:, 0] - second[:, 0],
+                            first[:, 1] - second[:, 1]) / \
+            np.minimum(first[:, 2], second[:, 2])
+    return left, right, iou, distance
+
+
+def duplicate_pairs(
+    geometries: np.ndarray,
+    iou_threshold: float = 0.5,
+    distance_fraction: float = 0.5
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Find pairs of circles which describe the same field.
+
+    Two circles are duplicates if their IoU exceeds `iou_threshold` or if
+    their centers are closer than `distance_fraction` times the smaller
+    radius.
+
+    Args:
+        geometries (np.ndarray): Circle geometries.
+        iou_threshold (float): Minimum IoU of duplicates.
+        distance_fraction (float): Maximum center distance of duplicates
+            relative to the smaller radius.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray]: Indices of both circles
+        of each pair, the first always being the smaller, and their IoU.
+    """
+    left, right, iou, distance = overlapping_pairs(geometries)
+    duplicate = (iou > iou_threshold) | (distance < distance_fraction)
+    return left[duplicate], right[duplicate], iou[duplicate]
+
+
+def deduplicate_circles(
+    gdf: gpd.GeoDataFrame,
+    iou_threshold: float = 0.5,
+    distance_fraction: float = 0.5,
+    score_column: Optional[str] = "score"
+) -> gpd.GeoDataFrame:
+    """
+    Cluster duplicate circles and keep the best scoring one per cluster.
+
+    Clusters are the connected components of the duplicate pairs found by
+    `duplicate_pairs`. Circles with equal scores, or all circles if there
+    is no score column, are ranked by their summed IoU with their
+    duplicates, so the kept circle is the one agreeing best with the other
+    detections of the field. Remaining ties keep the first circle.
+
+    Args:
+        gdf (gpd.GeoDataFrame): The circles of all tiles.
+        iou_threshold (float): Minimum IoU of duplicates.
+        distance_fraction (float): Maximum center distance of duplicates
+            relative to the smaller radius.
+        score_column (Optional[str]): Column holding detection scores,
+            which need to be comparable between tiles and years.
+
+    Returns:
+        gpd.GeoDataFrame: The kept circles in their original order.
+    """
+    if gdf.empty:
+        return gdf
+
+    left, right, iou = duplicate_pairs(
+        np.asarray(gdf.geometry.values), iou_threshold, distance_fraction
+    )
+    count = len(gdf)
+    _, cluster = connected_components(
+        coo_array(
+            (np.ones(left.size, dtype=np.int8), (left, right)),
+            shape=(count, count)
+        ),
+        directed=False
+    )
+    agreement = np.bincount(left, iou, count) + \
+        np.bincount(right, iou, count)
+
+    keys = [-agreement]
+    if score_column is not None and score_column in gdf.columns:
+        keys.append(-gdf[score_column].to_numpy(dtype=np.float64))
+    order = np.lexsort(keys)
+    # first occurrence of each cluster in rank order is its best circle
+    _, first = np.unique(cluster[order], return_index=True)
+    return gdf.iloc[np.sort(order[first])]
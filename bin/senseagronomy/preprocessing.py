@@ -0,0 +1,262 @@
+"""
+Preprocessing Module
+
+This module prepares raster images for circle detection. Images are read,
+nodata is masked, values are scaled to 8-bit based on percentiles of the
+valid pixels and the result is median blurred. Additionally, windows which
+cannot contain vegetated fields are flagged. Prepared images can be cached
+on disk, keyed by path, size and modification time of the file and all
+preprocessing parameters, so repeated detections skip reading and
+filtering.
+"""
+
+import hashlib
+import json
+import os
+import time
+from typing import NamedTuple, Optional, Tuple
+import cv2 as cv
+import numpy as np
+import rasterio
+from rasterio.transform import Affine
+
+
+class PreparedImage(NamedTuple):
+    """8-bit image ready for detection and its georeference."""
+    image: np.ndarray
+    candidates: np.ndarray
+    window_size: int
+    transform: Affine
+    crs: Optional[str]
+
+
+def block_statistics(
+    data: np.ndarray,
+    valid: np.ndarray,
+    window_size: int
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Compute the valid pixel fraction, maximum and standard deviation of
+    valid pixels for each non-overlapping window of an image. Windows at
+    the right and bottom border may be smaller than `window_size`.
+    """
+    rows = -(-data.shape[0] // window_size)
+    cols = -(-data.shape[1] // window_size)
+    pad = (
+        (0, rows * window_size - data.shape[0]),
+        (0, cols * window_size - data.shape[1])
+    )
+    shape = (rows, window_size, cols, window_size)
+
+    values = np.pad(
+        np.where(valid, data, 0).astype(np.float64), pad
+    ).reshape(shape)
+    mask = np.pad(valid, pad).reshape(shape)
+
+    count = mask.sum(axis=(1, 3))
+    size = np.pad(
+        np.ones(data.shape, dtype=np.int64), pad
+    ).reshape(shape).sum(axis=(1, 3))
+
+    total = values.sum(axis=(1, 3))
+    squares = (values ** 2).sum(axis=(1, 3))
+    maximum = np.where(mask, values, -np.inf).max(axis=(1, 3))
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = total / count
+        std = np.sqrt(np.maximum(squares / count - mean ** 2, 0))
+
+    return count / size, maximum, np.nan_to_num(std)
+
+
+def file_signature(filename: str) -> dict:
+    """
+    Identify a file version by its canonical path, size and modification
+    time. Symbolic links are resolved, so inputs staged as links, e.g. into
+    the task directories of a workflow, share the signature of their
+    target. This only needs a `stat` call, so cache lookups do not read the
+    file.
+    """
+    status = os.stat(filename)
+    return {
+        "path": os.path.realpath(filename),
+        "size": status.st_size,
+        "mtime_ns": status.st_mtime_ns
+    }
+
+
+class Preprocessor:
+    """Class for preparing images for circle detection."""
+
+    def __init__(
+        self,
+        nodata: Optional[float] = None,
+        lower_percentile: float = 1.0,
+        upper_percentile: float = 99.9,
+        blur_kernel: int = 5,
+        window_size: Optional[int] = None,
+        min_valid_fraction: float = 0.0,
+        min_ndvi: Optional[float] = None,
+        min_ndvi_std: Optional[float] = None,
+        cache_dir: Optional[str] = None
+    ) -> None:
+        """
+        Initialize the Preprocessor.
+
+        Args:
+            nodata (Optional[float]): Nodata value, defaults to the value
+                stored in the image. NaN is always treated as nodata.
+            lower_percentile (float): Percentile of valid pixels mapped to 0.
+            upper_percentile (float): Percentile of valid pixels mapped
+                to 255.
+            blur_kernel (int): Aperture size of the median blur.
+            window_size (Optional[int]): Size of the windows checked for
+                possible fields. By default, the image is a single window.
+            min_valid_fraction (float): Minimum fraction of valid pixels of
+                a candidate window.
+            min_ndvi (Optional[float]): Minimum maximal value of a candidate
+                window.
+            min_ndvi_std (Optional[float]): Minimum standard deviation of a
+                candidate window.
+            cache_dir (Optional[str]): Directory of the on-disk cache of
+                prepared images. Caching is disabled if not given.
+        """
+        if not 0 <= lower_percentile < upper_percentile <= 100:
+            raise ValueError(
+                f"Invalid percentiles: {lower_percentile}, {upper_percentile}"
+            )
+        self.nodata = nodata
+        self.lower_percentile = lower_percentile
+        self.upper_percentile = upper_percentile
+        self.blur_kernel = blur_kernel
+        self.window_size = window_size
+        self.min_valid_fraction = min_valid_fraction
+        self.min_ndvi = min_ndvi
+        self.min_ndvi_std = min_ndvi_std
+        self.cache_dir = cache_dir
+        self.last_cache_hit = False
+        self.last_seconds = 0.0
+
+    def parameters(self) -> dict:
+        """Return all parameters which influence the prepared image."""
+        return {
+            "nodata": self.nodata,
+            "lower_percentile": self.lower_percentile,
+            "upper_percentile": self.upper_percentile,
+            "blur_kernel": self.blur_kernel,
+            "window_size": self.window_size,
+            "min_valid_fraction": self.min_valid_fraction,
+            "min_ndvi": self.min_ndvi,
+            "min_ndvi_std": self.min_ndvi_std
+        }
+
+    def cache_key(self, filename: str) -> str:
+        """Derive the cache key from file signature and parameters."""
+        digest = hashlib.sha256(json.dumps(
+            {"file": file_signature(filename), **self.parameters()},
+            sort_keys=True
+        ).encode())
+        return digest.hexdigest()
+
+    def candidate_windows(
+        self,
+        data: np.ndarray,
+        valid: np.ndarray
+    ) -> np.ndarray:
+        """
+        Return a boolean array with one entry per window which is True if
+        the window may contain vegetated fields.
+        """
+        window_size = self.window_size or max(data.shape)
+        fraction, maximum, std = block_statistics(data, valid, window_size)
+
+        candidates = (fraction > 0) & (fraction >= self.min_valid_fraction)
+        if self.min_ndvi is not None:
+            candidates &= maximum >= self.min_ndvi
+        if self.min_ndvi_std is not None:
+            candidates &= std >= self.min_ndvi_std
+        return candidates
+
+    def scale(self, data: np.ndarray, valid: np.ndarray) -> np.ndarray:
+        """
+        Linearly scale valid pixels between the lower and upper percentile
+        to 8-bit. Nodata pixels are set to 0.
+        """
+        if data.dtype == np.uint8:
+            return np.where(valid, data, 0).astype(np.uint8)
+        if not valid.any():
+            return np.zeros(data.shape, dtype=np.uint8)
+
+        lower, upper = np.percentile(
+            data[valid], [self.lower_percentile, self.upper_percentile]
+        )
+        scaled = (data.astype(np.float64) - lower) / max(upper - lower, 1e-12)
+        scaled = np.clip(scaled * 255, 0, 255)
+        return np.where(valid, scaled, 0).astype(np.uint8)
+
+    def read(self, filename: str) -> PreparedImage:
+        """Read and prepare an image without using the cache."""
+        with rasterio.open(filename) as dataset:
+            data = dataset.read(1)
+            nodata = (
+                self.nodata if self.nodata is not None else dataset.nodata
+            )
+            transform = dataset.transform
+            crs = dataset.crs.to_wkt() if dataset.crs else None
+
+        valid = ~np.isnan(data)
+        if nodata is not None:
+            valid &= data != nodata
+
+        image = cv.medianBlur(self.scale(data, valid), self.blur_kernel)
+        return PreparedImage(
+            image,
+            self.candidate_windows(data, valid),
+            self.window_size or max(data.shape),
+            transform,
+            crs
+        )
+
+    def prepare(self, filename: str) -> PreparedImage:
+        """
+        Prepare an image for detection, loading it from the cache if
+        possible and storing it otherwise.
+        """
+        start = time.perf_counter()
+        self.last_cache_hit = False
+
+        if self.cache_dir is None:
+            prepared = self.read(filename)
+            self.last_seconds = time.perf_counter() - start
+            return prepared
+
+        path = os.path.join(self.cache_dir, f"{self.cache_key(filename)}.npz")
+        if os.path.exists(path):
+            with np.load(path) as cached:
+                prepared = PreparedImage(
+                    cached["image"],
+                    cached["candidates"],
+                    int(cached["window_size"]),
+                    Affine(*cached["transform"]),
+                    str(cached["crs"]) or None
+                )
+            self.last_cache_hit = True
+            self.last_seconds = time.perf_counter() - start
+            return prepared
+
+        prepared = self.read(filename)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # write to a temporary file first so concurrent readers never see
+        # partially written entries
+        temporary = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(
+            temporary,
+            image=prepared.image,
+            candidates=prepared.candidates,
+            window_size=prepared.window_size,
+            transform=np.array(prepared.transform[:6]),
+            crs=prepared.crs or ""
+        )
+        os.replace(temporary, path)
+        self.last_seconds = time.perf_counter() - start
+        return prepared
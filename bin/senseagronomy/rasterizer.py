@@ -0,0 +1,241 @@
+"""
+rasterizer.py
+
+This module burns circles into label rasters aligned to a raster grid.
+Circles are drawn from their parameters instead of polygons: every pixel
+whose center lies within the radius of a circle is set. The raster is
+processed in windows in parallel, each window only considers the circles
+overlapping it and draws all of them with array operations.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+import os
+from typing import Iterator, Optional, Tuple
+import numpy as np
+import rasterio
+from rasterio.transform import Affine
+from rasterio.windows import Window
+
+
+def label_dtype(values: Optional[np.ndarray]) -> np.dtype:
+    """
+    Returns the smallest unsigned integer type holding all labels, uint8
+    for binary masks.
+    """
+    if values is None or len(values) == 0:
+        return np.dtype(np.uint8)
+    maximum = int(np.max(values))
+    for dtype in (np.uint8, np.uint16, np.uint32):
+        if maximum <= np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    raise ValueError(f"Label {maximum} exceeds the uint32 range.")
+
+
+class CircleRasterizer:
+    """Class for burning circles into label rasters."""
+
+    def __init__(
+        self,
+        window_size: int = 512,
+        workers: Optional[int] = None,
+        batch_size: int = 256
+    ) -> None:
+        """
+        Initialize the CircleRasterizer.
+
+        Args:
+            window_size (int): Size of the processed windows in pixels, also
+                used as tile size of written rasters and therefore a
+                multiple of 16.
+            workers (Optional[int]): Number of threads, defaults to the
+                number of CPUs.
+            batch_size (int): Number of circles drawn at once within a
+                window. Memory grows with batch size times squared radius.
+        """
+        self.window_size = window_size
+        self.workers = workers
+        self.batch_size = batch_size
+
+    def windows(self, shape: Tuple[int, int]) -> Iterator[Window]:
+        """Split a raster of the given shape into windows."""
+        for row in range(0, shape[0], self.window_size):
+            for col in range(0, shape[1], self.window_size):
+                yield Window(
+                    col, row,
+                    min(self.window_size, shape[1] - col),
+                    min(self.window_size, shape[0] - row)
+                )
+
+    @staticmethod
+    def to_pixels(circles: np.ndarray, transform: Affine) -> np.ndarray:
+        """
+        Convert circles from map to pixel coordinates, i.e. columns and
+        rows of pixel corners, and radii in pixels.
+
+        .. note:: Circles stay circles only for grids with square pixels.
+        """
+        circles = np.asarray(circles, dtype=np.float64).reshape((-1, 3))
+        inverse = ~transform
+        pixels = np.empty_like(circles)
+        pixels[:, 0] = inverse.a * circles[:, 0] + inverse.b * \
+            circles[:, 1] + inverse.c
+        pixels[:, 1] = inverse.d * circles[:, 0] + inverse.e * \
+            circles[:, 1] + inverse.f
+        pixels[:, 2] = circles[:, 2] / np.sqrt(abs(transform.determinant))
+        return pixels
+
+    def burn(
+        self,
+        pixels: np.ndarray,
+        values: np.ndarray,
+        window: Window,
+        dtype: np.dtype
+    ) -> np.ndarray:
+        """
+        Draw circles given in pixel coordinates into a window.
+
+        Args:
+            pixels (np.ndarray): Circles in pixel coordinates.
+            values (np.ndarray): Label of every circle.
+            window (Window): The window to draw.
+            dtype (np.dtype): Data type of the window.
+
+        Returns:
+            np.ndarray: The window with every pixel whose center lies within
+            a circle set to its label. Where circles overlap, the later
+            circle wins.
+        """
+        height, width = int(window.height), int(window.width)
+        out = np.zeros((height, width), dtype=dtype)
+
+        # circle centers relative to the window, pixel centers are at .5
+        x = pixels[:, 0] - window.col_off - 0.5
+        y = pixels[:, 1] - window.row_off - 0.5
+        r = pixels[:, 2]
+        inside = (x + r >= 0) & (x - r <= width - 1) & \
+            (y + r >= 0) & (y - r <= height - 1)
+        x, y, r, values = x[inside], y[inside], r[inside], values[inside]
+
+        for start in range(0, x.size, self.batch_size):
+            batch = slice(start, start + self.batch_size)
+            extent = int(np.ceil(r[batch].max()))
+            offsets = np.arange(-extent, extent + 1)
+            cols = np.round(x[batch])[:, np.newaxis, np.newaxis] + \
+                offsets[np.newaxis, np.newaxis, :]
+            rows = np.round(y[batch])[:, np.newaxis, np.newaxis] + \
+                offsets[np.newaxis, :, np.newaxis]
+            disk = (
+                (cols - x[batch, np.newaxis, np.newaxis]) ** 2 +
+                (rows - y[batch, np.newaxis, np.newaxis]) ** 2 <=
+                r[batch, np.newaxis, np.newaxis] ** 2
+            ) & (cols >= 0) & (cols < width) & (rows >= 0) & (rows < height)
+            circle, row, col = np.nonzero(disk)
+            out[
+                rows[circle, row, 0].astype(np.intp),
+                cols[circle, 0, col].astype(np.intp)
+            ] = values[batch][circle]
+        return out
+
+    def burn_windows(
+        self,
+        pixels: np.ndarray,
+        values: np.ndarray,
+        shape: Tuple[int, int],
+        dtype: np.dtype
+    ) -> Iterator[Tuple[Window, np.ndarray]]:
+        """
+        Draw all windows of a raster in parallel and yield them in order.
+        Only twice as many windows as threads are in flight at once.
+        """
+        workers = self.workers or os.cpu_count() or 1
+        windows = self.windows(shape)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            while chunk := list(islice(windows, 2 * workers)):
+                yield from zip(chunk, executor.map(
+                    lambda w: self.burn(pixels, values, w, dtype), chunk
+                ))
+
+    def _labels(
+        self,
+        circles: np.ndarray,
+        values: Optional[np.ndarray]
+    ) -> Tuple[np.ndarray, np.dtype]:
+        dtype = label_dtype(values)
+        if values is None:
+            values = np.ones(len(circles))
+        return np.asarray(values).astype(dtype), dtype
+
+    def rasterize(
+        self,
+        circles: np.ndarray,
+        transform: Affine,
+        shape: Tuple[int, int],
+        values: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """
+        Burn circles into an in-memory raster.
+
+        Args:
+            circles (np.ndarray): Array of shape (N, 3) with center x,
+                center y and radius in map coordinates.
+            transform (Affine): Affine transformation of the raster.
+            shape (Tuple[int, int]): Rows and columns of the raster.
+            values (Optional[np.ndarray]): Label of every circle, e.g. field
+                IDs. 0 is background. By default, a binary mask is burnt.
+
+        Returns:
+            np.ndarray: The label raster.
+        """
+        pixels = self.to_pixels(circles, transform)
+        values, dtype = self._labels(pixels, values)
+        raster = np.zeros(shape, dtype=dtype)
+        for window, data in self.burn_windows(pixels, values, shape, dtype):
+            raster[window.toslices()] = data
+        return raster
+
+    def write(
+        self,
+        filename: str,
+        circles: np.ndarray,
+        transform: Affine,
+        shape: Tuple[int, int],
+        crs: Optional[str] = None,
+        values: Optional[np.ndarray] = None
+    ) -> None:
+        """
+        Burn circles into a tiled and compressed GeoTIFF. Windows are drawn
+        in parallel and written in order as they are finished, so the
+        raster is never held in memory as a whole.
+
+        Args:
+            filename (str): Path to the output raster.
+            circles (np.ndarray): Array of shape (N, 3) with center x,
+                center y and radius in map coordinates.
+            transform (Affine): Affine transformation of the raster.
+            shape (Tuple[int, int]): Rows and columns of the raster.
+            crs (Optional[str]): Coordinate reference system of the raster.
+            values (Optional[np.ndarray]): Label of every circle, e.g. field
+                IDs. 0 is background. By default, a binary mask is burnt.
+        """
+        pixels = self.to_pixels(circles, transform)
+        values, dtype = self._labels(pixels, values)
+        profile = {
+            "driver": "GTiff",
+            "height": shape[0],
+            "width": shape[1],
+            "count": 1,
+            "dtype": dtype.name,
+            "crs": crs,
+            "transform": transform,
+            "nodata": None,
+            "compress": "deflate",
+            "tiled": True,
+            "blockxsize": self.window_size,
+            "blockysize": self.window_size,
+        }
+        with rasterio.open(filename, "w", **profile) as dataset:
+            for window, data in self.burn_windows(
+                pixels, values, shape, dtype
+            ):
+                dataset.write(data, 1, window=window)
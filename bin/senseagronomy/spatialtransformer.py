@@ -6,9 +6,77 @@ transform these coordinates, create a GeoDataFrame, and save it as a file.
 """
 
 import json
-from typing import List, Tuple, Dict
+import os
+import re
+from typing import List, Tuple, Dict, Optional, Sequence, Union
+from rasterio.transform import Affine
+import shapely
 from shapely.geometry import Polygon
 import geopandas as gpd
+import numpy as np
+import pandas as pd
+from senseagronomy.writer import GeoPackageWriter
+
+CircleCoordinates = Union[List[List[Tuple[float, float]]], np.ndarray]
+
+IMAGE_NAME = re.compile(r"^(?P<tile>X\d+_Y\d+)_(?P<year>\d{4})")
+
+MANIFEST_COLUMNS = ("image", "a", "b", "c", "d", "e", "f", "crs")
+
+
+def parse_image_name(name: str) -> Tuple[Optional[str], Optional[int]]:
+    """
+    Extracts datacube tile and year from an image name following the
+    `{tile}_{year}_*` naming scheme of the workflow, e.g.
+    `X0001_Y0002_2020_max_NDVI.tif`.
+
+    Args:
+        name (str): Image file name or path.
+
+    Returns:
+        Tuple[Optional[str], Optional[int]]: Tile and year, None if the name
+        does not follow the naming scheme.
+    """
+    match = IMAGE_NAME.match(os.path.basename(name))
+    if match is None:
+        return None, None
+    return match.group("tile"), int(match.group("year"))
+
+
+def read_manifest(file_path: str) -> pd.DataFrame:
+    """
+    Reads a manifest mapping image names to their georeference. The
+    manifest is a CSV, JSON (list of records) or Parquet file with the
+    columns `image`, the affine transformation terms `a` to `f` in the
+    order of `rasterio.transform.Affine` and `crs`.
+
+    Args:
+        file_path (str): The path to the manifest file.
+
+    Returns:
+        pd.DataFrame: The manifest indexed by image file name.
+
+    Raises:
+        ValueError: If columns are missing or images are listed twice.
+    """
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension == ".parquet":
+        manifest = pd.read_parquet(file_path)
+    elif extension == ".json":
+        manifest = pd.read_json(file_path, orient="records")
+    else:
+        manifest = pd.read_csv(file_path)
+
+    missing = set(MANIFEST_COLUMNS) - set(manifest.columns)
+    if missing:
+        raise ValueError(
+            f"Manifest {file_path} lacks the columns {sorted(missing)}."
+        )
+    manifest = manifest.loc[:, list(MANIFEST_COLUMNS)]
+    manifest["image"] = manifest["image"].map(os.path.basename)
+    if manifest["image"].duplicated().any():
+        raise ValueError(f"Manifest {file_path} lists images twice.")
+    return manifest.set_index("image")
 
 
 class SpatialTransformer:
@@ -43,64 +111,230 @@ class SpatialTransformer:
 
     def transform_coordinates(
         self,
-        circle_coordinates: List[List[Tuple[float, float]]],
-        origin: Tuple[float, float],
-        pixel_size: Tuple[float, float]
-    ) -> List[List[Tuple[float, float]]]:
+        circle_coordinates: CircleCoordinates,
+        origin: Optional[Tuple[float, float]] = None,
+        pixel_size: Optional[Tuple[float, float]] = None,
+        transform: Optional[Affine] = None,
+        pixel_center: bool = False
+    ) -> Union[np.ndarray, List[np.ndarray]]:
+        """
+        Transforms circle coordinates with an affine transformation, given
+        either as full geotransform or as origin and pixel size. All
+        vertices of all circles are transformed in a single array operation
+        if all circles have the same number of vertices, otherwise each
+        circle is transformed on its own.
+
+        Args:
+            circle_coordinates (Union[List[List[Tuple[float, float]]],
+                np.ndarray]): List of circles with coordinates or array of
+                shape (n_circles, n_vertices, 2).
+            origin (Optional[Tuple[float, float]]): The origin point for
+                transformation.
+            pixel_size (Optional[Tuple[float, float]]): pixel size for
+                transformation.
+            transform (Optional[Affine]): Full affine transformation
+                including rotation terms. Takes precedence over origin and
+                pixel size.
+            pixel_center (bool): Coordinates are pixel indices referring to
+                pixel centers, as returned by `CircleDetector`, and are
+                shifted by half a pixel before the transformation. By
+                default, coordinates refer to pixel corners.
+
+        Returns:
+            Union[np.ndarray, List[np.ndarray]]: Contiguous array of shape
+            (n_circles, n_vertices, 2) with the transformed coordinates, or
+            a list of arrays of shape (n_vertices, 2) if the circles have
+            different numbers of vertices.
+        """
+        transform = self.resolve_transform(origin, pixel_size, transform)
+        offset = 0.5 if pixel_center else 0.0
+        try:
+            coordinates = np.asarray(circle_coordinates, dtype=np.float64)
+        except ValueError:
+            # circles with differing number of vertices
+            return [
+                self.apply_transform(
+                    np.asarray(circle, dtype=np.float64) + offset, transform
+                )
+                for circle in circle_coordinates
+            ]
+        if coordinates.size == 0:
+            return np.empty((0, 0, 2), dtype=np.float64)
+        return self.apply_transform(coordinates + offset, transform)
+
+    @staticmethod
+    def apply_transform(
+        coordinates: np.ndarray,
+        transform: Affine
+    ) -> np.ndarray:
+        """
+        Applies an affine transformation to an array of coordinates with
+        x and y in the last dimension.
+
+        Args:
+            coordinates (np.ndarray): Array of shape (..., 2).
+            transform (Affine): The affine transformation.
+
+        Returns:
+            np.ndarray: Contiguous array of the transformed coordinates.
+        """
+        matrix = np.array(
+            [[transform.a, transform.d], [transform.b, transform.e]]
+        )
+        return np.ascontiguousarray(
+            coordinates @ matrix + np.array([transform.c, transform.f])
+        )
+
+    def transform_circles(
+        self,
+        circles: np.ndarray,
+        origin: Optional[Tuple[float, float]] = None,
+        pixel_size: Optional[Tuple[float, float]] = None,
+        transform: Optional[Affine] = None
+    ) -> np.ndarray:
         """
-        Transforms circle coordinates based on the origin and pixel size.
+        Transforms circle parameters (center x, center y, radius and any
+        further columns) with an affine transformation. Radii are scaled by
+        the square root of the pixel area.
+
+        .. note:: Circles stay circles only for transformations with square
+            pixels; otherwise the radius is the one of the circle of equal
+            area.
 
         Args:
-            circle_coordinates (List[List[Tuple[float, float]]]): List of
-            circles with coordinates.
-            origin (Tuple[float, float]): The origin point for transformation.
-            pixel_size (Tuple[float, float]): pixel size for transformation.
+            circles (np.ndarray): Array of shape (N, >=3) with center x,
+                center y and radius in pixel coordinates.
+            origin (Optional[Tuple[float, float]]): The origin point for
+                transformation.
+            pixel_size (Optional[Tuple[float, float]]): pixel size for
+                transformation.
+            transform (Optional[Affine]): Full affine transformation.
 
         Returns:
-            List[List[Tuple[float, float]]]: Transformed coordinates.
+            np.ndarray: Contiguous copy of circles with transformed centers
+            and radii.
+        """
+        transform = self.resolve_transform(origin, pixel_size, transform)
+        transformed = np.array(circles, dtype=np.float64, order="C", ndmin=2)
+        if transformed.size == 0:
+            return transformed.reshape((0, max(transformed.shape[1], 3)))
+
+        transformed[:, :2] = self.transform_coordinates(
+            transformed[np.newaxis, :, :2], transform=transform
+        )[0]
+        transformed[:, 2] *= np.sqrt(abs(transform.determinant))
+        return transformed
+
+    @staticmethod
+    def resolve_transform(
+        origin: Optional[Tuple[float, float]] = None,
+        pixel_size: Optional[Tuple[float, float]] = None,
+        transform: Optional[Affine] = None
+    ) -> Affine:
         """
-        transformed_circles = []
-        x_origin, y_origin = origin
-        x_size, y_size = pixel_size
+        Returns the given affine transformation or builds one from origin
+        and pixel size.
 
-        for circle in circle_coordinates:
-            transformed_circle = []
-            for x, y in circle:
-                spatial_x = x_origin + x * x_size
-                spatial_y = y_origin + y * y_size
-                transformed_circle.append((spatial_x, spatial_y))
-            transformed_circles.append(transformed_circle)
-        return transformed_circles
+        Raises:
+            ValueError: If neither transform nor origin and pixel size are
+            given.
+        """
+        if transform is not None:
+            return transform
+        if origin is None or pixel_size is None:
+            raise ValueError(
+                "Either transform or origin and pixel size must be given."
+            )
+        return Affine(
+            pixel_size[0], 0, origin[0], 0, pixel_size[1], origin[1]
+        )
 
     def create_geodataframe(
         self,
-        transformed_circles: List[List[Tuple[float, float]]],
-        crs: str
+        transformed_circles: CircleCoordinates,
+        crs: str,
+        attributes: Optional[Dict[str, Sequence]] = None
+    ) -> gpd.GeoDataFrame:
+        """
+        Creates a GeoDataFrame from the transformed circle coordinates. All
+        polygons are constructed at once from the coordinate array.
+
+        Args:
+            transformed_circles (Union[List[List[Tuple[float, float]]],
+                np.ndarray]): Transformed circle coordinates.
+            crs (str): The coordinate reference system.
+            attributes (Optional[Dict[str, Sequence]]): Attribute columns
+                with one value per circle.
+
+        Returns:
+            gpd.GeoDataFrame: The resulting GeoDataFrame.
+        """
+        try:
+            coordinates = np.asarray(transformed_circles, dtype=np.float64)
+        except ValueError:
+            # circles with differing number of vertices
+            coordinates = None
+
+        if coordinates is None:
+            polygons = [Polygon(circle) for circle in transformed_circles]
+        elif coordinates.size == 0:
+            polygons = []
+        else:
+            polygons = shapely.polygons(coordinates)
+
+        return gpd.GeoDataFrame(attributes, geometry=polygons, crs=crs)
+
+    def create_geodataframe_from_circles(
+        self,
+        circles: np.ndarray,
+        crs: str,
+        attributes: Optional[Dict[str, Sequence]] = None,
+        quad_segs: int = 16
     ) -> gpd.GeoDataFrame:
         """
-        Creates a GeoDataFrame from the transformed circle coordinates.
+        Creates a GeoDataFrame by buffering all circle centers with their
+        radii at once.
 
         Args:
-            transformed_circles (List[List[Tuple[float, float]]]):
-                Transformed circle coordinates.
+            circles (np.ndarray): Array of shape (N, >=3) with center x,
+                center y and radius in spatial coordinates.
             crs (str): The coordinate reference system.
+            attributes (Optional[Dict[str, Sequence]]): Attribute columns
+                with one value per circle.
+            quad_segs (int): Number of segments per quarter circle.
 
         Returns:
             gpd.GeoDataFrame: The resulting GeoDataFrame.
         """
-        polygons = [Polygon(circle) for circle in transformed_circles]
-        gdf = gpd.GeoDataFrame(geometry=polygons, crs=crs)
-        return gdf
+        circles = np.asarray(circles, dtype=np.float64)
+        if circles.size == 0:
+            circles = circles.reshape((0, 3))
+        polygons = shapely.buffer(
+            shapely.points(circles[:, 0], circles[:, 1]),
+            circles[:, 2],
+            quad_segs=quad_segs
+        )
+        return gpd.GeoDataFrame(attributes, geometry=polygons, crs=crs)
 
     def save_geodataframe(
         self,
-        gdf: gpd.GeoDataFrame, output_file: str
+        gdf: gpd.GeoDataFrame, output_file: str,
+        layer: Optional[str] = None, append: bool = False
     ) -> None:
         """
-        Saves the GeoDataFrame to a file.
+        Saves the GeoDataFrame to a file. Files ending in `.parquet` are
+        written as GeoParquet, all others as GeoPackage in one transaction.
 
         Args:
             gdf (gpd.GeoDataFrame): The GeoDataFrame to save.
             output_file (str): The path to the output file.
+            layer (Optional[str]): The GeoPackage layer, defaults to the
+                file name without extension.
+            append (bool): Append to an existing GeoPackage layer.
         """
-        gdf.to_file(output_file, driver='GPKG')
+        if output_file.endswith('.parquet'):
+            gdf.to_parquet(output_file, index=False)
+        else:
+            if layer is None:
+                layer = os.path.splitext(os.path.basename(output_file))[0]
+            GeoPackageWriter(output_file, layer, append=append).write([gdf])
@@ -0,0 +1,323 @@
+"""
+tiled_assessment.py
+
+This module evaluates predicted circles against validation circles tile
+by tile in a process pool, so neither dataset has to be held in memory as
+a whole. Every tile reads the circles overlapping its extent plus a halo.
+Circles are owned by the tile containing a point on their surface, and
+groups of circles competing for the same matches, i.e. the components of
+the graph of pairs above the IoU threshold, by the tile owning their
+first validation circle. A tile widens its read until all circles it owns
+are complete, so the reduced metrics are identical to evaluating all
+circles at once with `evaluate_thresholds`.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from math import fsum
+from typing import (
+    Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+)
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pyogrio
+import shapely
+from senseagronomy.accuracy_assessment import (
+    DEFAULT_THRESHOLDS, average_precision, covered_fraction,
+    matching_components, optimal_matching, pair_iou,
+    precision_recall_from_matches, score_matching, sparse_iou_matrix,
+    threshold_metrics
+)
+
+Bounds = Tuple[float, float, float, float]
+Tile = Tuple[int, int]
+
+
+class Source(NamedTuple):
+    """A layer of a vector file."""
+    filename: str
+    layer: Optional[str] = None
+
+
+class TileResult(NamedTuple):
+    """Partial results of one tile, reduced by `TiledAssessment.assess`."""
+    n_pred: int
+    n_true: int
+    best_iou: np.ndarray
+    matched_iou: Dict[float, np.ndarray]
+    overlapping: Dict[float, int]
+    scores: Dict[float, Tuple[np.ndarray, np.ndarray, np.ndarray]]
+    tp: List[Tuple[int, int]]
+
+
+class TiledAssessment:
+    """Class for evaluating predicted circles tile by tile in parallel."""
+
+    def __init__(
+        self,
+        tile_size: float = 30000.0,
+        halo: float = 1000.0,
+        origin: Tuple[float, float] = (0.0, 0.0),
+        workers: Optional[int] = None,
+        analytic: bool = False
+    ) -> None:
+        """
+        Initialize the TiledAssessment.
+
+        Args:
+            tile_size (float): Edge length of the tiles in map units.
+            halo (float): Margin read around every tile. Should exceed the
+                largest circle diameter, otherwise tiles need to widen
+                their read, which is correct but slower.
+            origin (Tuple[float, float]): Upper left corner of the tile
+                grid, tiles are numbered from left to right and top to
+                bottom like datacube tiles.
+            workers (Optional[int]): Number of processes, defaults to the
+                number of CPUs.
+            analytic (bool): Compute IoU in closed form from circles fitted
+                to the geometries instead of polygon overlay.
+
+        Precision-recall curves of the last assessment are kept in `curves`
+        by IoU threshold, empty without score column.
+        """
+        self.tile_size = tile_size
+        self.halo = halo
+        self.origin = origin
+        self.workers = workers
+        self.analytic = analytic
+        self.curves: Dict[float, pd.DataFrame] = {}
+
+    def tile_of(self, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+        """Returns the column and row of the tiles containing points."""
+        return np.column_stack([
+            np.floor((np.asarray(x) - self.origin[0]) / self.tile_size),
+            np.floor((self.origin[1] - np.asarray(y)) / self.tile_size)
+        ]).astype(np.int64)
+
+    def tile_bounds(self, tile: Tile) -> Bounds:
+        """Returns the extent of a tile."""
+        xmin = self.origin[0] + tile[0] * self.tile_size
+        ymax = self.origin[1] - tile[1] * self.tile_size
+        return xmin, ymax - self.tile_size, xmin + self.tile_size, ymax
+
+    def tiles(self, bounds: Bounds) -> Iterator[Tile]:
+        """Returns all tiles overlapping an extent."""
+        (col_min, row_max), (col_max, row_min) = self.tile_of(
+            [bounds[0], bounds[2]], [bounds[1], bounds[3]]
+        )
+        for row in range(row_min, row_max + 1):
+            for col in range(col_min, col_max + 1):
+                yield col, row
+
+    def owned(self, geometries: np.ndarray, tile: Tile) -> np.ndarray:
+        """Returns whether the geometries are owned by a tile."""
+        if len(geometries) == 0:
+            return np.zeros(0, dtype=bool)
+        points = shapely.get_coordinates(shapely.point_on_surface(geometries))
+        return np.all(self.tile_of(points[:, 0], points[:, 1]) == tile,
+                      axis=1)
+
+    @staticmethod
+    def read(source: Source, bbox: Bounds,
+             columns: Sequence[str] = ()) -> gpd.GeoDataFrame:
+        """
+        Reads the geometries of a source intersecting a bounding box,
+        indexed and sorted by feature ID.
+        """
+        gdf = gpd.read_file(source.filename, layer=source.layer, bbox=bbox,
+                            columns=list(columns), fid_as_index=True)
+        return gdf.sort_index()
+
+    def assess_tile(
+        self,
+        tile: Tile,
+        predicted: Source,
+        validation: Source,
+        thresholds: Sequence[float],
+        score_column: Optional[str] = None,
+        tp_threshold: float = 0.5
+    ) -> TileResult:
+        """
+        Evaluates the circles and components owned by a tile.
+
+        Args:
+            tile (Tile): Column and row of the tile.
+            predicted (Source): The predicted circles.
+            validation (Source): The validation circles.
+            thresholds (Sequence[float]): IoU thresholds to evaluate.
+            score_column (Optional[str]): Column of the detection scores.
+            tp_threshold (float): IoU threshold of the returned matches.
+
+        Returns:
+            TileResult: Counts, IoU values and matches of the tile.
+        """
+        core = self.tile_bounds(tile)
+        load = (core[0] - self.halo, core[1] - self.halo,
+                core[2] + self.halo, core[3] + self.halo)
+        all_thresholds = sorted(set(thresholds) | {tp_threshold})
+        columns = [score_column] if score_column is not None else []
+
+        while True:
+            pred = self.read(predicted, load, columns)
+            true = self.read(validation, load)
+            pred_geometries = np.asarray(pred.geometry.values)
+            true_geometries = np.asarray(true.geometry.values)
+            iou = sparse_iou_matrix(pred_geometries, true_geometries,
+                                    self.analytic)
+            pred_owned = self.owned(pred_geometries, tile)
+            true_owned = self.owned(true_geometries, tile)
+
+            pred_needed, true_needed = pred_owned.copy(), true_owned.copy()
+            components = {}
+            for threshold in all_thresholds:
+                pred_component, true_component = matching_components(
+                    iou, threshold
+                )
+                count = len(pred) + len(true)
+                # the first validation circle decides the owner
+                first = np.full(count, len(true), dtype=np.intp)
+                np.minimum.at(first, true_component, np.arange(len(true)))
+                has_true = first < len(true)
+                owned = np.zeros(count, dtype=bool)
+                owned[has_true] = true_owned[first[has_true]]
+                components[threshold] = (pred_component, true_component,
+                                         owned, has_true)
+                pred_needed |= owned[pred_component]
+                true_needed |= owned[true_component]
+
+            # a circle is complete if everything intersecting it was read
+            incomplete = np.concatenate([
+                shapely.bounds(pred_geometries[pred_needed]),
+                shapely.bounds(true_geometries[true_needed])
+            ]).reshape((-1, 4))
+            incomplete = incomplete[
+                (incomplete[:, 0] < load[0]) | (incomplete[:, 1] < load[1]) |
+                (incomplete[:, 2] > load[2]) | (incomplete[:, 3] > load[3])
+            ]
+            if len(incomplete) == 0:
+                break
+            load = (min(load[0], incomplete[:, 0].min()),
+                    min(load[1], incomplete[:, 1].min()),
+                    max(load[2], incomplete[:, 2].max()),
+                    max(load[3], incomplete[:, 3].max()))
+
+        pairs = iou.tocoo()
+        best = np.zeros(len(pred))
+        np.maximum.at(best, pairs.row, pairs.data)
+        coverage = covered_fraction(pairs, shapely.area(pred_geometries),
+                                    shapely.area(true_geometries))
+        if score_column is not None:
+            scores = pred[score_column].to_numpy(dtype=np.float64)
+
+        matched_iou, overlapping, curves, tp = {}, {}, {}, []
+        for threshold in all_thresholds:
+            pred_component, true_component, owned, has_true = \
+                components[threshold]
+            rows = np.flatnonzero(owned[pred_component] &
+                                  has_true[pred_component])
+            cols = np.flatnonzero(owned[true_component])
+            sub = iou[rows][:, cols]
+            pred_idx, true_idx = optimal_matching(sub, threshold)
+            matched_iou[threshold] = pair_iou(sub, pred_idx, true_idx)
+            overlapping[threshold] = int(np.count_nonzero(
+                (coverage > threshold) & true_owned[pairs.col]
+            ))
+            if threshold == tp_threshold:
+                tp = list(zip(pred.index[rows[pred_idx]].tolist(),
+                              true.index[cols[true_idx]].tolist()))
+            if score_column is not None:
+                order, matched = score_matching(sub, scores[rows], threshold)
+                unmatched = np.flatnonzero(pred_owned &
+                                           ~has_true[pred_component])
+                curves[threshold] = (
+                    np.concatenate([scores[rows][order], scores[unmatched]]),
+                    np.concatenate([pred.index[rows][order],
+                                    pred.index[unmatched]]),
+                    np.concatenate([matched,
+                                    np.zeros(unmatched.size, dtype=bool)])
+                )
+
+        return TileResult(
+            int(pred_owned.sum()), int(true_owned.sum()),
+            best[pred_owned & (best > 0)], matched_iou, overlapping, curves,
+            tp
+        )
+
+    def assess(
+        self,
+        predicted: Source,
+        validation: Source,
+        thresholds: Sequence[float] = DEFAULT_THRESHOLDS,
+        score_column: Optional[str] = None,
+        tp_threshold: float = 0.5
+    ) -> Tuple[pd.DataFrame, List[Tuple[int, int]]]:
+        """
+        Evaluates predicted circles against validation circles in a process
+        pool and reduces the results of all tiles.
+
+        Args:
+            predicted (Source): The predicted circles.
+            validation (Source): The validation circles, in the same
+                coordinate reference system.
+            thresholds (Sequence[float]): IoU thresholds to evaluate.
+            score_column (Optional[str]): Column of the detection scores.
+                If given, the average precision is calculated as well.
+            tp_threshold (float): IoU threshold of the returned matches.
+
+        Returns:
+            Tuple[pd.DataFrame, List[Tuple[int, int]]]: The table of
+            `evaluate_thresholds` and the matches at `tp_threshold` as
+            pairs of predicted and validation feature IDs.
+        """
+        extents = np.array([
+            pyogrio.read_info(source.filename, layer=source.layer,
+                              force_total_bounds=True)["total_bounds"]
+            for source in (predicted, validation)
+        ], dtype=np.float64)
+        extents = extents[np.isfinite(extents).all(axis=1)]
+        tiles = list(self.tiles((
+            extents[:, 0].min(), extents[:, 1].min(),
+            extents[:, 2].max(), extents[:, 3].max()
+        ))) if len(extents) else []
+
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            results = list(executor.map(partial(
+                self.assess_tile, predicted=predicted, validation=validation,
+                thresholds=thresholds, score_column=score_column,
+                tp_threshold=tp_threshold
+            ), tiles))
+
+        n_pred = sum(result.n_pred for result in results)
+        n_true = sum(result.n_true for result in results)
+        best_iou = np.concatenate([np.empty(0)] +
+                                  [result.best_iou for result in results])
+        average_iou = fsum(best_iou) / best_iou.size if best_iou.size else 0
+
+        metrics = []
+        self.curves = {}
+        for threshold in thresholds:
+            metric = threshold_metrics(
+                threshold, n_pred, n_true,
+                np.concatenate([np.empty(0)] + [
+                    result.matched_iou[threshold] for result in results
+                ]),
+                average_iou,
+                sum(result.overlapping[threshold] for result in results)
+            )
+            if score_column is not None:
+                scores, fids, matched = (np.concatenate(
+                    [np.empty(0, dtype=dtype)] +
+                    [result.scores[threshold][i] for result in results]
+                ) for i, dtype in enumerate((np.float64, np.int64, bool)))
+                order = np.lexsort((fids, -scores))
+                self.curves[threshold] = precision_recall_from_matches(
+                    scores[order], matched[order], n_true
+                )
+                metric["average_precision"] = average_precision(
+                    self.curves[threshold]
+                )
+            metrics.append(metric)
+
+        tp = sorted(pair for result in results for pair in result.tp)
+        return pd.DataFrame(metrics), tp
@@ -0,0 +1,164 @@
+"""
+Tracking Module
+
+This module follows fields over the years. Circles of consecutive years
+are linked if they overlap by IoU or center distance, the same criteria
+used to merge duplicates across tiles. Linked circles share a persistent
+field ID; fields appearing, disappearing or changing their radius are
+recorded as events. Candidate links are taken from a spatial index, so
+the runtime grows near-linearly with the number of fields.
+"""
+
+from typing import Dict, List, Tuple
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
+from senseagronomy.merging import overlapping_pairs
+
+EVENTS = ("appear", "disappear", "resize")
+
+
+def link_circles(
+    previous: np.ndarray,
+    current: np.ndarray,
+    iou_threshold: float = 0.5,
+    distance_fraction: float = 0.5
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Link the circles of two years one-to-one.
+
+    Pairs whose IoU exceeds `iou_threshold` or whose center distance is
+    below `distance_fraction` times the smaller radius are candidates.
+    Candidates are linked greedily by descending IoU, so every circle is
+    linked at most once.
+
+    Args:
+        previous (np.ndarray): Circle geometries of the earlier year.
+        current (np.ndarray): Circle geometries of the later year.
+        iou_threshold (float): Minimum IoU of linked circles.
+        distance_fraction (float): Maximum center distance of linked
+            circles relative to the smaller radius.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Indices of linked circles in
+        `previous` and `current`.
+    """
+    if len(previous) == 0 or len(current) == 0:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+
+    left, right, iou, distance = overlapping_pairs(previous, current)
+    candidate = (iou > iou_threshold) | (distance < distance_fraction)
+    left, right, iou = left[candidate], right[candidate], iou[candidate]
+    order = np.argsort(-iou, kind="stable")
+
+    used_previous = np.zeros(len(previous), dtype=bool)
+    used_current = np.zeros(len(current), dtype=bool)
+    linked = []
+    for i, j in zip(left[order].tolist(), right[order].tolist()):
+        if used_previous[i] or used_current[j]:
+            continue
+        used_previous[i] = used_current[j] = True
+        linked.append((i, j))
+
+    if not linked:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+    links = np.array(linked, dtype=np.intp)
+    return links[:, 0], links[:, 1]
+
+
+def track_fields(
+    layers: Dict[int, gpd.GeoDataFrame],
+    iou_threshold: float = 0.5,
+    distance_fraction: float = 0.5,
+    resize_tolerance: float = 0.1
+) -> Tuple[gpd.GeoDataFrame, pd.DataFrame]:
+    """
+    Assign persistent field IDs to the circles of all years and record
+    the development of every field.
+
+    Args:
+        layers (Dict[int, gpd.GeoDataFrame]): Circles per year. Years are
+            reprojected to the coordinate reference system of the first.
+        iou_threshold (float): Minimum IoU of linked circles.
+        distance_fraction (float): Maximum center distance of linked
+            circles relative to the smaller radius.
+        resize_tolerance (float): Relative radius change above which a
+            linked field is recorded as resized.
+
+    Returns:
+        Tuple[gpd.GeoDataFrame, pd.DataFrame]: The field history, i.e. all
+        circles with their `year`, `field_id` and area-equivalent `radius`,
+        and the events with the columns `field_id`, `year`, `event`,
+        `radius_before` and `radius_after`. Fields of the first year are
+        not recorded as appearing.
+    """
+    years = sorted(layers)
+    history: List[gpd.GeoDataFrame] = []
+    events: List[pd.DataFrame] = []
+    next_id = 0
+    previous_ids = np.empty(0, dtype=np.int64)
+    previous_radius = np.empty(0)
+    previous_geometries = np.empty(0, dtype=object)
+
+    def record(event, year, field_ids, before, after):
+        events.append(pd.DataFrame({
+            "field_id": field_ids,
+            "year": year,
+            "event": event,
+            "radius_before": before,
+            "radius_after": after,
+        }))
+
+    for year in years:
+        gdf = layers[year]
+        if history and gdf.crs != history[0].crs:
+            gdf = gdf.to_crs(history[0].crs)
+        geometries = np.asarray(gdf.geometry.values)
+        radius = np.sqrt(shapely.area(geometries) / np.pi)
+        ids = np.full(len(gdf), -1, dtype=np.int64)
+
+        left, right = link_circles(
+            previous_geometries, geometries, iou_threshold, distance_fraction
+        )
+        ids[right] = previous_ids[left]
+
+        appeared = ids < 0
+        ids[appeared] = np.arange(next_id, next_id + appeared.sum())
+        next_id += int(appeared.sum())
+
+        disappeared = np.ones(len(previous_ids), dtype=bool)
+        disappeared[left] = False
+        with np.errstate(invalid="ignore", divide="ignore"):
+            change = np.abs(radius[right] / previous_radius[left] - 1)
+        resized = change > resize_tolerance
+
+        if year != years[0]:
+            record("appear", year, ids[appeared],
+                   np.nan, radius[appeared])
+        record("disappear", year, previous_ids[disappeared],
+               previous_radius[disappeared], np.nan)
+        record("resize", year, ids[right[resized]],
+               previous_radius[left[resized]], radius[right[resized]])
+
+        tracked = gdf.copy()
+        tracked["year"] = year
+        tracked["field_id"] = ids
+        tracked["radius"] = radius
+        history.append(tracked)
+
+        previous_ids, previous_radius = ids, radius
+        previous_geometries = geometries
+
+    crs = history[0].crs if history else None
+    history_gdf = gpd.GeoDataFrame(
+        pd.concat(history, ignore_index=True) if history else None,
+        crs=crs
+    )
+    events_df = pd.concat(events, ignore_index=True) if events else \
+        pd.DataFrame(columns=["field_id", "year", "event", "radius_before",
+                              "radius_after"])
+    events_df["event"] = pd.Categorical(events_df["event"], EVENTS)
+    return history_gdf, events_df.sort_values(
+        ["year", "field_id"], ignore_index=True
+    )
@@ -0,0 +1,209 @@
+"""
+Tuning Module
+
+This module evaluates Hough Circle Transform parameters against validation
+data. Every configuration of a parameter grid is run on a set of prepared
+images in a process pool and scored with the metrics of the accuracy
+assessment, alongside the time spent on detection. Configurations on the
+speed/accuracy Pareto front are flagged.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+from rasterio.transform import array_bounds
+from shapely.geometry import box
+from shapely.ops import unary_union
+from senseagronomy.accuracy_assessment import (
+    calculate_iou, calculate_metrics, match_circles
+)
+from senseagronomy.circledetector import CircleDetector
+from senseagronomy.detectorbackend import HoughBackend
+from senseagronomy.preprocessing import PreparedImage, Preprocessor
+from senseagronomy.spatialtransformer import SpatialTransformer
+
+# state shared with worker processes, set once per process by _initialize
+_STATE: Dict = {}
+
+
+def parameter_grid(
+    dp: Sequence[float],
+    min_dist: Sequence[float],
+    param1: Sequence[float],
+    param2: Sequence[float],
+    radius_ranges: Sequence[Tuple[int, int]]
+) -> List[Dict]:
+    """
+    Build all combinations of Hough parameters.
+
+    Args:
+        dp (Sequence[float]): Inverse accumulator resolutions.
+        min_dist (Sequence[float]): Minimum distances between centers.
+        param1 (Sequence[float]): Canny edge detector thresholds.
+        param2 (Sequence[float]): Accumulator thresholds.
+        radius_ranges (Sequence[Tuple[int, int]]): Minimum and maximum
+            radius pairs.
+
+    Returns:
+        List[Dict]: Keyword arguments for HoughBackend.
+    """
+    return [
+        {
+            "dp": values[0],
+            "min_dist": values[1],
+            "param1": values[2],
+            "param2": values[3],
+            "min_radius": values[4][0],
+            "max_radius": values[4][1]
+        }
+        for values in product(dp, min_dist, param1, param2, radius_ranges)
+    ]
+
+
+def georeference(
+    circles: np.ndarray,
+    prepared: PreparedImage
+) -> np.ndarray:
+    """
+    Convert circles in pixel coordinates, referring to pixel centers, to the
+    coordinate reference system of the prepared image.
+    """
+    circles = np.array(circles, dtype=np.float64, ndmin=2)
+    circles[:, :2] += 0.5
+    return SpatialTransformer().transform_circles(
+        circles, transform=prepared.transform
+    )
+
+
+def _initialize(
+    images: List[PreparedImage],
+    validation: gpd.GeoDataFrame,
+    iou_threshold: float
+) -> None:
+    _STATE["images"] = images
+    _STATE["validation"] = validation
+    _STATE["iou_threshold"] = iou_threshold
+
+
+def evaluate_configuration(config: Dict) -> Dict:
+    """
+    Detect circles on all prepared images of the worker with the given
+    Hough parameters and score them against the validation data.
+
+    Args:
+        config (Dict): Keyword arguments for HoughBackend.
+
+    Returns:
+        Dict: The configuration extended by the number of detections,
+        detection runtime, precision, recall, F1-score and average IoU.
+    """
+    detector = CircleDetector(backend=HoughBackend(**config))
+    validation = _STATE["validation"]
+
+    circles = [np.empty((0, 4))]
+    start = time.perf_counter()
+    for prepared in _STATE["images"]:
+        circles.append(
+            georeference(detector.detect_windows(prepared), prepared)
+        )
+    elapsed = time.perf_counter() - start
+
+    predicted = SpatialTransformer().create_geodataframe_from_circles(
+        np.concatenate(circles), validation.crs
+    )
+    tp, fp, fn = match_circles(
+        predicted, validation, _STATE["iou_threshold"], optimal=True
+    )
+    precision, recall, f1_score = calculate_metrics(tp, fp, fn)
+
+    return {
+        **config,
+        "detections": len(predicted),
+        "detection_seconds": elapsed,
+        "precision": precision,
+        "recall": recall,
+        "f1_score": f1_score,
+        "average_iou": calculate_iou(predicted, validation)
+    }
+
+
+def pareto_front(results: pd.DataFrame) -> pd.Series:
+    """
+    Flag configurations which are not dominated by any other configuration,
+    i.e. no other configuration is at least as fast and as accurate and
+    strictly better in one of both.
+    """
+    f1_score = results["f1_score"].to_numpy()
+    seconds = results["detection_seconds"].to_numpy()
+    dominated = (
+        (f1_score[np.newaxis, :] >= f1_score[:, np.newaxis]) &
+        (seconds[np.newaxis, :] <= seconds[:, np.newaxis]) &
+        (
+            (f1_score[np.newaxis, :] > f1_score[:, np.newaxis]) |
+            (seconds[np.newaxis, :] < seconds[:, np.newaxis])
+        )
+    ).any(axis=1)
+    return pd.Series(~dominated, index=results.index, name="pareto")
+
+
+def tune(
+    filenames: List[str],
+    validation: gpd.GeoDataFrame,
+    configs: List[Dict],
+    preprocessor: Optional[Preprocessor] = None,
+    iou_threshold: float = 0.5,
+    workers: Optional[int] = None
+) -> pd.DataFrame:
+    """
+    Evaluate all configurations in parallel.
+
+    Validation circles outside the extent of the images are ignored. Images
+    are prepared once up front and the prepared arrays are handed to the
+    workers, which never read or filter the images themselves.
+
+    Args:
+        filenames (List[str]): Paths to the images.
+        validation (gpd.GeoDataFrame): Validation circles.
+        configs (List[Dict]): Keyword arguments for HoughBackend.
+        preprocessor (Optional[Preprocessor]): Preprocessor for the images.
+        iou_threshold (float): IoU threshold for matching circles.
+        workers (Optional[int]): Number of worker processes, defaults to
+            the number of CPUs.
+
+    Returns:
+        pd.DataFrame: One row per configuration, sorted by descending
+        F1-score, with a boolean `pareto` column.
+
+    Raises:
+        ValueError: If there are no configurations.
+    """
+    if not configs:
+        raise ValueError("No configurations to evaluate.")
+    if preprocessor is None:
+        preprocessor = Preprocessor()
+    prepared = [preprocessor.prepare(f) for f in filenames]
+
+    extent = []
+    for image in prepared:
+        height, width = image.image.shape
+        extent.append(box(*array_bounds(height, width, image.transform)))
+    if prepared:
+        validation = validation.to_crs(prepared[0].crs)
+    inside = validation.geometry.within(unary_union(extent))
+    validation = validation[inside.to_numpy()].reset_index(drop=True)
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_initialize,
+        initargs=(prepared, validation, iou_threshold)
+    ) as executor:
+        results = pd.DataFrame(list(executor.map(evaluate_configuration,
+                                                 configs)))
+
+    results["pareto"] = pareto_front(results)
+    return results.sort_values("f1_score", ascending=False,
+                               ignore_index=True)
@@ -0,0 +1,193 @@
+"""
+validation.py
+
+This module caches validation layers in a binary form that loads without
+parsing the GeoPackage again. Every layer is stored once per file version,
+identified by path, size and modification time, and layer name as a
+directory of NumPy arrays: the concatenated WKB of all geometries with
+their offsets, the fitted circle parameters, the bounding boxes, the
+areas and the feature IDs. The arrays are memory-mapped when loaded, so repeated assessments
+of the same layer only read the parts they touch. Candidate pairs are
+found on the bounding boxes and geometries are only decoded where needed.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+from typing import Optional
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
+from senseagronomy.circles import circle_parameters
+from senseagronomy.preprocessing import file_signature
+
+ARRAYS = ("wkb", "offsets", "circles", "bounds", "areas", "fids")
+
+
+class ValidationLayer:
+    """A cached validation layer with memory-mapped arrays."""
+
+    def __init__(self, path: str) -> None:
+        """
+        Open a cached validation layer.
+
+        Args:
+            path (str): Directory of the cache entry.
+        """
+        self.path = path
+        for name in ARRAYS:
+            setattr(self, name, np.load(os.path.join(path, f"{name}.npy"),
+                                        mmap_mode="r"))
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as file:
+            meta = json.load(file)
+        self.crs: Optional[str] = meta["crs"]
+        self.columns = meta["columns"]
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def geometries(self, indices: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Decode the geometries from their WKB.
+
+        Args:
+            indices (Optional[np.ndarray]): Positions of the decoded
+                geometries, all geometries if not given.
+
+        Returns:
+            np.ndarray: The decoded geometries.
+        """
+        offsets = np.asarray(self.offsets)
+        if indices is None:
+            indices = np.arange(len(self))
+        return shapely.from_wkb(np.array(
+            [self.wkb[offsets[i]:offsets[i + 1]].tobytes() for i in indices],
+            dtype=object
+        ).reshape(-1))
+
+    def tree(self) -> shapely.STRtree:
+        """
+        Build a spatial index over the bounding boxes of the geometries,
+        which only needs the cached bounds and no geometry decoding.
+        """
+        return shapely.STRtree(shapely.box(*np.asarray(self.bounds).T))
+
+    def attributes(self) -> Optional[pd.DataFrame]:
+        """Return the attribute columns, None if there are none."""
+        if not self.columns:
+            return None
+        return pd.read_parquet(os.path.join(self.path, "attributes.parquet"))
+
+    def take(self, indices: np.ndarray) -> gpd.GeoDataFrame:
+        """
+        Return the features at some positions as GeoDataFrame indexed by
+        feature ID, decoding only their geometries.
+        """
+        indices = np.asarray(indices, dtype=np.intp)
+        fids = pd.Index(np.asarray(self.fids)[indices], name="fid")
+        attributes = self.attributes()
+        if attributes is not None:
+            attributes = attributes.iloc[indices].set_axis(fids)
+        return gpd.GeoDataFrame(attributes, geometry=self.geometries(indices),
+                                index=fids, crs=self.crs)
+
+    def to_geodataframe(self) -> gpd.GeoDataFrame:
+        """
+        Return the layer as GeoDataFrame indexed by feature ID, including
+        its attributes.
+        """
+        return self.take(np.arange(len(self)))
+
+
+class ValidationCache:
+    """Class for converting validation layers into cached binary form."""
+
+    def __init__(self, cache_dir: str) -> None:
+        """
+        Initialize the ValidationCache.
+
+        Args:
+            cache_dir (str): Directory of the cache.
+        """
+        self.cache_dir = cache_dir
+        self.last_cache_hit = False
+
+    @staticmethod
+    def cache_key(filename: str, layer: Optional[str] = None) -> str:
+        """
+        Derive the cache key from file signature and layer name, which
+        only needs a `stat` call instead of reading the file.
+        """
+        return hashlib.sha256(json.dumps(
+            {"file": file_signature(filename), "layer": layer},
+            sort_keys=True
+        ).encode()).hexdigest()
+
+    def store(self, gdf: gpd.GeoDataFrame, path: str) -> None:
+        """
+        Store a GeoDataFrame indexed by feature ID as cache entry. The
+        entry is written to a temporary directory first and renamed
+        afterwards, so concurrent readers never see partially written
+        entries.
+        """
+        geometries = np.asarray(gdf.geometry.values)
+        wkb = shapely.to_wkb(geometries)
+        lengths = np.fromiter((len(value) for value in wkb), dtype=np.int64,
+                              count=len(wkb))
+        arrays = {
+            "wkb": np.frombuffer(b"".join(wkb), dtype=np.uint8),
+            "offsets": np.concatenate([[0], np.cumsum(lengths)]),
+            "circles": circle_parameters(geometries),
+            "bounds": shapely.bounds(geometries),
+            "areas": shapely.area(geometries),
+            "fids": np.asarray(gdf.index, dtype=np.int64),
+        }
+        attributes = gdf.drop(columns=gdf.geometry.name)
+
+        temporary = f"{path}.{os.getpid()}.tmp"
+        os.makedirs(temporary, exist_ok=True)
+        for name, values in arrays.items():
+            np.save(os.path.join(temporary, f"{name}.npy"), values)
+        if len(attributes.columns):
+            attributes.to_parquet(
+                os.path.join(temporary, "attributes.parquet"), index=False
+            )
+        with open(os.path.join(temporary, "meta.json"), "w",
+                  encoding="utf-8") as file:
+            json.dump({
+                "crs": gdf.crs.to_wkt() if gdf.crs else None,
+                "columns": list(attributes.columns)
+            }, file)
+        try:
+            os.rename(temporary, path)
+        except OSError:
+            # another process stored the same layer in the meantime
+            shutil.rmtree(temporary, ignore_errors=True)
+
+    def load(self, filename: str,
+             layer: Optional[str] = None) -> ValidationLayer:
+        """
+        Load a validation layer from the cache, converting and storing it
+        first if it is not cached yet.
+
+        Args:
+            filename (str): Path to the validation GeoPackage.
+            layer (Optional[str]): Name of the layer.
+
+        Returns:
+            ValidationLayer: The cached layer.
+
+        Raises:
+            FileNotFoundError: If the validation file does not exist.
+        """
+        if not os.path.exists(filename):
+            raise FileNotFoundError(f"File not found: {filename}")
+        path = os.path.join(self.cache_dir, self.cache_key(filename, layer))
+        self.last_cache_hit = os.path.isdir(path)
+        if not self.last_cache_hit:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self.store(gpd.read_file(filename, layer=layer,
+                                     fid_as_index=True), path)
+        return ValidationLayer(path)
@@ -0,0 +1,134 @@
+"""
+writer.py
+
+This module provides a bulk writer for GeoPackage layers based on the
+Arrow interface of pyogrio. GeoDataFrames are converted to Arrow record
+batches and streamed to GDAL in a single call, i.e. a single dataset
+session and transaction.
+"""
+
+from itertools import chain
+from typing import Iterable, Iterator, Optional
+import geopandas as gpd
+import pandas as pd
+import pyarrow as pa
+import shapely
+from pyogrio.raw import write_arrow
+
+
+class GeoPackageWriter:
+    """
+    A class to write one or many GeoDataFrames into a single GeoPackage
+    layer in one transaction.
+
+    .. note:: When a layer is created, GDAL defers building the R-tree
+        spatial index until all features are written and then creates it
+        in bulk. When appending to an existing layer, the index is kept up
+        to date by the GeoPackage triggers, still within one transaction.
+    """
+
+    GEOMETRY_COLUMN: str = "geometry"
+
+    def __init__(
+        self,
+        path: str,
+        layer: str,
+        append: bool = False,
+        batch_size: int = 100_000
+    ) -> None:
+        """
+        Initializes the GeoPackageWriter.
+
+        Args:
+            path (str): The path to the GeoPackage file.
+            layer (str): The name of the layer to write.
+            append (bool): Append to an existing layer instead of
+                (re)creating it.
+            batch_size (int): Maximum number of rows per record batch.
+        """
+        self.path = path
+        self.layer = layer
+        self.append = append
+        self.batch_size = batch_size
+        self.rows_written = 0
+
+    def to_table(
+        self,
+        gdf: gpd.GeoDataFrame,
+        schema: Optional[pa.Schema] = None
+    ) -> pa.Table:
+        """
+        Converts a GeoDataFrame into an Arrow table with the geometries
+        encoded as WKB.
+
+        Args:
+            gdf (gpd.GeoDataFrame): The GeoDataFrame to convert.
+            schema (Optional[pa.Schema]): Schema to conform to, used to keep
+                all batches of one write consistent.
+
+        Returns:
+            pa.Table: The converted table.
+        """
+        attributes = pd.DataFrame(gdf.drop(columns=gdf.geometry.name))
+        attributes[self.GEOMETRY_COLUMN] = shapely.to_wkb(
+            gdf.geometry.values
+        )
+        return pa.Table.from_pandas(
+            attributes, schema=schema, preserve_index=False
+        )
+
+    def _batches(
+        self,
+        first: pa.Table,
+        frames: Iterator[gpd.GeoDataFrame]
+    ) -> Iterator[pa.RecordBatch]:
+        for table in chain(
+            [first], (self.to_table(gdf, first.schema) for gdf in frames)
+        ):
+            for batch in table.to_batches(max_chunksize=self.batch_size):
+                self.rows_written += batch.num_rows
+                yield batch
+
+    def write(
+        self,
+        frames: Iterable[gpd.GeoDataFrame],
+        geometry_type: Optional[str] = None
+    ) -> int:
+        """
+        Writes all GeoDataFrames into the layer. Frames are consumed lazily,
+        so a generator keeps only one frame in memory at a time. Schema and
+        CRS are taken from the first frame.
+
+        Args:
+            frames (Iterable[gpd.GeoDataFrame]): The GeoDataFrames to write.
+            geometry_type (Optional[str]): The layer geometry type. Inferred
+                from the first frame if not given.
+
+        Returns:
+            int: The number of written rows.
+        """
+        frames = iter(frames)
+        first = next(frames, None)
+        if first is None:
+            return 0
+
+        if geometry_type is None:
+            types = first.geom_type.dropna().unique()
+            geometry_type = types[0] if len(types) == 1 else "Unknown"
+
+        table = self.to_table(first)
+        reader = pa.RecordBatchReader.from_batches(
+            table.schema, self._batches(table, frames)
+        )
+        self.rows_written = 0
+        write_arrow(
+            reader,
+            self.path,
+            layer=self.layer,
+            driver="GPKG",
+            geometry_name=self.GEOMETRY_COLUMN,
+            geometry_type=geometry_type,
+            crs=first.crs.to_wkt() if first.crs else None,
+            append=self.append
+        )
+        return self.rows_written
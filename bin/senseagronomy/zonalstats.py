@@ -0,0 +1,190 @@
+"""
+zonalstats.py
+
+This module computes NDVI statistics of all fields of a tile for every
+year. Fields are rasterized once into a label image on the grid of the
+tile. Every window of the label image is then reduced against the rasters
+of all years with label-indexed `bincount` and `reduceat` operations
+instead of masking the rasters field by field.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+import rasterio
+from rasterio.transform import Affine
+from rasterio.windows import Window
+from senseagronomy.rasterizer import CircleRasterizer
+
+
+class ZonalStatistics:
+    """Class for computing per field statistics of yearly rasters."""
+
+    def __init__(
+        self,
+        window_size: int = 512,
+        workers: Optional[int] = None
+    ) -> None:
+        """
+        Initialize the ZonalStatistics.
+
+        Args:
+            window_size (int): Size of the processed windows in pixels.
+            workers (Optional[int]): Number of threads, defaults to the
+                number of CPUs.
+        """
+        self.window_size = window_size
+        self.workers = workers
+
+    @staticmethod
+    def grid(rasters: Dict[int, str]) -> Tuple[Affine, Tuple[int, int], str]:
+        """
+        Returns transform, shape and CRS shared by all rasters.
+
+        Raises:
+            ValueError: If the rasters are not on the same grid.
+        """
+        grids = set()
+        for filename in rasters.values():
+            with rasterio.open(filename) as dataset:
+                grids.add((dataset.transform, dataset.shape, dataset.crs))
+        if len(grids) != 1:
+            raise ValueError("Rasters are not on the same grid.")
+        transform, shape, crs = grids.pop()
+        return transform, shape, crs
+
+    @staticmethod
+    def reduce(
+        labels: np.ndarray,
+        values: np.ndarray,
+        valid: np.ndarray,
+        count: int
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Reduce the values of a window per label.
+
+        Args:
+            labels (np.ndarray): Label of every pixel, 0 is background.
+            values (np.ndarray): Value of every pixel.
+            valid (np.ndarray): Validity of every pixel.
+            count (int): Number of labels including background.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray, np.ndarray]: Number of valid
+            pixels, sum and maximum of valid values per label.
+        """
+        mask = valid & (labels > 0)
+        labels = labels[mask]
+        values = values[mask].astype(np.float64)
+
+        valid_count = np.bincount(labels, minlength=count)
+        total = np.bincount(labels, weights=values, minlength=count)
+
+        maximum = np.full(count, -np.inf)
+        if labels.size:
+            order = np.argsort(labels, kind="stable")
+            labels, values = labels[order], values[order]
+            starts = np.flatnonzero(
+                np.concatenate([[True], labels[1:] != labels[:-1]])
+            )
+            maximum[labels[starts]] = np.maximum.reduceat(values, starts)
+        return valid_count, total, maximum
+
+    def reduce_window(
+        self,
+        label_image: np.ndarray,
+        rasters: Dict[int, str],
+        window: Window,
+        count: int
+    ) -> Tuple[np.ndarray, Dict[int, Tuple[np.ndarray, ...]]]:
+        """
+        Reduce one window of the label image against all rasters.
+
+        Returns:
+            Tuple[np.ndarray, Dict[int, Tuple[np.ndarray, ...]]]: Pixels per
+            label and the reductions of `reduce` per year.
+        """
+        labels = label_image[window.toslices()].ravel().astype(np.intp)
+        pixels = np.bincount(labels, minlength=count)
+        reductions = {}
+        for year, filename in rasters.items():
+            with rasterio.open(filename) as dataset:
+                values = dataset.read(1, window=window).ravel()
+                nodata = dataset.nodata
+            valid = ~np.isnan(values) if values.dtype.kind == "f" else \
+                np.ones(values.shape, dtype=bool)
+            if nodata is not None:
+                valid &= values != nodata
+            reductions[year] = self.reduce(labels, values, valid, count)
+        return pixels, reductions
+
+    def compute(
+        self,
+        circles: np.ndarray,
+        rasters: Dict[int, str],
+        field_ids: Optional[np.ndarray] = None
+    ) -> pd.DataFrame:
+        """
+        Compute the statistics of all fields for all years.
+
+        .. note:: Pixels covered by several fields are counted for the
+            later field only.
+
+        Args:
+            circles (np.ndarray): Array of shape (N, 3) with center x,
+                center y and radius in the CRS of the rasters.
+            rasters (Dict[int, str]): Raster file per year, all on the same
+                grid.
+            field_ids (Optional[np.ndarray]): ID of every field, defaults to
+                the position of the circle.
+
+        Returns:
+            pd.DataFrame: One row per field and year with the columns
+            `field_id`, `year`, `pixels`, `valid_fraction`, `mean` and
+            `max`. Statistics of fields without valid pixels are NaN.
+        """
+        transform, shape, _ = self.grid(rasters)
+        count = len(circles) + 1
+        rasterizer = CircleRasterizer(self.window_size, self.workers)
+        label_image = rasterizer.rasterize(
+            circles, transform, shape, np.arange(1, count)
+        )
+
+        pixels = np.zeros(count, dtype=np.int64)
+        totals = {
+            year: (np.zeros(count, dtype=np.int64), np.zeros(count),
+                   np.full(count, -np.inf))
+            for year in rasters
+        }
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for window_pixels, reductions in executor.map(
+                lambda w: self.reduce_window(label_image, rasters, w, count),
+                rasterizer.windows(shape)
+            ):
+                pixels += window_pixels
+                for year, (valid_count, total, maximum) in \
+                        reductions.items():
+                    totals[year][0][:] += valid_count
+                    totals[year][1][:] += total
+                    np.maximum(totals[year][2], maximum,
+                               out=totals[year][2])
+
+        if field_ids is None:
+            field_ids = np.arange(len(circles))
+        tables: List[pd.DataFrame] = []
+        for year in sorted(rasters):
+            valid_count, total, maximum = (a[1:] for a in totals[year])
+            with np.errstate(invalid="ignore", divide="ignore"):
+                tables.append(pd.DataFrame({
+                    "field_id": field_ids,
+                    "year": year,
+                    "pixels": pixels[1:],
+                    "valid_fraction": valid_count / pixels[1:],
+                    "mean": total / valid_count,
+                    "max": np.where(valid_count > 0, maximum, np.nan),
+                }))
+        if not tables:
+            return pd.DataFrame(columns=["field_id", "year", "pixels",
+                                         "valid_fraction", "mean", "max"])
+        return pd.concat(tables, ignore_index=True)
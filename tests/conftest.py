@@ -0,0 +1,33 @@
+import numpy as np
+import pytest
+import rasterio
+from rasterio.transform import from_origin
+
+
+@pytest.fixture
+def circles():
+    """
+    Centers and radii in pixel coordinates of the circles in `stm_file`.
+    """
+    return [(60, 70, 10), (200, 150, 15), (350, 300, 19), (250, 300, 12)]
+
+
+@pytest.fixture
+def stm_file(tmp_path, circles):
+    """
+    Write a synthetic NDVI image with bright disks on a dark background.
+    """
+    rng = np.random.default_rng(42)
+    data = rng.normal(0.05, 0.02, (400, 500)).astype(np.float32)
+    rows, cols = np.mgrid[:400, :500]
+    for x, y, r in circles:
+        data[(cols - x) ** 2 + (rows - y) ** 2 <= r ** 2] = 0.6
+
+    path = tmp_path / "X0001_Y0001_2020_max_NDVI.tif"
+    with rasterio.open(
+        path, "w", driver="GTiff", width=500, height=400, count=1,
+        dtype="float32", crs="EPSG:3035", nodata=-2,
+        transform=from_origin(4_000_000, 3_000_000, 30, 30)
+    ) as dataset:
+        dataset.write(data, 1)
+    return str(path)
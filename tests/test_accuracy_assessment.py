@@ -0,0 +1,373 @@
+from itertools import permutations
+from pathlib import Path
+import geopandas as gpd
+import numpy as np
+import pytest
+import shapely
+from shapely.strtree import STRtree
+from scipy.sparse import csr_array
+from senseagronomy.accuracy_assessment import (
+    area_bias, area_bias_levels, average_precision, bootstrap_counts, bootstrap_intervals, calculate_iou,
+    calculate_metrics, compute_iou, count_metrics, create_circle,
+    create_circles, evaluate_thresholds,
+    outcome_blocks, iou_matrix, match_circles, optimal_matching,
+    oversegmentation_factor, pair_errors, precision_recall_curve,
+    sparse_iou_matrix
+)
+
+
+def match_circles_reference(predicted_circles, validation_circles,
+                            iou_threshold=0.5):
+    """The original nested loop implementation of match_circles."""
+    tp, fp, fn = [], [], []
+    for i, pred_circle in predicted_circles.iterrows():
+        matched = False
+        for j, val_circle in validation_circles.iterrows():
+            if compute_iou(pred_circle.geometry,
+                           val_circle.geometry) > iou_threshold:
+                tp.append((i, j))
+                matched = True
+                break
+        if not matched:
+            fp.append(i)
+
+    matched_validation = [j for _, j in tp]
+    for j, _ in validation_circles.iterrows():
+        if j not in matched_validation:
+            fn.append(j)
+
+    return tp, fp, fn
+
+
+def calculate_iou_reference(predicted_circles, validation_circles):
+    """The original nested loop implementation of calculate_iou."""
+    total_iou = 0
+    match_count = 0
+    for pred_circle in predicted_circles.geometry:
+        best_iou = 0
+        for val_circle in validation_circles.geometry:
+            iou = compute_iou(pred_circle, val_circle)
+            if iou > best_iou:
+                best_iou = iou
+        total_iou += best_iou
+        match_count += 1 if best_iou > 0 else 0
+    return total_iou / match_count if match_count > 0 else 0
+
+
+def oversegmentation_factor_reference(y_true, y_pred, threshold=0.5):
+    """The original loop implementation of oversegmentation_factor."""
+    overlapping_polygons = 0
+    y_pred_tree = STRtree(y_pred)
+    for p_true in y_true:
+        intersecting_indices = y_pred_tree.query(p_true)
+        intersecting_polygons = [y_pred[idx] for idx in intersecting_indices]
+        for p_inter in intersecting_polygons:
+            a = p_inter.area
+            intersection = p_true.intersection(p_inter).area
+            if intersection / a > threshold:
+                overlapping_polygons += 1
+    return overlapping_polygons / len(y_true) if len(y_true) > 0 else 0
+
+
+VALIDATION_FILE = Path(__file__).parents[1] / "data" / "validation" / \
+    "validation_data.gpkg"
+
+
+def random_circles(rng, count, offset=0):
+    centers = rng.uniform(0, 2000, (count, 2))
+    return gpd.GeoDataFrame(
+        geometry=shapely.buffer(
+            shapely.points(centers), rng.uniform(30, 80, count)
+        ),
+        index=np.arange(count) * 3 + offset
+    )
+
+
+@pytest.fixture
+def circle_sets():
+    rng = np.random.default_rng(7)
+    validation = random_circles(rng, 150, offset=5)
+    predicted = validation.sample(frac=0.7, random_state=1).copy()
+    predicted["geometry"] = predicted.geometry.translate(
+        *rng.normal(0, 25, 2)
+    )
+    predicted = gpd.GeoDataFrame(
+        gpd.pd.concat([predicted, random_circles(rng, 60, offset=10_000)])
+    )
+    return predicted, validation
+
+
+@pytest.mark.parametrize("iou_threshold", [-0.1, 0.0, 0.3, 0.5, 0.9])
+def test_match_circles_reference(circle_sets, iou_threshold):
+    predicted, validation = circle_sets
+    assert match_circles(predicted, validation, iou_threshold) == \
+        match_circles_reference(predicted, validation, iou_threshold)
+
+
+def test_match_circles_empty(circle_sets):
+    predicted, validation = circle_sets
+    assert match_circles(predicted.iloc[:0], validation) == \
+        ([], [], list(validation.index))
+    assert match_circles(predicted, validation.iloc[:0]) == \
+        ([], list(predicted.index), [])
+
+
+def test_match_circles_analytic(circle_sets):
+    predicted, validation = circle_sets
+    assert match_circles(predicted, validation, 0.5, analytic=True) == \
+        match_circles(predicted, validation, 0.5)
+
+
+def test_iou_matrix_analytic(circle_sets):
+    predicted, validation = circle_sets
+    y_pred = list(predicted.geometry.iloc[:40])
+    y_true = list(validation.geometry.iloc[:40])
+    np.testing.assert_allclose(
+        iou_matrix(y_pred, y_true, analytic=True),
+        iou_matrix(y_pred, y_true),
+        atol=2e-3
+    )
+
+
+def test_sparse_iou_matrix(circle_sets):
+    predicted, validation = circle_sets
+    y_pred = list(predicted.geometry.iloc[:40])
+    y_true = list(validation.geometry.iloc[:40])
+    expected = np.array([[compute_iou(p, t) for t in y_true] for p in y_pred])
+    matrix = sparse_iou_matrix(y_pred, y_true)
+    assert matrix.shape == (40, 40)
+    assert matrix.nnz == np.count_nonzero(expected > 0)
+    np.testing.assert_allclose(matrix.toarray(), expected, rtol=1e-6)
+
+
+def test_optimal_matching_beats_greedy():
+    # greedy matches prediction 0 to validation 0 and leaves 1 unmatched
+    iou = csr_array(np.array([[0.9, 0.6], [0.7, 0.0]]))
+    pred_idx, true_idx = optimal_matching(iou, 0.5)
+    assert pred_idx.tolist() == [0, 1]
+    assert true_idx.tolist() == [1, 0]
+
+
+def test_optimal_matching_brute_force():
+    rng = np.random.default_rng(3)
+    for _ in range(20):
+        dense = rng.uniform(0, 1, (4, 4)) * (rng.uniform(0, 1, (4, 4)) > 0.5)
+        pred_idx, true_idx = optimal_matching(csr_array(dense), 0.5)
+        assert len(set(true_idx.tolist())) == len(true_idx)
+        assert np.all(dense[pred_idx, true_idx] > 0.5)
+        best = max(
+            (int(np.sum(dense[range(4), p] > 0.5)),
+             np.sum(dense[range(4), p][dense[range(4), p] > 0.5]))
+            for p in permutations(range(4))
+        )
+        assert len(pred_idx) == best[0]
+        assert np.isclose(dense[pred_idx, true_idx].sum(), best[1])
+
+
+def test_match_circles_optimal(circle_sets):
+    predicted, validation = circle_sets
+    tp, fp, fn = match_circles(predicted, validation, 0.3, optimal=True)
+    matched = [j for _, j in tp]
+    assert len(set(matched)) == len(matched)
+    assert len(tp) + len(fp) == len(predicted)
+    assert len(tp) + len(fn) == len(validation)
+    greedy, _, _ = match_circles(predicted, validation, 0.3)
+    assert len(tp) >= len(set(j for _, j in greedy))
+
+
+def test_evaluate_thresholds(circle_sets):
+    predicted, validation = circle_sets
+    thresholds = [0.3, 0.5, 0.7]
+    table = evaluate_thresholds(predicted, validation, thresholds)
+    assert table["iou_threshold"].tolist() == thresholds
+    for row in table.itertuples():
+        tp, fp, fn = match_circles(predicted, validation, row.iou_threshold,
+                                   optimal=True)
+        assert (row.tp, row.fp, row.fn) == (len(tp), len(fp), len(fn))
+        assert (row.precision, row.recall, row.f1_score) == \
+            pytest.approx(calculate_metrics(tp, fp, fn))
+        assert row.oversegmentation_factor == pytest.approx(
+            oversegmentation_factor(list(validation.geometry),
+                                    list(predicted.geometry),
+                                    row.iou_threshold)
+        )
+    assert table["average_iou"].iloc[0] == pytest.approx(
+        calculate_iou(predicted, validation), rel=1e-6
+    )
+    assert table["recall"].is_monotonic_decreasing
+
+
+def test_average_precision():
+    iou = csr_array(np.array([[0.9, 0.0], [0.0, 0.0], [0.0, 0.8]]))
+    curve = precision_recall_curve(iou, np.array([0.9, 0.8, 0.7]))
+    assert curve["precision"].tolist() == pytest.approx([1, 0.5, 2 / 3])
+    assert curve["recall"].tolist() == pytest.approx([0.5, 0.5, 1])
+    assert average_precision(curve) == pytest.approx(0.5 + 0.5 * 2 / 3)
+
+
+def test_evaluate_thresholds_scores(circle_sets):
+    predicted, validation = circle_sets
+    predicted = predicted.assign(score=np.linspace(1, 0, len(predicted)))
+    table = evaluate_thresholds(predicted, validation, [0.5, 0.9],
+                                score_column="score")
+    assert table["average_precision"].between(0, 1).all()
+    assert table["average_precision"].is_monotonic_decreasing
+
+
+@pytest.mark.parametrize("predicted_year, validation_year, offset",
+                         [(2015, 2020, 0), (2016, 2017, 0), (2016, 2019, 0),
+                          (2017, 2020, 0), (2018, 2018, 60)])
+def test_vectorised_metrics_shipped_validation(predicted_year,
+                                               validation_year, offset):
+    # layers of these years share fields, the last pair is shifted
+    predicted = gpd.read_file(VALIDATION_FILE,
+                              layer=f"validation_data_{predicted_year}")
+    predicted["geometry"] = predicted.geometry.translate(offset, offset)
+    validation = gpd.read_file(VALIDATION_FILE,
+                               layer=f"validation_data_{validation_year}")
+
+    assert calculate_iou(predicted, validation) > 0
+    assert calculate_iou(predicted, validation) == \
+        calculate_iou_reference(predicted, validation)
+    for threshold in (0.1, 0.5, 0.9):
+        assert oversegmentation_factor(
+            validation.geometry, predicted.geometry, threshold
+        ) == oversegmentation_factor_reference(
+            validation.geometry, predicted.geometry, threshold
+        )
+
+
+def test_vectorised_metrics_synthetic(circle_sets):
+    predicted, validation = circle_sets
+    assert calculate_iou(predicted, validation) == \
+        calculate_iou_reference(predicted, validation)
+    assert calculate_iou(predicted.iloc[:0], validation) == 0
+    assert oversegmentation_factor(
+        list(validation.geometry), list(predicted.geometry)
+    ) == oversegmentation_factor_reference(
+        list(validation.geometry), list(predicted.geometry)
+    )
+    assert oversegmentation_factor([], list(predicted.geometry)) == 0
+
+
+def test_bootstrap_counts():
+    counts = np.array([[3, 1, 0], [5, 0, 2], [0, 4, 1]])
+    resampled = bootstrap_counts(counts, 500, rng=0)
+    assert resampled.shape == (500, 3)
+    assert (resampled.sum(axis=1) == counts.sum()).all()
+    np.testing.assert_allclose(resampled.mean(axis=0), counts.sum(axis=0),
+                               rtol=0.1)
+
+    blocked = bootstrap_counts(counts, 500, blocked=True, rng=0,
+                               chunk_size=64)
+    # every replicate is a sum of three whole blocks
+    sums = {tuple(a + b + c) for a in counts for b in counts for c in counts}
+    assert {tuple(row) for row in blocked} <= sums
+
+
+def test_bootstrap_intervals(circle_sets):
+    predicted, validation = circle_sets
+    table = evaluate_thresholds(predicted, validation, [0.5],
+                                bootstrap=2000, seed=1)
+    row = table.iloc[0]
+    for name in ("precision", "recall", "f1_score"):
+        assert row[f"{name}_low"] < row[name] < row[f"{name}_high"]
+
+    again = evaluate_thresholds(predicted, validation, [0.5],
+                                bootstrap=2000, seed=1)
+    assert again.equals(table)
+
+    intervals = bootstrap_intervals([[10, 0, 0]], 100)
+    assert intervals["precision_low"] == intervals["precision_high"] == 1
+
+
+def test_outcome_blocks(circle_sets):
+    predicted, validation = circle_sets
+    predicted_geometries = np.asarray(predicted.geometry.values)
+    validation_geometries = np.asarray(validation.geometry.values)
+    pred_idx, val_idx = optimal_matching(
+        sparse_iou_matrix(predicted_geometries, validation_geometries), 0.5
+    )
+    counts = outcome_blocks(predicted_geometries, validation_geometries,
+                            pred_idx, val_idx, 500.0)
+    assert len(counts) > 1
+    assert counts.sum(axis=0).tolist() == [
+        len(pred_idx), len(predicted) - len(pred_idx),
+        len(validation) - len(pred_idx)
+    ]
+
+    table = evaluate_thresholds(predicted, validation, [0.5], bootstrap=200,
+                                block_size=500.0, seed=1)
+    assert table.loc[0, "recall_low"] <= table.loc[0, "recall"] <= \
+        table.loc[0, "recall_high"]
+
+
+def test_count_metrics():
+    precision, recall, f1_score = count_metrics([0, 2, 3], [1, 2, 0],
+                                                [1, 0, 1])
+    for row, counts in enumerate([([], [0], [0]), ([0, 0], [0, 0], []),
+                                  ([0] * 3, [], [0])]):
+        expected = calculate_metrics(*counts)
+        assert (precision[row], recall[row], f1_score[row]) == \
+            pytest.approx(expected)
+
+
+def test_pair_errors():
+    validation = gpd.GeoDataFrame(
+        geometry=shapely.buffer(shapely.points([[0, 0], [1000, 0]]),
+                                [100, 200], quad_segs=64),
+        index=[7, 9]
+    )
+    predicted = gpd.GeoDataFrame(
+        {"year": [2020, 2021], "tile": ["X0001_Y0001", "X0001_Y0001"],
+         "x": [30.0, 1000.0], "y": [40.0, 0.0], "radius": [110.0, 200.0]},
+        geometry=shapely.buffer(shapely.points([[30, 40], [1000, 0]]),
+                                [110, 200], quad_segs=64),
+        index=[3, 4]
+    )
+    errors = pair_errors(predicted, validation)
+    assert errors["predicted_id"].tolist() == [3, 4]
+    assert errors["validation_id"].tolist() == [7, 9]
+    assert errors["year"].tolist() == [2020, 2021]
+    np.testing.assert_allclose(errors["radius_error"], [10, 0], atol=0.05)
+    np.testing.assert_allclose(errors["center_offset"], [50, 0], atol=1e-6)
+    np.testing.assert_allclose(errors["relative_area_error"],
+                               [1.1 ** 2 - 1, 0], atol=1e-3)
+
+    bias = area_bias(errors)
+    assert bias["year"].tolist() == [2020, 2021]
+    assert bias["pairs"].tolist() == [1, 1]
+    np.testing.assert_allclose(bias["area_bias"], errors["area_error"])
+
+    total = area_bias(errors.drop(columns=["year", "tile"]))
+    assert len(total) == 1
+    assert total.loc[0, "relative_area_bias"] == pytest.approx(
+        errors["area_error"].sum() / errors["validation_area"].sum()
+    )
+
+
+def test_area_bias_levels():
+    errors = gpd.pd.DataFrame({
+        "year": [2020, 2020, 2021], "tile": ["A", "B", "A"],
+        "predicted_area": [1.0, 2.0, 3.0], "validation_area": [1.0, 1.0, 1.0],
+        "area_error": [0.0, 1.0, 2.0], "radius_error": [0.0, 0.1, 0.2],
+        "center_offset": [0.0, 1.0, 2.0]
+    })
+    bias = area_bias_levels(errors)
+    assert bias["level"].tolist() == ["year", "year", "year/tile",
+                                      "year/tile", "year/tile"]
+    assert bias.columns[:3].tolist() == ["level", "year", "tile"]
+    assert bias["pairs"].tolist() == [2, 1, 1, 1, 1]
+    assert bias["tile"].isna().tolist() == [True, True, False, False, False]
+
+    # without grouping columns, the total is reported once
+    total = area_bias_levels(errors.drop(columns=["year", "tile"]))
+    assert total["level"].tolist() == ["total"]
+    assert total.loc[0, "area_bias"] == 3.0
+
+
+def test_create_circles():
+    centers = np.array([[0.0, 0.0], [250.0, -40.0]])
+    circles = create_circles(centers, [10.0, 120.0])
+    for circle, center, radius in zip(circles, centers, [10.0, 120.0]):
+        assert circle.equals_exact(create_circle(tuple(center), radius), 0)
@@ -0,0 +1,87 @@
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pytest
+import shapely
+from senseagronomy import DetectionArchive
+from senseagronomy.archive import BBOX_COLUMNS, morton_order
+
+
+def circles(year, tile, x, y, crs="EPSG:3035"):
+    return gpd.GeoDataFrame(
+        {
+            "tile": [tile] * len(x),
+            "year": pd.array([year] * len(x), dtype="Int64"),
+            "score": np.linspace(0, 1, len(x)),
+        },
+        geometry=shapely.buffer(shapely.points(x, y), 10),
+        crs=crs
+    )
+
+
+@pytest.fixture
+def archive(tmp_path):
+    archive = DetectionArchive(str(tmp_path / "archive"), row_group_size=10)
+    x = np.arange(0, 1000, 20.0)
+    for year in (2019, 2020):
+        archive.add(circles(year, "X0001_Y0001", x, np.zeros_like(x)))
+        archive.add(circles(year, "X0002_Y0001", x + 1000, np.zeros_like(x)))
+    return archive
+
+
+def test_morton_order():
+    x = np.array([0.0, 1.0, 0.0, 1.0])
+    y = np.array([0.0, 0.0, 1.0, 1.0])
+    np.testing.assert_array_equal(morton_order(x[::-1], y[::-1]),
+                                  [3, 2, 1, 0])
+
+
+def test_query(archive):
+    assert len(archive.query()) == 200
+
+    found = archive.query(bbox=(95, -5, 205, 5), years=(2020, 2020))
+    assert len(found) == 6
+    assert found.crs.to_epsg() == 3035
+    assert set(found.year) == {2020}
+    assert found.geometry.bounds.maxx.min() >= 95
+
+    found = archive.query(tiles=["X0002_Y0001"], columns=["score"])
+    assert len(found) == 100
+    assert list(found.columns) == ["score", "geometry"]
+
+
+def test_add_keeps_spatial_order(tmp_path):
+    archive = DetectionArchive(str(tmp_path / "archive"), row_group_size=10)
+    rng = np.random.default_rng(0)
+    x, y = rng.uniform(0, 1e5, (2, 5000))
+    archive.add(circles(2020, "X0001_Y0001", x, y))
+    bounds = archive.query(columns=list(BBOX_COLUMNS))[list(BBOX_COLUMNS)]
+    order = morton_order(
+        (bounds.xmin + bounds.xmax).to_numpy() / 2,
+        (bounds.ymin + bounds.ymax).to_numpy() / 2
+    )
+    np.testing.assert_array_equal(order, np.arange(len(order)))
+
+
+def test_add_replaces_partitions(archive):
+    archive.add(circles(2020, "X0001_Y0001", [5.0], [5.0]))
+    assert len(archive.query(years=(2020, 2020))) == 51
+    assert len(archive.query(years=(2019, 2019))) == 100
+
+
+def test_add_reprojects(archive):
+    archive.add(
+        circles(2021, "X0001_Y0001", [4e6], [3e6]).to_crs("EPSG:4326")
+    )
+    found = archive.query(years=(2021, 2021))
+    assert found.crs.to_epsg() == 3035
+    np.testing.assert_allclose(
+        shapely.get_coordinates(found.geometry.centroid), [[4e6, 3e6]], atol=1e-3
+    )
+
+
+def test_add_requires_year(tmp_path):
+    gdf = circles(2020, "X0001_Y0001", [0.0], [0.0])
+    gdf["year"] = pd.NA
+    with pytest.raises(ValueError):
+        DetectionArchive(str(tmp_path)).add(gdf)
@@ -0,0 +1,280 @@
+from concurrent.futures import ThreadPoolExecutor
+import os
+import numpy as np
+import pytest
+from senseagronomy import CircleDetector, HoughBackend, TemplateBackend
+from senseagronomy import Preprocessor, RadiusBand, SpatialTransformer
+from senseagronomy.preprocessing import block_statistics
+from senseagronomy.detectorbackend import (
+    DetectorBackend, non_maximum_suppression
+)
+
+
+def test_default_backend_is_hough():
+    assert isinstance(CircleDetector().backend, HoughBackend)
+
+
+def test_invalid_radius_range():
+    with pytest.raises(ValueError):
+        HoughBackend(min_radius=20, max_radius=8)
+
+
+@pytest.mark.parametrize("backend", [HoughBackend(), TemplateBackend()])
+def test_detect_parameters(stm_file, circles, backend):
+    found = CircleDetector(backend=backend).detect_parameters(stm_file)
+    assert found.shape[1] == 4
+    assert len(found) > 0
+    for x, y, r, _ in found:
+        distance = np.hypot(
+            [x - c[0] for c in circles], [y - c[1] for c in circles]
+        )
+        assert distance.min() <= 3
+
+
+def test_template_backend_finds_all(stm_file, circles):
+    found = CircleDetector(
+        backend=TemplateBackend()
+    ).detect_parameters(stm_file)
+    assert len(found) == len(circles)
+    found = sorted((round(x), round(y), round(r)) for x, y, r, _ in found)
+    assert found == sorted(circles)
+
+
+def test_detect_circles_closed_rings(stm_file):
+    detector = CircleDetector(num_points=36)
+    circle_points = detector.detect_circles(stm_file)
+    assert all(len(points) == 37 for points in circle_points)
+    assert all(points[0] == points[-1] for points in circle_points)
+
+
+def test_detect_circles_missing_file(tmp_path):
+    assert CircleDetector().detect_circles(str(tmp_path / "none.tif")) is None
+
+
+def test_non_maximum_suppression():
+    circles = np.array([
+        [10, 10, 5, 0.5],
+        [12, 10, 5, 0.9],
+        [40, 40, 5, 0.1]
+    ])
+    kept = non_maximum_suppression(circles, 5)
+    np.testing.assert_array_equal(kept[:, 3], [0.9, 0.1])
+
+
+def test_block_statistics():
+    data = np.arange(16, dtype=np.float32).reshape(4, 4)
+    valid = data != 0
+    fraction, maximum, std = block_statistics(data, valid, 3)
+    assert fraction.shape == (2, 2)
+    assert fraction[0, 0] == pytest.approx(8 / 9)
+    np.testing.assert_array_equal(maximum, [[10, 11], [14, 15]])
+    assert std[1, 1] == 0
+
+
+def test_window_skipping(stm_file):
+    whole = CircleDetector().detect_parameters(stm_file)
+    detector = CircleDetector(
+        preprocessor=Preprocessor(window_size=100, min_ndvi=0.3)
+    )
+    windowed = detector.detect_parameters(stm_file)
+
+    assert detector.window_report["windows"] == 20
+    assert detector.window_report["skipped"] > 0
+    assert len(windowed) == len(whole)
+    np.testing.assert_allclose(
+        np.sort(windowed[:, :3], axis=0), np.sort(whole[:, :3], axis=0),
+        atol=1
+    )
+
+
+def test_window_skipping_nodata(stm_file):
+    detector = CircleDetector(
+        preprocessor=Preprocessor(window_size=100, nodata=0.6)
+    )
+    detector.detect_parameters(stm_file)
+    assert detector.window_report["skipped"] == 0
+    detector = CircleDetector(preprocessor=Preprocessor(
+        window_size=100, nodata=0.6, min_valid_fraction=1.0
+    ))
+    detector.detect_parameters(stm_file)
+    assert detector.window_report["skipped"] == 7
+
+
+def test_scale_ignores_nodata():
+    data = np.array([[-2.0, 0.0], [0.5, 1.0]])
+    valid = data != -2
+    scaled = Preprocessor(
+        lower_percentile=0, upper_percentile=100
+    ).scale(data, valid)
+    np.testing.assert_array_equal(scaled, [[0, 0], [127, 255]])
+
+
+def test_preprocessing_cache(stm_file, tmp_path):
+    preprocessor = Preprocessor(cache_dir=str(tmp_path / "cache"))
+    first = preprocessor.prepare(stm_file)
+    assert not preprocessor.last_cache_hit
+    second = preprocessor.prepare(stm_file)
+    assert preprocessor.last_cache_hit
+
+    np.testing.assert_array_equal(first.image, second.image)
+    np.testing.assert_array_equal(first.candidates, second.candidates)
+    assert first.transform == second.transform
+    assert first.crs == second.crs
+
+    preprocessor.upper_percentile = 99.0
+    preprocessor.prepare(stm_file)
+    assert not preprocessor.last_cache_hit
+
+
+def test_preprocessing_cache_modified_file(stm_file, tmp_path):
+    preprocessor = Preprocessor(cache_dir=str(tmp_path / "cache"))
+    preprocessor.prepare(stm_file)
+    status = os.stat(stm_file)
+    os.utime(stm_file, ns=(status.st_atime_ns, status.st_mtime_ns + 10**9))
+    preprocessor.prepare(stm_file)
+    assert not preprocessor.last_cache_hit
+    preprocessor.prepare(stm_file)
+    assert preprocessor.last_cache_hit
+
+
+def test_preprocessing_cache_symlink(stm_file, tmp_path):
+    preprocessor = Preprocessor(cache_dir=str(tmp_path / "cache"))
+    preprocessor.prepare(stm_file)
+    staged = tmp_path / "task" / os.path.basename(stm_file)
+    staged.parent.mkdir()
+    staged.symlink_to(stm_file)
+    preprocessor.prepare(str(staged))
+    assert preprocessor.last_cache_hit
+
+
+def test_radius_bands(stm_file, circles):
+    detector = CircleDetector(bands=[
+        RadiusBand(TemplateBackend(min_radius=8, max_radius=13)),
+        RadiusBand(TemplateBackend(min_radius=13, max_radius=20)),
+    ])
+    found = detector.detect_parameters(stm_file)
+    assert len(found) == len(circles)
+    found = sorted((round(x), round(y)) for x, y, _, _ in found)
+    assert found == sorted((x, y) for x, y, _ in circles)
+
+
+def test_radius_bands_hough_merge(stm_file, circles):
+    bands = [
+        RadiusBand(HoughBackend(param2=10, min_radius=8, max_radius=16)),
+        RadiusBand(HoughBackend(param2=10, min_radius=12, max_radius=20)),
+    ]
+    image = Preprocessor().prepare(stm_file).image
+    separate = np.concatenate([band.detect(image) for band in bands])
+    merged = CircleDetector(bands=bands).detect_parameters(stm_file)
+
+    # every field is kept once, from the band with the best edge support
+    truth = np.array(circles, dtype=np.float64)
+    nearest = np.hypot(
+        merged[:, 0, np.newaxis] - truth[:, 0],
+        merged[:, 1, np.newaxis] - truth[:, 1]
+    ).argmin(axis=1)
+    assert len(merged) < len(separate)
+    assert len(np.unique(nearest)) == len(merged)
+    for x, y, r, score in merged:
+        overlapping = np.hypot(separate[:, 0] - x, separate[:, 1] - y) < r
+        assert score == separate[overlapping, 3].max()
+
+
+class FixedBackend(DetectorBackend):
+    """Backend returning the same circles for every image."""
+
+    def __init__(self, circles):
+        super().__init__(1, 20)
+        self.circles = np.array(circles, dtype=np.float64)
+
+    def detect(self, image):
+        return self.circles.copy()
+
+
+def test_radius_band_tie_break():
+    detector = CircleDetector(bands=[
+        RadiusBand(FixedBackend([[50, 50, 10, 1]])),
+        RadiusBand(FixedBackend([[51, 50, 18, 1]])),
+    ])
+    with ThreadPoolExecutor() as executor:
+        merged = detector.detect_bands(
+            np.zeros((100, 100), dtype=np.uint8), executor
+        )
+    np.testing.assert_array_equal(merged, [[51, 50, 18, 1]])
+
+
+def test_radius_bands_mixed_backends():
+    with pytest.raises(ValueError):
+        CircleDetector(bands=[
+            RadiusBand(HoughBackend(min_radius=8, max_radius=13)),
+            RadiusBand(TemplateBackend(min_radius=13, max_radius=20)),
+        ])
+
+
+def test_radius_band_decimation(stm_file, circles):
+    band = RadiusBand(TemplateBackend(min_radius=7, max_radius=10), 2)
+    assert band.max_radius == 20
+    found = CircleDetector(bands=[band]).detect_parameters(stm_file)
+    large = [c for c in circles if c[2] >= 14]
+    for x, y, r in large:
+        distance = np.hypot(found[:, 0] - x, found[:, 1] - y)
+        assert distance.min() <= 2
+        assert abs(found[distance.argmin(), 2] - r) <= 2
+
+
+def test_radius_fraction_suppression():
+    circles = np.array([
+        [10, 10, 20, 0.5],
+        [15, 10, 8, 0.9],
+        [40, 10, 8, 0.1]
+    ])
+    kept = non_maximum_suppression(circles, 0, radius_fraction=1.0)
+    np.testing.assert_array_equal(kept[:, 3], [0.9, 0.1])
+
+
+def test_detect_georeferenced(stm_file, circles):
+    detection = CircleDetector(
+        backend=TemplateBackend()
+    ).detect_georeferenced(stm_file)
+    found, crs = detection
+    assert "3035" in crs
+    found = sorted(map(tuple, np.round(found[:, :3])))
+    expected = sorted(
+        (4_000_000 + (x + 0.5) * 30, 3_000_000 - (y + 0.5) * 30, r * 30)
+        for x, y, r in circles
+    )
+    assert found == expected
+
+
+def test_detect_circles_pixel_center(stm_file):
+    detector = CircleDetector(backend=TemplateBackend())
+    found, _ = detector.detect_georeferenced(stm_file)
+    rings = SpatialTransformer().transform_coordinates(
+        detector.detect_circles(stm_file),
+        transform=Preprocessor().prepare(stm_file).transform,
+        pixel_center=True
+    )
+    centers = rings[:, :-1].mean(axis=1)
+    np.testing.assert_allclose(
+        sorted(map(tuple, centers)), sorted(map(tuple, found[:, :2])),
+        atol=1e-6
+    )
+
+
+def test_hough_edge_support(stm_file):
+    image = Preprocessor().prepare(stm_file).image
+    backend = HoughBackend()
+    support = backend.edge_support(image, np.array([
+        [350, 300, 19], [350, 300, 12], [100, 350, 15]
+    ], dtype=np.float64))
+    assert support[0] > 0.9
+    assert support[1] < 0.5 and support[2] < 0.5
+
+    # the score does not depend on the other circles found in a call
+    whole = backend.detect(image)
+    cropped = backend.detect(image[200:, 250:])
+    cropped[:, 0] += 250
+    cropped[:, 1] += 200
+    for circle in cropped:
+        same = np.all(whole[:, :3] == circle[:3], axis=1)
+        assert whole[same, 3] == pytest.approx(circle[3])
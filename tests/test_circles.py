@@ -0,0 +1,44 @@
+import numpy as np
+import shapely
+from senseagronomy.circles import circle_iou, circle_pairs, circle_parameters
+
+
+def test_circle_parameters():
+    circles = np.array([[10.0, 20.0, 5.0], [-3.0, 4.0, 100.0]])
+    polygons = shapely.buffer(
+        shapely.points(circles[:, :2]), circles[:, 2], quad_segs=64
+    )
+    np.testing.assert_allclose(circle_parameters(polygons), circles,
+                               rtol=1e-3)
+
+
+def test_circle_iou():
+    first = np.array([[0, 0, 1], [0, 0, 1], [0, 0, 2], [0, 0, 1]], float)
+    second = np.array([[0, 0, 1], [3, 0, 1], [0.5, 0, 1], [1, 0, 1]], float)
+    lens = 2 * np.arccos(0.5) - 0.5 * np.sqrt(3)
+    np.testing.assert_allclose(
+        circle_iou(first, second),
+        [1, 0, 0.25, lens / (2 * np.pi - lens)]
+    )
+
+
+def test_circle_iou_matches_polygons():
+    rng = np.random.default_rng(1)
+    first = np.column_stack([rng.uniform(0, 50, (500, 2)),
+                             rng.uniform(5, 30, 500)])
+    second = np.column_stack([rng.uniform(0, 50, (500, 2)),
+                              rng.uniform(5, 30, 500)])
+    polygons = [
+        shapely.buffer(shapely.points(c[:, :2]), c[:, 2]) for c in
+        (first, second)
+    ]
+    expected = shapely.area(shapely.intersection(*polygons)) / \
+        shapely.area(shapely.union(*polygons))
+    np.testing.assert_allclose(circle_iou(first, second), expected,
+                               atol=1.5e-3)
+
+
+def test_circle_pairs():
+    circles = np.array([[0, 0, 1], [1.5, 0, 1], [1.5, 1.4, 0.5]], float)
+    left, right = circle_pairs(circles)
+    assert sorted(zip(left, right)) == [(0, 1), (1, 2)]
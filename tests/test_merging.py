@@ -0,0 +1,77 @@
+import geopandas as gpd
+import numpy as np
+import shapely
+from senseagronomy.circles import circle_parameters
+from senseagronomy.merging import deduplicate_circles, read_layers
+from senseagronomy.writer import GeoPackageWriter
+
+
+def tile(x, y, radius, score, name):
+    return gpd.GeoDataFrame(
+        {"tile": [name] * len(x), "score": score},
+        geometry=shapely.buffer(shapely.points(x, y), radius),
+        crs="EPSG:3035"
+    )
+
+
+def test_deduplicate_circles():
+    gdf = gpd.GeoDataFrame(gpd.pd.concat([
+        tile([0, 500, 1000], [0, 0, 0], 100, [0.9, 0.5, 0.4], "A"),
+        tile([510, 1010, 2000], [5, 0, 0], [100, 40, 100],
+             [0.8, 0.6, 0.1], "B"),
+    ], ignore_index=True), crs="EPSG:3035")
+
+    kept = deduplicate_circles(gdf)
+    assert kept.index.tolist() == [0, 3, 4, 5]
+
+    kept = deduplicate_circles(gdf, distance_fraction=0.0)
+    assert kept.index.tolist() == [0, 2, 3, 4, 5]
+
+    kept = deduplicate_circles(gdf, score_column=None)
+    assert kept.index.tolist() == [0, 1, 2, 5]
+
+
+def test_deduplicate_circles_tie_break():
+    gdf = gpd.GeoDataFrame(gpd.pd.concat([
+        tile([-20], [0], 100, [1.0], "A"),
+        tile([25], [0], 100, [1.0], "B"),
+        tile([0], [0], 100, [1.0], "C"),
+    ], ignore_index=True), crs="EPSG:3035")
+
+    # equal scores keep the circle agreeing best with its duplicates
+    assert deduplicate_circles(gdf).tile.tolist() == ["C"]
+    assert deduplicate_circles(gdf, score_column=None).tile.tolist() == ["C"]
+
+    gdf.loc[1, "score"] = 1.1
+    assert deduplicate_circles(gdf).tile.tolist() == ["B"]
+
+
+def test_read_layers(tmp_path):
+    path = str(tmp_path / "circles.gpkg")
+    GeoPackageWriter(path, "A").write([tile([0], [0], 10, [1.0], "A")])
+    GeoPackageWriter(path, "B").write([tile([5], [0], 10, [0.5], "B")])
+    circles = read_layers([path])
+    assert circles.tile.tolist() == ["A", "B"]
+    assert len(deduplicate_circles(circles)) == 1
+
+
+def test_read_layers_reprojected(tmp_path):
+    path = str(tmp_path / "circles.gpkg")
+    first = tile([4_000_000], [3_000_000], 100, [1.0], "A")
+    second = tile([4_000_000], [3_000_000], 100, [1.0], "B").to_crs(
+        "EPSG:3857"
+    )
+    for gdf in (first, second):
+        gdf[["x", "y", "radius"]] = circle_parameters(gdf.geometry.values)
+    GeoPackageWriter(path, "A").write([first])
+    GeoPackageWriter(path, "B").write([second])
+    circles = read_layers([path])
+    assert circles.crs == first.crs
+    np.testing.assert_allclose(
+        circles[["x", "y", "radius"]].to_numpy(),
+        circle_parameters(circles.geometry.values)
+    )
+    np.testing.assert_allclose(
+        circles[["x", "y"]].to_numpy(), [[4_000_000, 3_000_000]] * 2,
+        atol=1e-3
+    )
@@ -0,0 +1,50 @@
+import numpy as np
+import rasterio
+import shapely
+from rasterio.features import rasterize
+from rasterio.transform import from_origin
+from senseagronomy.rasterizer import CircleRasterizer, label_dtype
+
+TRANSFORM = from_origin(4_000_000, 3_000_000, 30, 30)
+
+
+def test_label_dtype():
+    assert label_dtype(None) == np.uint8
+    assert label_dtype(np.array([1, 300])) == np.uint16
+    assert label_dtype(np.array([70_000])) == np.uint32
+
+
+def test_rasterize_matches_polygons():
+    rng = np.random.default_rng(0)
+    circles = np.column_stack([
+        rng.uniform(4_000_000, 4_030_000, 200),
+        rng.uniform(2_970_000, 3_000_000, 200),
+        rng.uniform(100, 400, 200),
+    ])
+    result = CircleRasterizer(window_size=64).rasterize(
+        circles, TRANSFORM, (1000, 1000), np.arange(1, 201)
+    )
+    polygons = shapely.buffer(
+        shapely.points(circles[:, :2]), circles[:, 2], quad_segs=256
+    )
+    expected = rasterize(
+        zip(polygons, range(1, 201)), out_shape=(1000, 1000),
+        transform=TRANSFORM, dtype="uint8"
+    )
+    assert result.dtype == np.uint8
+    assert (result != expected).mean() < 1e-4
+
+
+def test_write(tmp_path):
+    path = str(tmp_path / "mask.tif")
+    circles = np.array([[4_000_300.0, 2_999_700.0, 90.0]])
+    CircleRasterizer(window_size=16).write(
+        path, circles, TRANSFORM, (40, 50), "EPSG:3035"
+    )
+    with rasterio.open(path) as dataset:
+        assert dataset.block_shapes == [(16, 16)]
+        data = dataset.read(1)
+    # pixel centers within 3 pixels of a pixel corner
+    assert data.sum() == 32
+    assert data[10, 10] == 1
+
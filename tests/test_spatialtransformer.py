@@ -0,0 +1,130 @@
+import numpy as np
+import pandas as pd
+import pytest
+from rasterio.transform import Affine
+from senseagronomy import SpatialTransformer
+from senseagronomy.spatialtransformer import parse_image_name, read_manifest
+
+
+def test_transform_coordinates_origin_pixel_size():
+    transformer = SpatialTransformer()
+    circles = [[(0.0, 0.0), (1.0, 2.0)], [(3.0, 4.0), (5.0, 6.0)]]
+    result = transformer.transform_coordinates(
+        circles, (100.0, 200.0), (30.0, -30.0)
+    )
+    assert result.shape == (2, 2, 2)
+    assert result.flags["C_CONTIGUOUS"]
+    np.testing.assert_allclose(result[0, 1], [130.0, 140.0])
+    np.testing.assert_allclose(result[1, 0], [190.0, 80.0])
+
+
+def test_transform_coordinates_rotation():
+    transform = Affine.translation(10, 20) * Affine.rotation(90) * \
+        Affine.scale(2)
+    result = SpatialTransformer().transform_coordinates(
+        np.array([[[1.0, 0.0], [0.0, 1.0]]]), transform=transform
+    )
+    expected = [transform * (1.0, 0.0), transform * (0.0, 1.0)]
+    np.testing.assert_allclose(result[0], expected, atol=1e-12)
+
+
+def test_transform_coordinates_empty():
+    result = SpatialTransformer().transform_coordinates(
+        [], transform=Affine.identity()
+    )
+    assert result.shape == (0, 0, 2)
+
+
+def test_transform_coordinates_requires_transform():
+    with pytest.raises(ValueError):
+        SpatialTransformer().transform_coordinates([[(0.0, 0.0)]])
+
+
+def test_transform_coordinates_ragged():
+    circles = [
+        [(0, 0), (1, 0), (1, 1), (0, 0)],
+        [(3, 4), (5, 4), (5, 6), (3, 6), (3, 4)]
+    ]
+    result = SpatialTransformer().transform_coordinates(
+        circles, (100.0, 200.0), (30.0, -30.0)
+    )
+    assert [c.shape for c in result] == [(4, 2), (5, 2)]
+    np.testing.assert_allclose(result[1][0], [190.0, 80.0])
+    gdf = SpatialTransformer().create_geodataframe(result, "EPSG:3035")
+    assert len(gdf) == 2
+
+
+def test_transform_circles():
+    circles = np.array([[10.0, 20.0, 5.0, 0.9]])
+    result = SpatialTransformer().transform_circles(
+        circles, transform=Affine(30, 0, 1000, 0, -30, 2000)
+    )
+    np.testing.assert_allclose(result, [[1300.0, 1400.0, 150.0, 0.9]])
+    assert circles[0, 0] == 10.0
+
+
+def test_create_geodataframe_bulk():
+    coordinates = np.array([
+        [[0, 0], [1, 0], [1, 1], [0, 0]],
+        [[2, 2], [3, 2], [3, 3], [2, 2]]
+    ], dtype=np.float64)
+    gdf = SpatialTransformer().create_geodataframe(
+        coordinates, "EPSG:3035", {"image": ["a.tif", "b.tif"]}
+    )
+    assert len(gdf) == 2
+    assert gdf.geometry.area.tolist() == [0.5, 0.5]
+    assert gdf["image"].tolist() == ["a.tif", "b.tif"]
+
+
+def test_create_geodataframe_from_circles():
+    gdf = SpatialTransformer().create_geodataframe_from_circles(
+        np.array([[0.0, 0.0, 10.0], [100.0, 0.0, 5.0]]), "EPSG:3035",
+        {"year": [2020, 2020]}
+    )
+    np.testing.assert_allclose(
+        gdf.geometry.area, np.pi * np.array([100.0, 25.0]), rtol=1e-2
+    )
+    assert gdf.crs == "EPSG:3035"
+    empty = SpatialTransformer().create_geodataframe_from_circles(
+        np.empty((0, 4)), "EPSG:3035"
+    )
+    assert len(empty) == 0
+
+
+@pytest.mark.parametrize("name, expected", [
+    ("X0001_Y0002_2020_max_NDVI.tif", ("X0001_Y0002", 2020)),
+    ("/data/X0010_Y0020_2016_circles.json", ("X0010_Y0020", 2016)),
+    ("scene.tif", (None, None)),
+])
+def test_parse_image_name(name, expected):
+    assert parse_image_name(name) == expected
+
+
+@pytest.mark.parametrize("extension", [".csv", ".json", ".parquet"])
+def test_read_manifest(tmp_path, extension):
+    manifest = pd.DataFrame({
+        "crs": ["EPSG:3035", "EPSG:32632"],
+        "image": ["/data/X0001_Y0001_2020.tif", "X0002_Y0001_2020.tif"],
+        "a": [30.0, 10.0], "b": [0.0, 0.0], "c": [4e6, 5e5],
+        "d": [0.0, 0.0], "e": [-30.0, -10.0], "f": [3e6, 6e6],
+    })
+    path = str(tmp_path / f"manifest{extension}")
+    if extension == ".csv":
+        manifest.to_csv(path, index=False)
+    elif extension == ".json":
+        manifest.to_json(path, orient="records")
+    else:
+        manifest.to_parquet(path)
+
+    result = read_manifest(path)
+    assert list(result.index) == ["X0001_Y0001_2020.tif",
+                                  "X0002_Y0001_2020.tif"]
+    assert list(result.columns) == ["a", "b", "c", "d", "e", "f", "crs"]
+    assert result.loc["X0002_Y0001_2020.tif", "e"] == -10.0
+
+
+def test_read_manifest_missing_columns(tmp_path):
+    path = tmp_path / "manifest.csv"
+    path.write_text("image,a,b,c\nX0001_Y0001_2020.tif,30,0,0\n")
+    with pytest.raises(ValueError):
+        read_manifest(str(path))
@@ -0,0 +1,104 @@
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pytest
+import shapely
+from senseagronomy.accuracy_assessment import (
+    accuracy_assessment, evaluate_thresholds, optimal_matching,
+    sparse_iou_matrix, stack_curves
+)
+from senseagronomy.tiled_assessment import Source, TiledAssessment
+
+
+@pytest.fixture
+def sources(tmp_path):
+    rng = np.random.default_rng(11)
+    centers = rng.uniform(0, 3000, (300, 2))
+    radius = rng.uniform(40, 120, 300)
+    validation = gpd.GeoDataFrame(
+        geometry=shapely.buffer(shapely.points(centers), radius),
+        crs="EPSG:3035"
+    )
+    keep = rng.uniform(size=300) < 0.8
+    predicted = gpd.GeoDataFrame(
+        {"score": rng.uniform(size=keep.sum() + 80)},
+        geometry=np.concatenate([
+            shapely.buffer(
+                shapely.points(centers[keep] + rng.normal(0, 30, (keep.sum(), 2))),
+                radius[keep] * rng.uniform(0.8, 1.2, keep.sum())
+            ),
+            shapely.buffer(shapely.points(rng.uniform(0, 3000, (80, 2))),
+                           rng.uniform(40, 120, 80))
+        ]),
+        crs="EPSG:3035"
+    )
+    predicted.to_file(tmp_path / "predicted.gpkg")
+    validation.to_file(tmp_path / "validation.gpkg", layer="validation")
+    return (Source(str(tmp_path / "predicted.gpkg")),
+            Source(str(tmp_path / "validation.gpkg"), "validation"))
+
+
+@pytest.mark.parametrize("halo", [300.0, 0.0])
+def test_assess_matches_single_process(sources, halo):
+    predicted_source, validation_source = sources
+    thresholds = [0.1, 0.5, 0.75]
+    table, tp = TiledAssessment(
+        tile_size=700.0, halo=halo, origin=(-150.0, 3100.0), workers=2
+    ).assess(predicted_source, validation_source, thresholds, "score")
+
+    predicted = gpd.read_file(predicted_source.filename)
+    validation = gpd.read_file(validation_source.filename,
+                               layer=validation_source.layer)
+    expected = evaluate_thresholds(predicted, validation, thresholds,
+                                   "score")
+    pd.testing.assert_frame_equal(table, expected, check_exact=True)
+
+    pred_idx, val_idx = optimal_matching(
+        sparse_iou_matrix(predicted.geometry.values,
+                          validation.geometry.values), 0.5
+    )
+    # feature IDs of GeoPackages start at 1
+    assert tp == sorted(zip((pred_idx + 1).tolist(), (val_idx + 1).tolist()))
+
+
+@pytest.mark.parametrize("cached", [False, True])
+def test_assess_feature_ids(sources, tmp_path, cached):
+    predicted_source, validation_source = sources
+    _, tiled = TiledAssessment(tile_size=700.0, workers=2).assess(
+        predicted_source, validation_source, [0.5]
+    )
+    _, tp, _, errors, _ = accuracy_assessment(
+        predicted_source.filename, validation_source.filename,
+        validation_source.layer,
+        cache_dir=str(tmp_path / "cache") if cached else None
+    )
+    # both modes label pairs by feature ID
+    assert sorted(tp) == tiled
+    assert sorted(zip(errors["predicted_id"], errors["validation_id"])) == \
+        tiled
+
+
+def test_tiles():
+    assessment = TiledAssessment(tile_size=10.0, origin=(0.0, 100.0))
+    assert list(assessment.tiles((5.0, 75.0, 25.0, 95.0))) == [
+        (0, 0), (1, 0), (2, 0), (0, 1), (1, 1), (2, 1), (0, 2), (1, 2),
+        (2, 2)
+    ]
+    assert assessment.tile_bounds((1, 2)) == (10.0, 70.0, 20.0, 80.0)
+
+
+def test_assess_curves(sources):
+    predicted_source, validation_source = sources
+    assessment = TiledAssessment(tile_size=700.0, workers=2)
+    assessment.assess(predicted_source, validation_source, [0.5, 0.75],
+                      "score")
+    *_, curves = accuracy_assessment(
+        predicted_source.filename, validation_source.filename,
+        validation_source.layer, [0.5, 0.75], "score"
+    )
+    table = stack_curves(assessment.curves)
+    assert table.columns.tolist() == [
+        "iou_threshold", "score", "precision", "recall"
+    ]
+    assert table.iou_threshold.unique().tolist() == [0.5, 0.75]
+    pd.testing.assert_frame_equal(table, stack_curves(curves))
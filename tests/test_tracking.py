@@ -0,0 +1,46 @@
+import geopandas as gpd
+import numpy as np
+import shapely
+from senseagronomy.tracking import link_circles, track_fields
+
+
+def year(x, radius):
+    return gpd.GeoDataFrame(
+        geometry=shapely.buffer(
+            shapely.points(x, np.zeros(len(x))), radius, quad_segs=32
+        ),
+        crs="EPSG:3035"
+    )
+
+
+def test_link_circles_one_to_one():
+    previous = np.asarray(year([0, 1000], 100).geometry.values)
+    current = np.asarray(year([10, 20, 5000], 100).geometry.values)
+    left, right = link_circles(previous, current)
+    assert left.tolist() == [0]
+    assert right.tolist() == [0]
+
+
+def test_track_fields():
+    layers = {
+        2016: year([0, 1000, 3000], [100, 100, 100]),
+        2015: year([0, 1000], [100, 100]),
+        2017: year([5, 3010, 6000], [150, 100, 100]),
+    }
+    history, events = track_fields(layers)
+
+    ids = history.groupby("year")["field_id"].apply(list).to_dict()
+    assert ids == {2015: [0, 1], 2016: [0, 1, 2], 2017: [0, 2, 3]}
+    np.testing.assert_allclose(history["radius"], [100] * 5 + [150, 100, 100],
+                               rtol=1e-2)
+
+    observed = set(
+        events[["field_id", "year", "event"]].itertuples(index=False,
+                                                        name=None)
+    )
+    assert observed == {
+        (2, 2016, "appear"),
+        (1, 2017, "disappear"),
+        (0, 2017, "resize"),
+        (3, 2017, "appear"),
+    }
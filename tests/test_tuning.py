@@ -0,0 +1,50 @@
+import geopandas as gpd
+import pandas as pd
+import pytest
+from senseagronomy import Preprocessor
+from senseagronomy.accuracy_assessment import create_circle
+from senseagronomy.tuning import parameter_grid, pareto_front, tune
+
+
+def test_parameter_grid():
+    configs = parameter_grid([1, 2], [20], [100], [10, 20], [(8, 20)])
+    assert len(configs) == 4
+    assert configs[0] == {
+        "dp": 1, "min_dist": 20, "param1": 100, "param2": 10,
+        "min_radius": 8, "max_radius": 20
+    }
+
+
+def test_pareto_front():
+    results = pd.DataFrame({
+        "f1_score": [0.9, 0.8, 0.7, 0.9],
+        "detection_seconds": [2.0, 1.0, 1.5, 3.0]
+    })
+    assert pareto_front(results).tolist() == [True, True, False, False]
+
+
+def test_tune(stm_file, circles, tmp_path):
+    validation = gpd.GeoDataFrame(
+        geometry=[
+            create_circle(
+                (4_000_000 + (x + 0.5) * 30, 3_000_000 - (y + 0.5) * 30),
+                r * 30
+            )
+            for x, y, r in circles
+        ],
+        crs="EPSG:3035"
+    )
+    configs = parameter_grid([1], [20], [100], [20, 1000], [(8, 20)])
+    results = tune(
+        [stm_file], validation, configs,
+        Preprocessor(cache_dir=str(tmp_path / "cache")), workers=1
+    )
+    assert len(results) == 2
+    assert results.loc[0, "param2"] == 20
+    assert results.loc[0, "f1_score"] > 0.5
+    assert results.loc[1, "detections"] == 0
+
+
+def test_tune_without_configurations(stm_file):
+    with pytest.raises(ValueError):
+        tune([stm_file], gpd.GeoDataFrame(geometry=[]), [])
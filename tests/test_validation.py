@@ -0,0 +1,114 @@
+import os
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pytest
+import shapely
+from senseagronomy.accuracy_assessment import (
+    evaluate_thresholds, sparse_iou_matrix
+)
+from senseagronomy.validation import ValidationCache
+
+
+@pytest.fixture
+def validation_file(tmp_path):
+    rng = np.random.default_rng(0)
+    gdf = gpd.GeoDataFrame(
+        {"name": [f"field {i}" for i in range(20)]},
+        geometry=shapely.buffer(
+            shapely.points(rng.uniform(0, 5000, (20, 2))),
+            rng.uniform(50, 150, 20)
+        ),
+        crs="EPSG:3035"
+    )
+    filename = tmp_path / "validation.gpkg"
+    gdf.to_file(filename, layer="validation_data_2020")
+    gdf.iloc[:5].to_file(filename, layer="validation_data_2019")
+    return str(filename), gdf
+
+
+def test_load_caches_layer(tmp_path, validation_file):
+    filename, expected = validation_file
+    cache = ValidationCache(str(tmp_path / "cache"))
+
+    layer = cache.load(filename, "validation_data_2020")
+    assert not cache.last_cache_hit
+    layer = cache.load(filename, "validation_data_2020")
+    assert cache.last_cache_hit
+    assert isinstance(layer.circles, np.memmap)
+    assert len(layer) == 20
+
+    gdf = layer.to_geodataframe()
+    assert gdf.crs == expected.crs
+    assert gdf["name"].tolist() == expected["name"].tolist()
+    assert shapely.equals_exact(gdf.geometry.values,
+                                expected.geometry.values).all()
+    np.testing.assert_allclose(layer.bounds, expected.geometry.bounds)
+
+    pred_idx, val_idx = layer.tree().query(expected.geometry.values[:3],
+                                           predicate="intersects")
+    assert set(zip(pred_idx, val_idx)) >= {(0, 0), (1, 1), (2, 2)}
+
+
+def test_load_keys_by_layer(tmp_path, validation_file):
+    filename, _ = validation_file
+    cache = ValidationCache(str(tmp_path / "cache"))
+    assert len(cache.load(filename, "validation_data_2019")) == 5
+    assert len(cache.load(filename, "validation_data_2020")) == 20
+    assert not cache.last_cache_hit
+
+
+def test_load_keys_by_real_path(tmp_path, validation_file):
+    filename, _ = validation_file
+    cache = ValidationCache(str(tmp_path / "cache"))
+    cache.load(filename, "validation_data_2020")
+    # workflow tasks see the file through a symlink in their work directory
+    work = tmp_path / "work"
+    work.mkdir()
+    os.symlink(filename, work / "validation.gpkg")
+    layer = cache.load(str(work / "validation.gpkg"), "validation_data_2020")
+    assert cache.last_cache_hit
+    assert len(layer) == 20
+
+
+def test_load_missing_file(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        ValidationCache(str(tmp_path)).load(str(tmp_path / "missing.gpkg"))
+
+
+def test_load_keys_by_modification(tmp_path, validation_file):
+    filename, _ = validation_file
+    cache = ValidationCache(str(tmp_path / "cache"))
+    cache.load(filename, "validation_data_2020")
+    status = os.stat(filename)
+    os.utime(filename, ns=(status.st_atime_ns, status.st_mtime_ns + 10**9))
+    cache.load(filename, "validation_data_2020")
+    assert not cache.last_cache_hit
+
+
+@pytest.mark.parametrize("analytic", [False, True])
+def test_cached_layer_assessment(tmp_path, validation_file, analytic):
+    filename, expected = validation_file
+    layer = ValidationCache(str(tmp_path / "cache")).load(
+        filename, "validation_data_2020"
+    )
+    predicted = expected.translate(40, 0).iloc[::2]
+    predicted = gpd.GeoDataFrame(geometry=predicted.values, crs=expected.crs)
+
+    cached = sparse_iou_matrix(predicted.geometry.values, layer, analytic)
+    direct = sparse_iou_matrix(predicted.geometry.values,
+                               expected.geometry.values, analytic)
+    assert cached.nnz == direct.nnz > 0
+    np.testing.assert_array_equal(cached.toarray(), direct.toarray())
+
+    pd.testing.assert_frame_equal(
+        evaluate_thresholds(predicted, layer, analytic=analytic),
+        evaluate_thresholds(predicted, expected, analytic=analytic)
+    )
+
+    # features are indexed by feature ID, which starts at 1
+    taken = layer.take([3, 1])
+    assert taken.index.tolist() == [4, 2]
+    assert taken["name"].tolist() == ["field 3", "field 1"]
+    assert shapely.equals_exact(taken.geometry.values,
+                                expected.geometry.values[[3, 1]]).all()
@@ -0,0 +1,41 @@
+import sqlite3
+import geopandas as gpd
+import numpy as np
+import shapely
+from senseagronomy.writer import GeoPackageWriter
+
+
+def frames(count, size=50):
+    rng = np.random.default_rng(0)
+    for i in range(count):
+        points = shapely.points(rng.uniform(0, 1e4, (size, 2)))
+        yield gpd.GeoDataFrame(
+            {"tile": [f"X{i:04d}_Y0001"] * size, "score": rng.random(size)},
+            geometry=shapely.buffer(points, 30),
+            crs="EPSG:3035"
+        )
+
+
+def test_write_and_append(tmp_path):
+    path = str(tmp_path / "circles.gpkg")
+    assert GeoPackageWriter(path, "2020", batch_size=20).write(frames(3)) \
+        == 150
+    assert GeoPackageWriter(path, "2020", append=True).write(frames(2)) \
+        == 100
+
+    gdf = gpd.read_file(path, layer="2020")
+    assert len(gdf) == 250
+    assert gdf.crs.to_epsg() == 3035
+    assert set(gdf.columns) == {"tile", "score", "geometry"}
+
+    with sqlite3.connect(path) as connection:
+        indexed = connection.execute(
+            "SELECT count(*) FROM rtree_2020_geom"
+        ).fetchone()[0]
+    assert indexed == 250
+
+
+def test_write_nothing(tmp_path):
+    path = tmp_path / "circles.gpkg"
+    assert GeoPackageWriter(str(path), "2020").write([]) == 0
+    assert not path.exists()
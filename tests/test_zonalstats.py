@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+import rasterio
+from senseagronomy.zonalstats import ZonalStatistics
+
+
+@pytest.fixture
+def fields(circles):
+    """The circles of `stm_file` in map coordinates."""
+    return np.array([
+        (4_000_000 + (x + 0.5) * 30, 3_000_000 - (y + 0.5) * 30, r * 30)
+        for x, y, r in circles
+    ])
+
+
+@pytest.fixture
+def rasters(stm_file, tmp_path):
+    """The STM of 2020 and a copy for 2021 with the first field masked."""
+    path = str(tmp_path / "X0001_Y0001_2021_max_NDVI.tif")
+    with rasterio.open(stm_file) as dataset:
+        profile = dataset.profile
+        data = dataset.read(1)
+    data[:70, :] = -2
+    data[200:, :] *= 0.5
+    with rasterio.open(path, "w", **profile) as dataset:
+        dataset.write(data, 1)
+    return {2020: stm_file, 2021: path}
+
+
+def test_reduce():
+    labels = np.array([0, 1, 1, 2, 2, 2])
+    values = np.array([9.0, 1.0, 3.0, 2.0, 5.0, 7.0])
+    valid = np.array([True, True, True, True, True, False])
+    count, total, maximum = ZonalStatistics.reduce(labels, values, valid, 4)
+    np.testing.assert_array_equal(count, [0, 2, 2, 0])
+    np.testing.assert_array_equal(total, [0, 4, 7, 0])
+    np.testing.assert_array_equal(maximum, [-np.inf, 3, 5, -np.inf])
+
+
+def test_compute(fields, rasters, circles):
+    table = ZonalStatistics(window_size=64).compute(
+        fields, rasters, np.array([10, 11, 12, 13])
+    )
+    assert len(table) == 8
+    table = table.set_index(["field_id", "year"])
+
+    pixels = table.xs(2020, level="year")["pixels"].to_numpy()
+    expected = [
+        np.sum(np.hypot(*np.mgrid[-r:r + 1, -r:r + 1]) <= r)
+        for _, _, r in circles
+    ]
+    np.testing.assert_array_equal(pixels, expected)
+
+    np.testing.assert_allclose(table.loc[(slice(None), 2020), "mean"], 0.6)
+    np.testing.assert_allclose(table.loc[(slice(None), 2020), "max"], 0.6)
+    assert table.loc[(10, 2021), "valid_fraction"] == pytest.approx(
+        11 / 21, abs=0.05
+    )
+    assert table.loc[(12, 2021), "mean"] == pytest.approx(0.3)
+    assert table.loc[(11, 2021), "max"] == pytest.approx(0.6)
+
+
+def test_compute_requires_grid(fields, stm_file, tmp_path):
+    path = str(tmp_path / "other.tif")
+    with rasterio.open(stm_file) as dataset:
+        profile = dataset.profile
+        profile.update(width=100)
+        with rasterio.open(path, "w", **profile) as other:
+            other.write(dataset.read(1)[:, :100], 1)
+    with pytest.raises(ValueError):
+        ZonalStatistics().compute(fields, {2020: stm_file, 2021: path})
@@ -3,55 +3,66 @@ process DETECT_CIRCLES {
     tuple val(tileId), val(year), path(stm)
 
     output:
-    tuple val(tileId), val(year), path(stm), path("${tileId}_${year}_circles.json")
+    tuple val(tileId), val(year), path("${tileId}_${year}_circles.gpkg")
 
     script:
+    // circles are georeferenced with the transform and CRS of the STM chip
     """
-    detectcircle --input $stm --output ${tileId}_${year}_circles.json
+    detectcircle --input $stm --output ${tileId}_${year}_circles.gpkg \
+        --window-size ${params.detection_window_size} \
+        --min-valid-fraction ${params.detection_min_valid_fraction} \
+        --min-ndvi ${params.detection_min_ndvi}
     """
 }
 
-process TRANSFORM_COORDINATES {
+process MERGE_CIRCLES {
+    publishDir "${params.cropland_directory}", mode: 'copy', pattern: "${year}_circles.gpkg", enabled: params.store_cropland
+
     input:
-    tuple val(tileId), val(year), path(stm), path(circles)
+    tuple val(tileId), val(year), path(circles)
 
     output:
-    tuple val(tileId), val(year), path("${tileId}_${year}_circles.gpkg")
+    tuple val(year), path("${year}_circles.gpkg")
+
     script:
+    // fields on tile borders are detected in every tile they touch
     """
-    GEOTRANSFORM=\$(gdalinfo $stm -json | jq '.geoTransform[]')
-    OFFSET=\$(echo \$GEOTRANSFORM | cut -d ' ' -f 1,4)     # first X, second Y
-    PIXELSIZE=\$(echo \$GEOTRANSFORM | cut -d ' ' -f 2,6)  # first X, second Y
-
-    transformcoordinates --input-file $circles --output-file "${tileId}_${year}_circles.gpkg" \
-        --origins \$OFFSET --pixel-sizes \$PIXELSIZE --crs '${params.cube_projection}'
+    mergecircles --input $circles --output ${year}_circles.gpkg --layer $year
     """
 }
 
-process MERGE_CIRCLES {
-    publishDir "${params.cropland_directory}", mode: 'copy', pattern: "${year}_circles.gpkg", enabled: params.store_cropland
-    label 'gdal'
+process ARCHIVE_CIRCLES {
+    publishDir "${params.archive_directory}", mode: 'copy'
 
     input:
-    tuple val(tileId), val(year), path(circles)
+    tuple val(year), path(circles)
 
     output:
-    tuple val(year), path("${year}_circles.gpkg")
+    path("year=*")
+
+    when:
+    params.store_archive
 
     script:
+    // the year partition is built in the task directory, publishing
+    // replaces the archived partition of the year
     """
-    ogrmerge.py -o ${year}_circles.gpkg $circles -single -nln $year -src_layer_field_name tile
+    archivecircles --input $circles --archive archive
+    mv archive/year=* .
     """
 }
 
 process ACCURACY_ASSESSMENT {
     publishDir "${params.cropland_directory}", mode: 'copy', enabled: params.store_cropland
+    // the validation cache outlives the task, mount it at the same path as on the host
+    containerOptions "--volume ${params.validation_cache_directory}:${params.validation_cache_directory}"
 
     input:
     tuple val(year), path(prediction), path(validation_data)
 
     output:
-    tuple path("accuracy_summary_${year}.csv"), path("${year}_accuracy_assessment.gpkg")
+    tuple path("accuracy_summary_${year}.csv"), path("${year}_accuracy_assessment.gpkg"),
+        path("${year}_accuracy_assessment_pairs.parquet"), path("${year}_accuracy_assessment_area_bias.csv")
 
     when:
     validation_data.exists()
@@ -61,7 +72,8 @@ process ACCURACY_ASSESSMENT {
     accuracy_assessment --predicted-file $prediction --validation-file $validation_data \
         --validation-layer validation_data_${year} \
         --output-file accuracy_summary_${year}.csv \
-        --tp-output-file ${year}_accuracy_assessment.gpkg 
+        --tp-output-file ${year}_accuracy_assessment.gpkg \
+        --cache-dir ${params.validation_cache_directory}
     """
 }
 
@@ -72,13 +84,17 @@ workflow cropland_detection {
     validation_db
 
     main:
+    // create the cache directory as the workflow user before docker mounts it
+    file(params.validation_cache_directory).mkdirs()
+
     DETECT_CIRCLES(stm_chips)
-        | TRANSFORM_COORDINATES
         | groupTuple(by: 1)  // group by year
         | MERGE_CIRCLES
         | combine( Channel.fromPath(validation_db) )
         | ACCURACY_ASSESSMENT
 
+    ARCHIVE_CIRCLES(MERGE_CIRCLES.out)
+
     emit:
     detected_acres = MERGE_CIRCLES.out
     accuaracy_acres = ACCURACY_ASSESSMENT.out